@@ -0,0 +1,104 @@
+from pathlib import Path
+from typing import Optional
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from config import Config
+
+
+class BlobStore:
+    """
+    Content-addressed store for large payloads in a local directory.
+
+    Blobs are named by the sha256 of their bytes and fanned out in sub directories by the first
+    two hex digits, so identical payloads are stored once and a digest always reads back the same bytes.
+    Blobs not written or read for `ttl_seconds` are pruned, at most once per `prune_interval_seconds`.
+
+    Usage:
+        digest = BlobStore().put(data)
+        data = BlobStore().get(digest)
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(BlobStore, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.root = Path(config.blob_store_path)
+        self.threshold_bytes = config.blob_store_threshold_bytes
+        self.ttl_seconds = config.blob_store_ttl_seconds
+        self.prune_interval_seconds = 60 * 60
+        self._last_prune = time.time()
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+
+        if path.exists():
+            # refresh the access time so pruning keeps blobs that are still referenced by new results
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        self._maybe_prune()
+        return digest
+
+
+    def get(self, digest: str) -> bytes:
+        path = self._path(digest)
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path)
+        return data
+
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+
+    def prune(self, older_than_seconds: Optional[float] = None) -> int:
+        """deletes blobs not written or read within the last `older_than_seconds` (default ttl_seconds), returns how many."""
+        older_than_seconds = self.ttl_seconds if older_than_seconds is None else older_than_seconds
+        cutoff = time.time() - older_than_seconds
+        deleted = 0
+        for path in self.root.glob('*/*'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    deleted += 1
+            except FileNotFoundError:
+                pass
+        return deleted
+
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+
+    def _maybe_prune(self) -> None:
+        if self.ttl_seconds is None:
+            return
+        with self._lock:
+            now = time.time()
+            if now - self._last_prune < self.prune_interval_seconds:
+                return
+            self._last_prune = now
+        self.prune()
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+
+
+class LRUTTLCache:
+    """
+    Thread-safe LRU cache with time-to-live, optionally backed by a SQLite file.
+
+    - values must be JSON serializable
+    - the in-memory layer holds up to `max_entries` most recently used entries
+    - when `db_path` is set, entries are written through to SQLite and read back on memory miss,
+      so cached entries survive restarts. SQLite is also capped to `max_entries` by last access time.
+    - hits do not write to SQLite, their access times are batched and written with the next set(),
+      or once `access_flush_size` hits are pending, so a hit never waits for a commit in the common case
+    - `ttl_seconds` of None means entries never expire
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None, db_path: Optional[str] = None,
+                 access_flush_size: int = 64):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.access_flush_size = access_flush_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # key -> last access time of hits not yet written to SQLite
+        self._pending_access: Dict[str, float] = {}
+        self._pending_hits = 0
+
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries(last_access)")
+            self._db.commit()
+
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None and self._db is not None:
+                entry = self._db_get(key)
+                if entry is not None:
+                    self._entries[key] = entry
+
+            if entry is not None and self._is_expired(entry[1], now):
+                self._delete(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._evict_memory()
+            if self._db is not None:
+                self._pending_access[key] = now
+                self._pending_hits += 1
+                if self._pending_hits >= self.access_flush_size:
+                    self._flush_access()
+                    self._db.commit()
+
+            self.hits += 1
+            return entry[0]
+
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (value, now)
+            self._entries.move_to_end(key)
+            self._evict_memory()
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now))
+                self._pending_access.pop(key, None)
+                self._flush_access()
+                self._db_evict(now)
+                self._db.commit()
+
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._delete(key)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending_access.clear()
+            self._pending_hits = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache_entries")
+                self._db.commit()
+
+
+    def flush(self) -> None:
+        """writes the pending access times of hits to SQLite."""
+        with self._lock:
+            if self._db is not None and self._pending_access:
+                self._flush_access()
+                self._db.commit()
+
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries)
+            }
+
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+
+    def _delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._pending_access.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._db.commit()
+
+
+    def _evict_memory(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+    def _flush_access(self) -> None:
+        self._db.executemany("UPDATE cache_entries SET last_access = ? WHERE key = ?",
+                             [(last_access, key) for key, last_access in self._pending_access.items()])
+        self._pending_access.clear()
+        self._pending_hits = 0
+
+
+    def _db_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._db.execute("SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+
+    def _db_evict(self, now: float) -> None:
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM cache_entries WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._db.execute("""
+            DELETE FROM cache_entries WHERE key NOT IN (
+                SELECT key FROM cache_entries ORDER BY last_access DESC LIMIT ?
+            )""", (self.max_entries,))
@@ -0,0 +1,402 @@
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import httpx
+
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+from config import Config
+from agents.metrics import Metrics, command_program
+from agents.tracing import Tracer
+
+
+T = TypeVar('T')
+
+# at most this much of the request is kept next to the key, to tell interactions apart when reading a cassette
+SUMMARY_CHARS = 200
+
+
+class CassetteMissError(LookupError):
+    """raised in replay when the cassette has no interaction for a request."""
+    pass
+
+
+class Cassette:
+    """
+    Records the workflow's interactions with the outside world, with their timings, and replays them later:
+    - http: LLM requests of every client sharing LLMGateway's connection pools (AzureChatOpenAI,
+      OpenAIServerModel, AzureOpenAIChatClient), streamed responses chunk by chunk
+    - mcp: MCP tool calls, no MCP server is started in replay
+    - process: AsyncProcess commands (AzShell), output line by line
+    - bash: commands of the warm bash sessions
+
+    CASSETTE_MODE selects off (default), record or replay, CASSETTE_PATH the JSONL file.
+    Recording appends, delete the file to start over. Replay waits the recorded time multiplied by
+    CASSETTE_REPLAY_TIME_SCALE: 1.0 is recorded speed, 0 replays as fast as possible and leaves only
+    the framework's own overhead.
+
+    Interactions are matched by kind and request, paths under AGENT_WORKING_DIRECTORY are ignored so a
+    recording replays on other threads. Identical requests replay in recorded order, the last one repeats.
+    Cassettes hold prompts and command outputs, not credentials: request headers are never recorded
+    and az login is skipped in replay.
+
+    Usage:
+        CASSETTE_MODE=record CASSETTE_PATH=run.jsonl uvicorn main:app
+        CASSETTE_MODE=replay CASSETTE_PATH=run.jsonl CASSETTE_REPLAY_TIME_SCALE=0 python -m benchmarks.orchestration ...
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(Cassette, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.mode = config.cassette_mode
+        self.path = config.cassette_path
+        self.time_scale = config.cassette_replay_time_scale
+        self._agent_cwd = re.compile(re.escape(config.agent_cwd.rstrip('/')) + r'[^\s"\'\\,;]*')
+        self._lock = threading.Lock()
+        self._interactions: Optional[Dict[Tuple[str, str], Deque[Dict[str, Any]]]] = None
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ('record', 'replay')
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+
+    def key(self, kind: str, request: str) -> str:
+        return hashlib.sha256(f'{kind}\n{self.normalize(request)}'.encode('utf-8')).hexdigest()[:32]
+
+
+    def normalize(self, request: str) -> str:
+        return self._agent_cwd.sub('<agent_cwd>', request)
+
+
+    def record(self, kind: str, request: str, seconds: float, **interaction: Any) -> None:
+        line = json.dumps({
+            'kind': kind,
+            'key': self.key(kind, request),
+            'summary': self.normalize(request)[:SUMMARY_CHARS],
+            'recorded_at': time.time(),
+            'seconds': seconds,
+            **interaction
+        }, default=str)
+        with self._lock:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+    def take(self, kind: str, request: str) -> Dict[str, Any]:
+        """the next recorded interaction for the request, the last one is kept for repeated requests."""
+        key = self.key(kind, request)
+        with self._lock:
+            if self._interactions is None:
+                self._interactions = self._load()
+            interactions = self._interactions.get((kind, key))
+            if not interactions:
+                raise CassetteMissError(f"no recorded {kind} interaction in {self.path} for: {self.normalize(request)[:SUMMARY_CHARS]}")
+            return interactions.popleft() if len(interactions) > 1 else interactions[0]
+
+
+    def _load(self) -> Dict[Tuple[str, str], Deque[Dict[str, Any]]]:
+        interactions: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = {}
+        if not os.path.exists(self.path):
+            return interactions
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    interactions.setdefault((interaction['kind'], interaction['key']), deque()).append(interaction)
+        return interactions
+
+
+    def delay(self, started: float, offset: float) -> float:
+        """seconds to wait until the recorded offset from `started` is reached at replay speed."""
+        return max(0.0, started + offset * self.time_scale - time.monotonic())
+
+
+    async def acall(self, kind: str, request: str, call: Callable[[], Awaitable[T]],
+                    dump: Callable[[T], Any] = lambda result: result,
+                    load: Callable[[Any], T] = lambda response: response) -> T:
+        """records or replays one request/response call, `dump` and `load` convert the result to and from JSON."""
+        started = time.monotonic()
+        if self.replaying:
+            interaction = self.take(kind, request)
+            await asyncio.sleep(self.delay(started, interaction['seconds']))
+            return load(interaction['response'])
+
+        result = await call()
+        if self.recording:
+            self.record(kind, request, time.monotonic() - started, response=dump(result))
+        return result
+
+
+    def http_transport(self, transport: httpx.BaseTransport) -> httpx.BaseTransport:
+        return _CassetteTransport(self, transport)
+
+    def http_async_transport(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        return _CassetteAsyncTransport(self, transport)
+
+
+    def mcp_session(self, session: Any = None) -> 'CassetteMcpSession':
+        """wraps a MCP session to record its tool calls, without a session its tools replay."""
+        return CassetteMcpSession(self, session)
+
+
+    async def stream_process(self, process: Any, stream: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """records or replays the output lines and result of an AsyncProcess, `stream` runs the real process."""
+        from agents.tools.process import ProcessOutputLine, ProcessResult
+
+        started = time.monotonic()
+        if self.replaying:
+            interaction = self.take('process', process.command)
+            span = Tracer().start_span('subprocess', program=command_program(process.command), replayed=True)
+            # cassettes recorded before continuation pieces were marked hold 3 items per line
+            for offset, stream_name, line, *continuation in interaction['lines']:
+                await asyncio.sleep(self.delay(started, offset))
+                yield ProcessOutputLine(stream=stream_name, line=line,
+                                        continuation=bool(continuation and continuation[0]))
+            await asyncio.sleep(self.delay(started, interaction['seconds']))
+
+            process.result = ProcessResult.model_validate(interaction['result'])
+            Metrics().observe_process(process.command, process.result.wall_time_seconds, process.result.exit_code, process.result.timed_out)
+            span.end(status='timeout' if process.result.timed_out else None, exit_code=process.result.exit_code)
+            return
+
+        lines: List[Tuple[float, str, str, bool]] = []
+        async for output in stream():
+            lines.append((time.monotonic() - started, output.stream, output.line,
+                          output.continuation))
+            yield output
+
+        if self.recording and process.result is not None:
+            self.record('process', process.command, time.monotonic() - started,
+                        lines=lines, result=process.result.model_dump())
+
+
+class CassetteMcpTool:
+
+    def __init__(self, cassette: Cassette, name: str, tool: Any = None):
+        self.cassette = cassette
+        self.name = name
+        self.tool = tool
+
+    async def ainvoke(self, input: Dict[str, Any], **kwargs: Any) -> Any:
+        request = f"{self.name}\n{json.dumps(input, sort_keys=True, default=str)}"
+        return await self.cassette.acall('mcp', request, lambda: self.tool.ainvoke(input=input, **kwargs))
+
+
+class _CassetteMcpTools:
+    """tools of a cassette MCP session, in replay every tool name exists."""
+
+    def __init__(self, cassette: Cassette, tools: Optional[Dict[str, Any]]):
+        self._cassette = cassette
+        self._tools = tools
+
+    def get(self, name: str, default: Any = None) -> Any:
+        if self._tools is None:
+            return CassetteMcpTool(self._cassette, name)
+        tool = self._tools.get(name)
+        return CassetteMcpTool(self._cassette, name, tool) if tool is not None else default
+
+    def __getitem__(self, name: str) -> Any:
+        tool = self.get(name)
+        if tool is None:
+            raise KeyError(name)
+        return tool
+
+
+class CassetteMcpSession:
+
+    def __init__(self, cassette: Cassette, session: Any = None):
+        self.session = session
+        self.tools = _CassetteMcpTools(cassette, session.tools if session is not None else None)
+
+
+def _http_request(request: httpx.Request) -> str:
+    """method, path and body of a LLM request, JSON bodies with sorted keys. Headers hold credentials and are left out."""
+    body = request.content.decode('utf-8', errors='replace')
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True)
+    except ValueError:
+        pass
+    query = f"?{request.url.query.decode()}" if request.url.query else ''
+    return f"{request.method} {request.url.path}{query}\n{body}"
+
+
+def _encode_chunk(offset: float, chunk: bytes, encoded: bool) -> Dict[str, Any]:
+    if not encoded:
+        try:
+            return {'t': offset, 'text': chunk.decode('utf-8')}
+        except UnicodeDecodeError:
+            pass
+    return {'t': offset, 'base64': base64.b64encode(chunk).decode('ascii')}
+
+
+def _decode_chunk(chunk: Dict[str, Any]) -> bytes:
+    return chunk['text'].encode('utf-8') if 'text' in chunk else base64.b64decode(chunk['base64'])
+
+
+class _HttpRecorder:
+    """collects the chunks of a response body and records the interaction when the body is closed."""
+
+    def __init__(self, cassette: Cassette, request: str, started: float, response: httpx.Response):
+        self.cassette = cassette
+        self.request = request
+        self.started = started
+        self.status_code = response.status_code
+        self.headers = list(response.headers.multi_items())
+        self.headers_seconds = time.monotonic() - started
+        # compressed bodies are kept as recorded, base64 encoded
+        self.encoded = 'content-encoding' in response.headers
+        self.chunks: List[Dict[str, Any]] = []
+        self._recorded = False
+
+    def add(self, chunk: bytes) -> None:
+        self.chunks.append(_encode_chunk(time.monotonic() - self.started, chunk, self.encoded))
+
+    def finish(self) -> None:
+        if self._recorded:
+            return
+        self._recorded = True
+        self.cassette.record('http', self.request, time.monotonic() - self.started,
+                             status_code=self.status_code, headers=self.headers,
+                             headers_seconds=self.headers_seconds, chunks=self.chunks)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+
+    def __init__(self, stream: httpx.SyncByteStream, recorder: _HttpRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._recorder.add(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._recorder.finish()
+
+
+class _RecordingAsyncStream(httpx.AsyncByteStream):
+
+    def __init__(self, stream: httpx.AsyncByteStream, recorder: _HttpRecorder):
+        self._stream = stream
+        self._recorder = recorder
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._recorder.add(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._recorder.finish()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+
+    def __init__(self, cassette: Cassette, started: float, chunks: List[Dict[str, Any]]):
+        self._cassette = cassette
+        self._started = started
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._chunks:
+            time.sleep(self._cassette.delay(self._started, chunk['t']))
+            yield _decode_chunk(chunk)
+
+
+class _ReplayAsyncStream(httpx.AsyncByteStream):
+
+    def __init__(self, cassette: Cassette, started: float, chunks: List[Dict[str, Any]]):
+        self._cassette = cassette
+        self._started = started
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self._chunks:
+            await asyncio.sleep(self._cassette.delay(self._started, chunk['t']))
+            yield _decode_chunk(chunk)
+
+
+class _CassetteTransport(httpx.BaseTransport):
+
+    def __init__(self, cassette: Cassette, transport: httpx.BaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        request.read()
+        key = _http_request(request)
+
+        if self.cassette.replaying:
+            interaction = self.cassette.take('http', key)
+            time.sleep(self.cassette.delay(started, interaction['headers_seconds']))
+            return httpx.Response(interaction['status_code'], headers=interaction['headers'], request=request,
+                                  stream=_ReplayStream(self.cassette, started, interaction['chunks']))
+
+        response = self.transport.handle_request(request)
+        response.stream = _RecordingStream(response.stream, _HttpRecorder(self.cassette, key, started, response))
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class _CassetteAsyncTransport(httpx.AsyncBaseTransport):
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        await request.aread()
+        key = _http_request(request)
+
+        if self.cassette.replaying:
+            interaction = self.cassette.take('http', key)
+            await asyncio.sleep(self.cassette.delay(started, interaction['headers_seconds']))
+            return httpx.Response(interaction['status_code'], headers=interaction['headers'], request=request,
+                                  stream=_ReplayAsyncStream(self.cassette, started, interaction['chunks']))
+
+        response = await self.transport.handle_async_request(request)
+        response.stream = _RecordingAsyncStream(response.stream, _HttpRecorder(self.cassette, key, started, response))
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
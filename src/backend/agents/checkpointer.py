@@ -0,0 +1,418 @@
+from collections.abc import AsyncIterator, Iterator, Sequence
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import inspect
+import random
+import sqlite3
+import threading
+import time
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from pydantic import BaseModel
+
+from config import Config
+from agents import state as state_models
+
+
+def state_msgpack_allowlist() -> List[Tuple[str, str]]:
+    """
+    (module, name) of the graph state models, so checkpoints revive them without langgraph's
+    "unregistered type" warning and still load with LANGGRAPH_STRICT_MSGPACK=true.
+    Both import paths of agents/state.py are listed, checkpoints written by older builds used `state`.
+    """
+    names = [name for name, value in vars(state_models).items()
+             if inspect.isclass(value) and issubclass(value, BaseModel) and value.__module__ == state_models.__name__]
+    return [(module, name) for module in (state_models.__name__, 'state') for name in names]
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer persisting to a SQLite file in WAL mode.
+
+    Storage stays bounded under sustained load:
+    - only the newest `max_checkpoints_per_thread` checkpoints of each thread (and namespace) are kept,
+      older ones are dropped with their pending writes on every put
+    - channel values are stored once per channel version and shared by checkpoints,
+      versions no kept checkpoint refers to are compacted away
+    - threads marked finished are deleted `finished_ttl_seconds` after their last checkpoint,
+      other threads (e.g. waiting for human input) `idle_ttl_seconds` after it
+    - expired threads are cleaned up at most every `cleanup_interval_seconds`, piggybacking on put
+
+    The default serializer only revives the msgpack types langgraph considers safe and the state models,
+    see state_msgpack_allowlist().
+
+    Usage:
+        checkpointer = SqliteCheckpointSaver('/data/checkpoints.sqlite')
+        graph = workflow.compile(checkpointer=checkpointer)
+        checkpointer.mark_finished(thread_id)
+    """
+
+    def __init__(self, db_path: str, *, max_checkpoints_per_thread: int = 3,
+                 finished_ttl_seconds: Optional[float] = 24 * 60 * 60,
+                 idle_ttl_seconds: Optional[float] = 7 * 24 * 60 * 60,
+                 cleanup_interval_seconds: float = 60,
+                 serde: Optional[SerializerProtocol] = None):
+        super().__init__(serde=serde or JsonPlusSerializer(allowed_msgpack_modules=state_msgpack_allowlist()))
+        # the latest checkpoint is resumed from, its parent keeps get_state_history one step deep
+        self.max_checkpoints_per_thread = max(2, max_checkpoints_per_thread)
+        self.finished_ttl_seconds = finished_ttl_seconds
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.cleanup_interval_seconds = cleanup_interval_seconds
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        # must be set before the first table is created to take effect
+        self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_versions (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+            );
+            CREATE INDEX IF NOT EXISTS idx_checkpoint_versions_channel
+                ON checkpoint_versions(thread_id, checkpoint_ns, channel, version);
+            CREATE TABLE IF NOT EXISTS blobs (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                type TEXT NOT NULL,
+                value BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT NOT NULL,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+        """)
+        self._db.commit()
+
+
+    @classmethod
+    def from_config(cls) -> 'SqliteCheckpointSaver':
+        config = Config()
+        return cls(
+            config.checkpoint_path,
+            max_checkpoints_per_thread=config.checkpoint_max_per_thread,
+            finished_ttl_seconds=config.checkpoint_finished_ttl_seconds,
+            idle_ttl_seconds=config.checkpoint_idle_ttl_seconds,
+            cleanup_interval_seconds=config.checkpoint_cleanup_interval_seconds
+        )
+
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._db.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)).fetchone()
+            if row is None:
+                return None
+            return self._load_tuple(thread_id, checkpoint_ns, row)
+
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_checkpoint_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_checkpoint_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            thread_id, checkpoint_ns = row[0], row[1]
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            with self._lock:
+                checkpoint_tuple = self._load_tuple(thread_id, checkpoint_ns, row[2:])
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(c)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version),
+             *(self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)))
+            for channel, version in new_versions.items()
+        ]
+        now = time.time()
+
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_checkpoint_id,
+                 checkpoint_type, checkpoint_bytes, metadata_type, metadata_bytes))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO checkpoint_versions VALUES (?, ?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, checkpoint["id"], channel, str(version))
+                 for channel, version in checkpoint["channel_versions"].items()])
+            self._db.execute(
+                "INSERT INTO threads (thread_id, updated_at, finished) VALUES (?, ?, 0) "
+                "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at, finished = 0",
+                (thread_id, now))
+            self._compact(thread_id, checkpoint_ns)
+            self._db.commit()
+
+            if now - self._last_cleanup >= self.cleanup_interval_seconds:
+                self._last_cleanup = now
+                self._cleanup_expired(now)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            rows.append((write_idx >= 0, (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel,
+                                          *self.serde.dumps_typed(value), task_path)))
+
+        with self._lock:
+            for keep_existing, row in rows:
+                # regular writes of a task are idempotent, special channels (errors, interrupts) are overwritten
+                verb = "INSERT OR IGNORE" if keep_existing else "INSERT OR REPLACE"
+                self._db.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._db.commit()
+
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._delete_threads([thread_id])
+            self._db.commit()
+
+
+    def mark_finished(self, thread_id: str) -> None:
+        """the thread ran to completion or failed, its checkpoints expire after finished_ttl_seconds."""
+        with self._lock:
+            self._db.execute("UPDATE threads SET finished = 1, updated_at = ? WHERE thread_id = ?", (time.time(), thread_id))
+            self._db.commit()
+
+
+    def cleanup(self) -> int:
+        """deletes expired threads now, returns how many were deleted."""
+        with self._lock:
+            self._last_cleanup = time.time()
+            return self._cleanup_expired(self._last_cleanup)
+
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            count = lambda table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            return {
+                'threads': count('threads'),
+                'checkpoints': count('checkpoints'),
+                'blobs': count('blobs'),
+                'writes': count('writes')
+            }
+
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(lambda: [*self.list(config, filter=filter, before=before, limit=limit)])
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # same scheme as InMemorySaver: zero padded counter, so versions sort as text
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+    def _load_tuple(self, thread_id: str, checkpoint_ns: str, row: Sequence[Any]) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint_bytes, metadata_type, metadata_bytes = row
+        checkpoint: Checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint_bytes))
+
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self._db.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed((blob[0], blob[1]))
+
+        writes = self._db.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((metadata_type, metadata_bytes)),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((type_, value)))
+                            for task_id, _, channel, type_, value, _ in writes],
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id}}
+                if parent_checkpoint_id else None
+            ),
+        )
+
+
+    def _compact(self, thread_id: str, checkpoint_ns: str) -> None:
+        """drops checkpoints beyond the newest max_checkpoints_per_thread, with their writes and unreferenced channel values."""
+        stale = self._db.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread)).fetchall()
+        if not stale:
+            return
+
+        stale_ids = [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale]
+        for table in ('checkpoints', 'checkpoint_versions', 'writes'):
+            self._db.executemany(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale_ids)
+
+        self._db.execute("""
+            DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND NOT EXISTS (
+                SELECT 1 FROM checkpoint_versions v
+                WHERE v.thread_id = blobs.thread_id AND v.checkpoint_ns = blobs.checkpoint_ns
+                  AND v.channel = blobs.channel AND v.version = blobs.version
+            )""", (thread_id, checkpoint_ns))
+
+
+    def _cleanup_expired(self, now: float) -> int:
+        expired: List[str] = []
+        if self.finished_ttl_seconds is not None:
+            expired += [r[0] for r in self._db.execute(
+                "SELECT thread_id FROM threads WHERE finished = 1 AND updated_at < ?", (now - self.finished_ttl_seconds,))]
+        if self.idle_ttl_seconds is not None:
+            expired += [r[0] for r in self._db.execute(
+                "SELECT thread_id FROM threads WHERE finished = 0 AND updated_at < ?", (now - self.idle_ttl_seconds,))]
+        if expired:
+            self._delete_threads(expired)
+            self._db.commit()
+            self._db.execute("PRAGMA incremental_vacuum")
+        return len(expired)
+
+
+    def _delete_threads(self, thread_ids: List[str]) -> None:
+        for table in ('threads', 'checkpoints', 'checkpoint_versions', 'blobs', 'writes'):
+            self._db.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in thread_ids])
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """checkpointer selected by CHECKPOINTER: 'sqlite' (default, durable) or 'memory' (debugging)."""
+    if Config().checkpointer == 'memory':
+        return InMemorySaver()
+    return SqliteCheckpointSaver.from_config()
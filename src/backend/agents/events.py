@@ -0,0 +1,105 @@
+from typing import Any, AsyncIterator, Dict, List, Optional
+import json
+from pydantic import BaseModel
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import AIMessageChunk
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import StateSnapshot
+from agents.state import Scratchpad, Task, TaskPlan
+
+
+# SSE event names sent to clients
+TOKEN_EVENT = 'token'
+NODE_START_EVENT = 'node_start'
+NODE_END_EVENT = 'node_end'
+TOOL_OUTPUT_EVENT = 'tool_output'
+INTERRUPT_EVENT = 'interrupt'
+ERROR_EVENT = 'error'
+
+
+async def aemit_tool_output(tool: str, data: Dict[str, Any]) -> None:
+    """
+    Report tool progress (e.g. a line of command output) to SSE clients of the running workflow.
+    Does nothing outside of a graph run.
+    """
+    try:
+        await adispatch_custom_event(TOOL_OUTPUT_EVENT, {'tool': tool, **data})
+    except RuntimeError:
+        pass
+
+
+def emit_tool_output(tool: str, data: Dict[str, Any]) -> None:
+    """synchronous version of aemit_tool_output."""
+    try:
+        dispatch_custom_event(TOOL_OUTPUT_EVENT, {'tool': tool, **data})
+    except RuntimeError:
+        pass
+
+
+def to_sse(data: Any, event: Optional[str] = None) -> str:
+    payload = json.dumps(data, default=to_jsonable)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+
+async def stream_workflow_events(graph: CompiledStateGraph, input: Any, config: dict) -> AsyncIterator[str]:
+    """
+    Runs the graph and yields typed SSE frames as things happen:
+    - token: LLM token deltas, including structured output arguments as they are generated
+    - node_start / node_end: a graph node started or finished, node_end carries the node's state update
+    - tool_output: progress reported by tools through aemit_tool_output
+    - interrupt: the graph paused for human input, sent last
+    - an unnamed message carrying the final scratchpad as `result` once the graph finished
+    """
+    node_names = set(graph.nodes) - {'__start__'}
+
+    async for event in graph.astream_events(input, config, version='v2'):
+        kind = event['event']
+        metadata = event.get('metadata', {})
+        node = metadata.get('langgraph_node')
+
+        if kind == 'on_chat_model_stream':
+            text = _chunk_text(event['data'].get('chunk'))
+            if text:
+                yield to_sse({'node': node, 'text': text}, TOKEN_EVENT)
+
+        elif kind == 'on_chain_start' and event['name'] in node_names and event['name'] == node:
+            yield to_sse({'node': node}, NODE_START_EVENT)
+
+        elif kind == 'on_chain_end' and event['name'] in node_names and event['name'] == node:
+            yield to_sse({'node': node, 'output': event['data'].get('output')}, NODE_END_EVENT)
+
+        elif kind == 'on_custom_event' and event['name'] == TOOL_OUTPUT_EVENT:
+            yield to_sse({'node': node, **event['data']}, TOOL_OUTPUT_EVENT)
+
+    state = await graph.aget_state(config)
+    thread_id = config['configurable']['thread_id']
+    interrupts = pending_interrupts(state)
+    if interrupts:
+        yield to_sse({'thread_id': thread_id, 'interrupt_data': interrupts[0], 'interrupts': interrupts}, INTERRUPT_EVENT)
+    elif not state.next:
+        yield to_sse({'thread_id': thread_id, 'result': state.values.get('scratchpad')})
+
+
+def pending_interrupts(state: StateSnapshot) -> List[Any]:
+    """values passed to interrupt() by the nodes the thread is paused on."""
+    return [i.value for task in state.tasks for i in task.interrupts]
+
+
+def _chunk_text(chunk: Optional[AIMessageChunk]) -> str:
+    """text content of a streamed chunk, or the arguments delta when the model streams a structured output tool call."""
+    if chunk is None:
+        return ''
+    if isinstance(chunk.content, str) and chunk.content:
+        return chunk.content
+    return ''.join(tool_call_chunk.get('args') or '' for tool_call_chunk in chunk.tool_call_chunks)
+
+
+def to_jsonable(obj: Any) -> Any:
+    """JSON of models sent to clients, task results offloaded to the blob store are read back."""
+    if isinstance(obj, (Scratchpad, TaskPlan, Task)):
+        obj = obj.with_execution_results()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json')
+    return str(obj)
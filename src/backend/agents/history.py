@@ -0,0 +1,87 @@
+from typing import List
+
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import add_messages, Messages
+
+from config import Config
+
+
+DIGEST_MESSAGE_ID = 'history-digest'
+DIGEST_PREFIX = 'Summary of earlier conversation:\n'
+
+
+class HistoryPolicy:
+    """
+    Keeps a thread's message history bounded by tokens.
+
+    When the history grows above `max_tokens`, the newest messages fitting in `keep_recent_tokens` are kept
+    and older ones are folded into a single digest message: one short line per message, newest lines kept
+    when the digest exceeds `digest_max_chars`. Token counts are approximate (characters / 4 plus per message overhead).
+
+    Usage:
+        messages = HistoryPolicy.from_config().compact(messages)
+    """
+
+    def __init__(self, max_tokens: int, keep_recent_tokens: int, digest_max_chars: int = 2000, line_max_chars: int = 200):
+        self.max_tokens = max_tokens
+        self.keep_recent_tokens = min(keep_recent_tokens, max_tokens)
+        self.digest_max_chars = digest_max_chars
+        self.line_max_chars = line_max_chars
+
+
+    @classmethod
+    def from_config(cls) -> 'HistoryPolicy':
+        config = Config()
+        return cls(
+            max_tokens=config.history_max_tokens,
+            keep_recent_tokens=config.history_keep_recent_tokens,
+            digest_max_chars=config.history_digest_max_chars
+        )
+
+
+    def compact(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        if count_tokens_approximately(messages) <= self.max_tokens:
+            return messages
+
+        digest = next((m for m in messages if m.id == DIGEST_MESSAGE_ID), None)
+        history = [m for m in messages if m.id != DIGEST_MESSAGE_ID]
+
+        recent: List[BaseMessage] = []
+        budget = self.keep_recent_tokens
+        for message in reversed(history):
+            tokens = count_tokens_approximately([message])
+            # the latest message is always kept, however large
+            if recent and tokens > budget:
+                break
+            recent.insert(0, message)
+            budget -= tokens
+
+        older = history[:len(history) - len(recent)]
+        if not older:
+            return messages
+
+        lines = digest.content[len(DIGEST_PREFIX):].splitlines() if digest else []
+        lines += [self._digest_line(m) for m in older]
+        while lines and sum(len(line) + 1 for line in lines) > self.digest_max_chars:
+            lines.pop(0)
+
+        return [SystemMessage(content=DIGEST_PREFIX + '\n'.join(lines), id=DIGEST_MESSAGE_ID)] + recent
+
+
+    def _digest_line(self, message: BaseMessage) -> str:
+        text = ' '.join(_text(message).split())
+        if len(text) > self.line_max_chars:
+            text = text[:self.line_max_chars - 3] + '...'
+        return f"- {message.type}: {text}"
+
+
+def _text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return ' '.join(part.get('text', '') for part in message.content if isinstance(part, dict))
+
+
+def add_messages_bounded(left: Messages, right: Messages) -> List[BaseMessage]:
+    """add_messages reducer that compacts the merged history with the configured HistoryPolicy."""
+    return HistoryPolicy.from_config().compact(add_messages(left, right))
@@ -0,0 +1,198 @@
+from typing import Any, Dict, Optional
+import re
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from agents.llm_gateway import LLMGateway
+from agents.node_cache import NodeResultCache
+from agents.prompt import intent_classifier_system_prompt, question_answer_system_prompt
+from agents.state import ExecutionState, IntentClassification
+from config import Config
+
+
+# verbs asking for work to be done, a prompt containing one is not a plain question
+ACTION_VERBS = re.compile(r'\b(' + '|'.join([
+    'create', 'deploy', 'delete', 'remove', 'provision', 'build', 'run', 'execute', 'download', 'upload',
+    'analy[sz]e', 'plot', 'chart', 'list', 'locate', 'find', 'search', 'query', 'load', 'extract', 'configure',
+    'update', 'scale', 'start', 'stop', 'restart', 'assign', 'peer', 'install', 'migrate', 'back ?up', 'restore',
+    'set ?up', 'enable', 'disable', 'write', 'generate', 'containeri[sz]e', 'monitor', 'move', 'copy', 'rename',
+    'show', 'get', 'check', 'fix', 'resize', 'attach', 'detach', 'grant', 'revoke', 'rotate'
+]) + r')\b', re.IGNORECASE)
+
+# prompts opening like this ask for information, unless they also ask for work (ACTION_VERBS)
+QUESTION_OPENERS = re.compile(
+    r"^\s*(what|what's|whats|why|when|who|which|explain|describe|define|tell me about|compare|"
+    r"what is the difference|is it (possible|true)|are there)\b", re.IGNORECASE)
+
+# how-to questions ask for guidance, even though they name an action
+GUIDANCE_OPENERS = re.compile(r"^\s*(how (do|does|should|would|can) (i|you|we|one)|how to|what is the best way to)\b", re.IGNORECASE)
+
+# names of the user's resources: rg-dev, kv-prod, vm-web-01, 'my-app', "sales db", named/called x
+NAMED_RESOURCES = re.compile(
+    r'\b[a-z][a-z0-9]*(-[a-z0-9]+)+\b|\b[a-z]+\d+\b|"[^"]+"|\'[^\']+\'|\b(named|called)\s+\S+', re.IGNORECASE)
+
+# resource groups and subscriptions, named in a prompt they are often the location rather than the object
+RESOURCE_SCOPES = re.compile(r'\b(resource groups?|subscriptions?|tenants?)\b', re.IGNORECASE)
+
+# questions about the user's own environment need tools to answer, e.g. "what VMs are running in rg-prod?"
+ENVIRONMENT_REFERENCES = re.compile(
+    r'\b(my|our|mine|currently|running|deployed|provisioned|costs?|spend|usage|access|permissions?)\b', re.IGNORECASE)
+
+# polite requests ask for work, even though they are phrased as questions
+REQUEST_OPENERS = re.compile(r"^\s*(can|could|would|will) you\b|^\s*please\b", re.IGNORECASE)
+
+# resources without a power state: operations Azure does not offer on them
+STATELESS_RESOURCES = re.compile(
+    r'\b(vnets?|virtual networks?|subnets?|resource groups?|network security groups?|nsgs?|storage accounts?|'
+    r'key ?vaults?|dns zones?|public ip( address(es)?)?s?|route tables?|private endpoints?)\b', re.IGNORECASE)
+POWER_VERBS = r'(stop|start|restart|reboot|pause|resume|deallocate|power (on|off)|shut ?down)'
+POWER_OPERATIONS = re.compile(rf'\b{POWER_VERBS}\b', re.IGNORECASE)
+DETERMINERS = (r'(the\s+|my\s+|our\s+|all\s+(the\s+|my\s+|our\s+)?|'
+               r'this\s+|that\s+|these\s+|those\s+)?')
+# a power operation whose direct object is a stateless resource, e.g. "stop the vnet", not "stop the vm in the vnet"
+POWER_ON_STATELESS_RESOURCE = re.compile(
+    rf'\b{POWER_VERBS}\s+{DETERMINERS}(?P<resource>{STATELESS_RESOURCES.pattern})', re.IGNORECASE)
+# a power operation on "it" or "them", referring back to a stateless resource that is the object
+# of an earlier verb, e.g. 'locate VNet "vnet-test" in resource group "rg-test" and stop it'
+POWER_ON_REFERENCED_STATELESS_RESOURCE = re.compile(
+    rf'{ACTION_VERBS.pattern}\s+{DETERMINERS}(?P<resource>{STATELESS_RESOURCES.pattern})'
+    rf'[^.!?\n]*?\band\s+(then\s+)?(?P<power>{POWER_VERBS})\s+(it|them)\b', re.IGNORECASE)
+
+
+class IntentRouter:
+    """
+    Routes a prompt before any planning happens:
+    - question: answered directly by one model call, no planning or tools
+    - unsupported: rejected with a reason, no model call
+    - action: planned and executed as usual
+
+    Local heuristics decide only the unambiguous cases. Prompts naming a resource or a resource group,
+    and all others they cannot decide, go to a small classifier model when INTENT_CLASSIFIER_DEPLOYMENT
+    is set and are planned otherwise, so a wrong guess costs a planning run rather than a wrong answer.
+    """
+
+    def classify_heuristically(self, prompt: str) -> Optional[IntentClassification]:
+        """the intent when the local rules are confident, otherwise None."""
+        # a named resource or scope can be the location of the operation or hide what it is, the model decides
+        names_resource = NAMED_RESOURCES.search(prompt) or RESOURCE_SCOPES.search(prompt)
+        about_environment = names_resource or ENVIRONMENT_REFERENCES.search(prompt)
+
+        for sentence in re.split(r'[.!?\n]+', prompt):
+            # the resource named by its type, a named resource could be something else
+            power = POWER_ON_STATELESS_RESOURCE.search(sentence) if not names_resource else None
+            if power:
+                return self._unsupported(power.group(1), power.group('resource'))
+
+            # 'locate VNet "vnet-test" ... and stop it', the type is given even for a named resource
+            power = POWER_ON_REFERENCED_STATELESS_RESOURCE.search(sentence)
+            if power:
+                return self._unsupported(power.group('power'), power.group('resource'))
+
+        stateless_power = POWER_OPERATIONS.search(prompt) and STATELESS_RESOURCES.search(prompt)
+        if names_resource and stateless_power:
+            # e.g. 'stop the VMs in VNet "vnet-test"' or 'stop the VMs in resource group rg-dev'
+            return None
+
+        if REQUEST_OPENERS.search(prompt):
+            return IntentClassification(intent='action', reason='the prompt requests work to be done')
+
+        if GUIDANCE_OPENERS.search(prompt) and not about_environment:
+            return IntentClassification(intent='question', reason='the prompt asks for guidance')
+
+        if QUESTION_OPENERS.search(prompt) and not ACTION_VERBS.search(prompt) and not about_environment:
+            return IntentClassification(intent='question', reason='the prompt asks for information only')
+
+        if not prompt.rstrip().endswith('?') and ACTION_VERBS.search(prompt):
+            return IntentClassification(intent='action', reason='the prompt asks for work to be done')
+
+        return None
+
+
+    @staticmethod
+    def _unsupported(power_verb: str, resource: str) -> IntentClassification:
+        return IntentClassification(
+            intent='unsupported',
+            reason=f"Azure has no {power_verb.lower()} operation for {resource}, "
+                   f"it has no running state. Deallocate or delete the resources inside it instead."
+        )
+
+
+    async def aclassify(self, prompt: str) -> IntentClassification:
+        classification = self.classify_heuristically(prompt)
+        if classification is not None:
+            return classification
+
+        deployment = Config().intent_classifier_deployment
+        if not deployment:
+            # without a classifier undecided prompts are planned, a wrong guess costs a planning run
+            return IntentClassification(intent='action', reason='no question or unsupported operation detected')
+
+        llm = LLMGateway().chat_model(deployment).with_structured_output(IntentClassification)
+        chain = ChatPromptTemplate.from_messages([
+            SystemMessage(content=intent_classifier_system_prompt),
+            HumanMessage(content=prompt)
+        ]) | llm
+        return await chain.ainvoke({})
+
+
+    async def route_intent(self, execution_state: ExecutionState) -> Dict[str, Any]:
+        """graph node: records the prompt's intent in the scratchpad."""
+        scratchpad = execution_state.scratchpad
+
+        if Config().intent_router_enabled:
+            classification = await self.aclassify(scratchpad.original_prompt)
+        else:
+            classification = IntentClassification(intent='action', reason='intent router disabled')
+
+        scratchpad.intent = classification.intent
+        scratchpad.intent_reason = classification.reason
+
+        return {'scratchpad': scratchpad}
+
+
+    async def answer_question(self, execution_state: ExecutionState) -> Dict[str, Any]:
+        """graph node: answers informational prompts in one model call."""
+        scratchpad = execution_state.scratchpad
+        deployment = Config().intent_answer_deployment or None
+
+        node_cache = NodeResultCache()
+        cache_key = node_cache.key('answer_question', scratchpad.original_prompt, question_answer_system_prompt)
+        answer = node_cache.get(cache_key)
+
+        if answer is None:
+            chain = ChatPromptTemplate.from_messages([
+                SystemMessage(content=question_answer_system_prompt),
+                HumanMessage(content=scratchpad.original_prompt)
+            ]) | LLMGateway().chat_model(deployment)
+            response = await chain.ainvoke({})
+            answer = response.content
+            node_cache.set(cache_key, answer)
+
+        scratchpad.answer = answer
+
+        return {
+            'scratchpad': scratchpad,
+            'messages': [AIMessage(content=answer)]
+        }
+
+
+    async def reject_request(self, execution_state: ExecutionState) -> Dict[str, Any]:
+        """graph node: ends unsupported requests with the reason, before any tool is touched."""
+        scratchpad = execution_state.scratchpad
+        scratchpad.answer = f"This request cannot be carried out: {scratchpad.intent_reason}"
+
+        return {
+            'scratchpad': scratchpad,
+            'messages': [AIMessage(content=scratchpad.answer)]
+        }
+
+
+    def next_node(self, execution_state: ExecutionState) -> str:
+        """graph router after route_intent: 'answer_question', 'reject_request' or 'plan'."""
+        intent = execution_state.scratchpad.intent
+        if intent == 'question':
+            return 'answer_question'
+        if intent == 'unsupported':
+            return 'reject_request'
+        return 'plan'
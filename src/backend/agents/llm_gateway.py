@@ -0,0 +1,409 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+import asyncio
+import threading
+import time
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_openai import AzureChatOpenAI
+
+import os, sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+from config import Config
+from agents.prompt import STATIC_PROMPT_PREFIXES, PROMPT_PREFIX_VERSIONS
+from agents.metrics import Metrics
+from agents.tracing import Span, Tracer
+from agents.cassette import Cassette
+
+
+class _CountedStream(httpx.SyncByteStream):
+    """response body wrapper that reports when the body is fully read or closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close:
+                on_close()
+
+
+class _CountedAsyncStream(httpx.AsyncByteStream):
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            on_close, self._on_close = self._on_close, None
+            if on_close:
+                on_close()
+
+
+class DeploymentPool:
+    """
+    Keep-alive HTTP connection pools (sync and async) for one model deployment,
+    counting requests in flight and timing them from send until the response body is closed.
+
+    The async connections belong to the event loop they were opened on. `http_async_client` sends
+    through the async pool of the running loop, a new loop (e.g. a later asyncio.run) gets its own.
+    """
+
+    def __init__(self, name: str, limits: httpx.Limits, timeout: httpx.Timeout):
+        self.name = name
+        self.limits = limits
+        self.in_flight = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._sync_transport = httpx.HTTPTransport(limits=limits)
+        cassette = Cassette()
+        if cassette.enabled:
+            # below the counting transports, replayed requests are timed and traced like real ones
+            self._sync_transport = cassette.http_transport(self._sync_transport)
+        self._async_transport: Optional[httpx.AsyncBaseTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.http_client = httpx.Client(transport=self._counted_transport(), timeout=timeout)
+        self.http_async_client = httpx.AsyncClient(transport=self._counted_async_transport(),
+                                                   timeout=timeout)
+
+
+    def stats(self) -> Dict[str, int]:
+        connections = self._connection_count(self._sync_transport)
+        if self._async_transport is not None:
+            connections += self._connection_count(self._async_transport)
+        return {
+            'connections': connections,
+            'in_flight': self.in_flight,
+            'requests': self.requests
+        }
+
+
+    def _async_transport_for_loop(self) -> httpx.AsyncBaseTransport:
+        """
+        the async pool of the running loop. The pool of an old loop is dropped, not closed,
+        its connections can only be closed on the loop they were opened on.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                self._loop = loop
+                self._async_transport = httpx.AsyncHTTPTransport(limits=self.limits)
+                cassette = Cassette()
+                if cassette.enabled:
+                    self._async_transport = cassette.http_async_transport(self._async_transport)
+            return self._async_transport
+
+
+    def _started(self, request: httpx.Request) -> Tuple[float, Span]:
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+        span = Tracer().start_span('llm.request', deployment=self.name,
+                                   request_bytes=len(request.content))
+        return time.monotonic(), span
+
+    def _finished(self, started: Tuple[float, Span], status_code: Any) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        started_at, span = started
+        Metrics().observe_llm_request(self.name, time.monotonic() - started_at, status_code)
+        failed = status_code == 'error' or status_code >= 400
+        span.end(status='error' if failed else None, status_code=status_code)
+
+
+    def _counted_transport(self) -> httpx.BaseTransport:
+        pool = self
+
+        class CountedTransport(httpx.BaseTransport):
+            def handle_request(self, request: httpx.Request) -> httpx.Response:
+                started = pool._started(request)
+                try:
+                    response = pool._sync_transport.handle_request(request)
+                except BaseException:
+                    pool._finished(started, 'error')
+                    raise
+                response.stream = _CountedStream(
+                    response.stream, lambda: pool._finished(started, response.status_code))
+                return response
+
+            def close(self) -> None:
+                pool._sync_transport.close()
+
+        return CountedTransport()
+
+
+    def _counted_async_transport(self) -> httpx.AsyncBaseTransport:
+        pool = self
+
+        class CountedAsyncTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+                started = pool._started(request)
+                try:
+                    transport = pool._async_transport_for_loop()
+                    response = await transport.handle_async_request(request)
+                except BaseException:
+                    pool._finished(started, 'error')
+                    raise
+                response.stream = _CountedAsyncStream(
+                    response.stream, lambda: pool._finished(started, response.status_code))
+                return response
+
+            async def aclose(self) -> None:
+                if pool._loop is asyncio.get_running_loop():
+                    await pool._async_transport.aclose()
+
+        return CountedAsyncTransport()
+
+
+    @staticmethod
+    def _connection_count(transport: httpx.BaseTransport | httpx.AsyncBaseTransport) -> int:
+        # httpx does not expose pool statistics, read them from the underlying httpcore pool
+        connection_pool = getattr(transport, '_pool', None)
+        return len(getattr(connection_pool, 'connections', []))
+
+
+class PromptCacheUsage(BaseCallbackHandler):
+    """
+    Records cached versus uncached prompt tokens of every chat model call, per static prompt prefix.
+
+    A call is attributed to the prefix its system message starts with, `name@version`, calls without
+    a known prefix to 'other'. Cached tokens are the provider's `cache_read` input token details.
+    Token counts per deployment also go to Metrics.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started: Dict[UUID, Tuple[str, float, str]] = {}
+        self._usage: Dict[str, Dict[str, float]] = {}
+        self._prefixes = [(f"{name}@{PROMPT_PREFIX_VERSIONS[name]}", prefix.strip())
+                          for name, prefix in STATIC_PROMPT_PREFIXES.items()]
+
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[BaseMessage]], *,
+                            run_id: UUID, **kwargs: Any) -> None:
+        prefix = self._prefix_of(messages[0] if messages else [])
+        invocation_params = kwargs.get('invocation_params') or {}
+        deployment = (invocation_params.get('azure_deployment') or invocation_params.get('model')
+                      or 'unknown')
+        with self._lock:
+            self._started[run_id] = (prefix, time.monotonic(), deployment)
+
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            prefix, started, deployment = self._started.pop(
+                run_id, ('other', time.monotonic(), 'unknown'))
+
+        usage_metadata = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, 'message', None)
+                usage_metadata = getattr(message, 'usage_metadata', None) or usage_metadata
+
+        input_tokens = usage_metadata.get('input_tokens', 0)
+        cached_tokens = (usage_metadata.get('input_token_details') or {}).get('cache_read', 0) or 0
+        Metrics().observe_llm_tokens(deployment, input_tokens, cached_tokens,
+                                     usage_metadata.get('output_tokens', 0))
+
+        with self._lock:
+            usage = self._usage.setdefault(prefix, {
+                'calls': 0, 'cache_hit_calls': 0, 'input_tokens': 0, 'cached_input_tokens': 0,
+                'uncached_input_tokens': 0, 'output_tokens': 0, 'seconds': 0.0
+            })
+            usage['calls'] += 1
+            usage['cache_hit_calls'] += 1 if cached_tokens else 0
+            usage['input_tokens'] += input_tokens
+            usage['cached_input_tokens'] += cached_tokens
+            usage['uncached_input_tokens'] += input_tokens - cached_tokens
+            usage['output_tokens'] += usage_metadata.get('output_tokens', 0)
+            usage['seconds'] += time.monotonic() - started
+
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._started.pop(run_id, None)
+
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        per prompt prefix: calls, cached and uncached input tokens, cache hit ratio
+        and average call latency.
+        """
+        with self._lock:
+            usage = {prefix: dict(values) for prefix, values in self._usage.items()}
+
+        for values in usage.values():
+            input_tokens = values['input_tokens']
+            values['cached_ratio'] = (round(values['cached_input_tokens'] / input_tokens, 3)
+                                      if input_tokens else 0.0)
+            values['average_seconds'] = round(values.pop('seconds') / values['calls'], 3)
+        return usage
+
+
+    def _prefix_of(self, messages: List[BaseMessage]) -> str:
+        system_prompt = next((m.content for m in messages
+                              if m.type == 'system' and isinstance(m.content, str)), '')
+        system_prompt = system_prompt.strip()
+        for prefix, text in self._prefixes:
+            if system_prompt.startswith(text):
+                return prefix
+        return 'other'
+
+
+class LLMGateway:
+    """
+    Process-wide provider of LLM clients sharing keep-alive connection pools.
+
+    One DeploymentPool per deployment is shared by the LangChain (AzureChatOpenAI),
+    smolagents (OpenAIServerModel) and agent_framework (AzureOpenAIChatClient) clients,
+    so HTTP connections and TLS sessions are reused across calls, nodes and tools.
+
+    Usage:
+        llm = LLMGateway().chat_model()
+        print(LLMGateway().stats())
+        print(LLMGateway().prompt_cache_usage.stats())
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(LLMGateway, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.limits = httpx.Limits(
+            max_connections=config.llm_max_connections_per_deployment,
+            max_keepalive_connections=config.llm_max_keepalive_connections_per_deployment,
+            keepalive_expiry=config.llm_keepalive_expiry_seconds
+        )
+        self.timeout = httpx.Timeout(config.llm_request_timeout_seconds, connect=10.0)
+        self._pools: Dict[str, DeploymentPool] = {}
+        self._clients: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+        self.prompt_cache_usage = PromptCacheUsage()
+
+
+    def pool(self, deployment_name: str) -> DeploymentPool:
+        with self._lock:
+            if deployment_name not in self._pools:
+                self._pools[deployment_name] = DeploymentPool(deployment_name, self.limits,
+                                                              self.timeout)
+            return self._pools[deployment_name]
+
+
+    def chat_model(self, deployment_name: Optional[str] = None,
+                   temperature: float = 0.0) -> AzureChatOpenAI:
+        """LangChain chat model, instances are cached per deployment and temperature."""
+        config = Config()
+        deployment_name = deployment_name or config.azure_openai_deployment_name
+
+        def create() -> AzureChatOpenAI:
+            pool = self.pool(deployment_name)
+            return AzureChatOpenAI(
+                deployment_name=deployment_name,
+                model=config.azure_openai_model_name,
+                api_version=config.azure_openai_api_version,
+                temperature=temperature,
+                http_client=pool.http_client,
+                http_async_client=pool.http_async_client,
+                # report usage on streamed responses too, cached prompt tokens are part of it
+                stream_usage=True,
+                callbacks=[self.prompt_cache_usage]
+            )
+
+        return self._cached(('langchain', deployment_name, temperature), create)
+
+
+    def smol_model(self, deployment_name: Optional[str] = None) -> Any:
+        """smolagents OpenAIServerModel against the Foundry endpoint."""
+        from smolagents import OpenAIServerModel
+
+        config = Config()
+        deployment_name = deployment_name or config.azure_openai_deployment_name
+
+        def create() -> OpenAIServerModel:
+            return OpenAIServerModel(
+                model_id=deployment_name,
+                api_base=config.foundry_endpoint,
+                api_key=config.azure_openai_api_key,
+                client_kwargs={'http_client': self.pool(deployment_name).http_client}
+            )
+
+        return self._cached(('smolagents', deployment_name), create)
+
+
+    def agent_framework_chat_client(self, deployment_name: str,
+                                    api_version: Optional[str] = None) -> Any:
+        """agent_framework AzureOpenAIChatClient backed by a shared async OpenAI client."""
+        from agent_framework.azure import AzureOpenAIChatClient
+        from openai import AsyncAzureOpenAI
+
+        config = Config()
+        api_version = api_version or config.azure_openai_api_version
+
+        def create() -> AzureOpenAIChatClient:
+            if config.azure_openai_api_key:
+                credentials = {'api_key': config.azure_openai_api_key}
+            else:
+                credentials = {'azure_ad_token_provider': self._token_provider()}
+            async_client = AsyncAzureOpenAI(
+                azure_endpoint=config.azure_openai_endpoint,
+                api_version=api_version,
+                http_client=self.pool(deployment_name).http_async_client,
+                **credentials
+            )
+            return AzureOpenAIChatClient(
+                deployment_name=deployment_name,
+                api_version=api_version,
+                async_client=async_client
+            )
+
+        return self._cached(('agent_framework', deployment_name, api_version), create)
+
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """per deployment: open connections, requests in flight and total requests."""
+        with self._lock:
+            pools = list(self._pools.values())
+        return {pool.name: pool.stats() for pool in pools}
+
+
+    def _cached(self, key: Tuple, create: Callable[[], Any]) -> Any:
+        with self._lock:
+            client = self._clients.get(key)
+        if client is None:
+            client = create()
+            with self._lock:
+                client = self._clients.setdefault(key, client)
+        return client
+
+
+    def _token_provider(self) -> Callable[[], str]:
+        from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+        return get_bearer_token_provider(DefaultAzureCredential(),
+                                         "https://cognitiveservices.azure.com/.default")
@@ -0,0 +1,279 @@
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import functools
+import os
+import resource
+import threading
+import time
+
+from langgraph.errors import GraphInterrupt
+
+from agents.tracing import Tracer
+
+
+# seconds, from a fast LLM call to a long running deployment
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError()
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Labels, float]]] = None):
+        """`collect` reads the values at scrape time instead of counting them with inc()."""
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._collect = collect
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        if self._collect:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [(self.name, self._labels(key), value) for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[Labels, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> Iterable[Sample]:
+        if self._collect:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [(self.name, self._labels(key), value) for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: count per bucket (the last one is +Inf), sum, count
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = {key: (list(counts), total[0]) for key, (counts, total) in self._values.items()}
+
+        samples = []
+        for key, (counts, total) in values.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class Metrics:
+    """
+    Process-wide metrics in the Prometheus text exposition format, served by /metrics.
+
+    Recording is a dict update under a per metric lock, values that already exist elsewhere
+    (CPU time, thread count, queue depth) are read only when scraped.
+
+    Usage:
+        Metrics().observe_tool('AzShell', seconds, 'succeeded')
+        Metrics().register(Gauge('name', 'help', collect=lambda: {(): 1.0}))
+        text = Metrics().render()
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(Metrics, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+        self.node_duration = self.register(Histogram('lena_node_duration_seconds', 'LangGraph node run time', ['node', 'status']))
+        self.tool_duration = self.register(Histogram('lena_tool_duration_seconds', 'Tool call time', ['tool', 'status']))
+        self.workflow_duration = self.register(Histogram('lena_workflow_run_duration_seconds', 'Workflow run time, until finished or waiting for input', ['status']))
+        self.llm_request_duration = self.register(Histogram('lena_llm_request_duration_seconds', 'LLM HTTP request time, until the response body is read', ['deployment', 'status_code']))
+        self.llm_tokens = self.register(Counter('lena_llm_tokens_total', 'LLM tokens of LangChain calls, kind: input, cached_input or output', ['deployment', 'kind']))
+        self.process_duration = self.register(Histogram('lena_subprocess_duration_seconds', 'Subprocess wall time', ['program']))
+        self.process_exits = self.register(Counter('lena_subprocess_exits_total', 'Finished subprocesses by exit code, timeout when killed after the timeout', ['program', 'exit_code']))
+        self.register(Counter('lena_subprocess_cpu_seconds_total', 'CPU time of all finished subprocesses', ['mode'],
+                              collect=lambda: _rusage(resource.RUSAGE_CHILDREN)))
+        self.register(Counter('lena_process_cpu_seconds_total', 'CPU time of the server process', ['mode'],
+                              collect=lambda: _rusage(resource.RUSAGE_SELF)))
+        self.register(Gauge('lena_active_threads', 'Python threads alive, including to_thread workers',
+                            collect=lambda: {(): float(threading.active_count())}))
+
+
+    def register(self, metric: _Metric) -> _Metric:
+        """adds the metric, or returns the one already registered under its name."""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+
+    def observe_node(self, node: str, seconds: float, status: str) -> None:
+        self.node_duration.observe(seconds, node=node, status=status)
+
+    def observe_tool(self, tool: str, seconds: float, status: str) -> None:
+        self.tool_duration.observe(seconds, tool=tool, status=status)
+
+    def observe_workflow(self, seconds: float, status: str) -> None:
+        self.workflow_duration.observe(seconds, status=status)
+
+    def observe_llm_request(self, deployment: str, seconds: float, status_code: Any) -> None:
+        self.llm_request_duration.observe(seconds, deployment=deployment, status_code=status_code)
+
+    def observe_llm_tokens(self, deployment: str, input_tokens: int, cached_input_tokens: int, output_tokens: int) -> None:
+        self.llm_tokens.inc(input_tokens, deployment=deployment, kind='input')
+        self.llm_tokens.inc(cached_input_tokens, deployment=deployment, kind='cached_input')
+        self.llm_tokens.inc(output_tokens, deployment=deployment, kind='output')
+
+    def observe_process(self, command: str, seconds: float, exit_code: Optional[int], timed_out: bool) -> None:
+        program = command_program(command)
+        self.process_duration.observe(seconds, program=program)
+        self.process_exits.inc(program=program, exit_code='timeout' if timed_out else exit_code)
+
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation, help=True)}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text else f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_node(name: str, node: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    wraps an async graph node to record its run time and trace it as a span,
+    the signature is kept for LangGraph's config injection.
+    """
+
+    @functools.wraps(node)
+    async def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        status = 'error'
+        try:
+            with Tracer().span('node', node=name):
+                result = await node(*args, **kwargs)
+            status = 'ok'
+            return result
+        except GraphInterrupt:
+            status = 'interrupted'
+            raise
+        finally:
+            Metrics().observe_node(name, time.monotonic() - started, status)
+
+    return wrapper
+
+
+def instrument_tool(name: str) -> Callable:
+    """
+    decorator for a tool's async run method, records its run time and traces it as a span.
+    The status is the result's `is_successful` when it has one.
+    """
+
+    def decorator(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            status = 'error'
+            input_chars = sum(len(value) for value in list(args[1:]) + list(kwargs.values()) if isinstance(value, str))
+            try:
+                with Tracer().span('tool', tool=name, input_chars=input_chars) as span:
+                    result = await method(*args, **kwargs)
+                    is_successful = getattr(result, 'is_successful', True)
+                    status = 'succeeded' if is_successful else 'failed'
+                    span.set(result_status=status)
+                return result
+            finally:
+                Metrics().observe_tool(name, time.monotonic() - started, status)
+
+        return wrapper
+
+    return decorator
+
+
+def _rusage(who: int) -> Dict[Labels, float]:
+    usage = resource.getrusage(who)
+    return {('user',): usage.ru_utime, ('system',): usage.ru_stime}
+
+
+def command_program(command: str) -> str:
+    """the executable of a command line, keeps the program label to a small set of values."""
+    words = command.split(maxsplit=1)
+    program = os.path.basename(words[0]) if words else ''
+    return program if program.replace('-', '').replace('_', '').replace('.', '').isalnum() and len(program) <= 32 else 'other'
+
+
+def _escape(value: str, help: bool = False) -> str:
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    return value if help else value.replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(float(value))
@@ -0,0 +1,68 @@
+from typing import Any, Dict, Optional
+import hashlib
+
+from agents.cache import LRUTTLCache
+from config import Config
+
+
+class NodeResultCache:
+    """
+    Memoizes LLM results of graph nodes (optimize_prompt, plan_tasks).
+
+    Keys combine the node name, the model deployment, the system prompt version and the
+    whitespace-normalized input prompt, so editing a system prompt or switching deployment
+    never serves a stale result.
+    Entries live in memory, with SQLite backing when NODE_CACHE_PATH is set.
+
+    Usage:
+        cache = NodeResultCache()
+        key = cache.key('plan_tasks', prompt, task_planner_system_prompt)
+        output = cache.get(key)
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(NodeResultCache, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.enabled = config.node_cache_enabled
+        self.deployment_name = config.azure_openai_deployment_name
+        self.store = LRUTTLCache(
+            max_entries=config.node_cache_max_entries,
+            ttl_seconds=config.node_cache_ttl_seconds,
+            db_path=config.node_cache_path or None
+        )
+
+
+    @staticmethod
+    def prompt_version(system_prompt: str) -> str:
+        return hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:12]
+
+
+    def key(self, node: str, prompt: str, system_prompt: str) -> str:
+        normalized = ' '.join(prompt.split())
+        raw = '\n'.join([node, self.deployment_name, self.prompt_version(system_prompt), normalized])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        return self.store.get(key)
+
+
+    def set(self, key: str, value: Any) -> None:
+        if self.enabled:
+            self.store.set(key, value)
+
+
+    def stats(self) -> Dict[str, int]:
+        return self.store.stats()
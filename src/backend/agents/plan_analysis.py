@@ -0,0 +1,112 @@
+from pathlib import Path
+from typing import Dict
+import json
+import os
+import threading
+
+from agents.state import TaskPlan
+from agents.task_graph import topological_order
+from config import Config
+
+
+class TaskTimingHistory:
+    """
+    Historical task durations per task type, kept as exponential moving average in a JSON file.
+
+    Estimates fall back to `default_seconds` for task types that never ran.
+    """
+
+    default_seconds: Dict[str, float] = {
+        'az_cli': 60.0,
+        'bash': 10.0,
+        'python': 90.0,
+        'deep_research': 180.0
+    }
+
+    # weight of the newest sample in the moving average
+    smoothing = 0.2
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(TaskTimingHistory, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        self.path = Config().task_timing_history_path
+        self._lock = threading.Lock()
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._timings = json.load(f)
+            except (OSError, ValueError):
+                self._timings = {}
+
+
+    def estimate(self, task_type: str) -> float:
+        timing = self._timings.get(task_type)
+        if timing:
+            return timing['average_seconds']
+        return self.default_seconds.get(task_type, 60.0)
+
+
+    def record(self, task_type: str, seconds: float) -> None:
+        with self._lock:
+            timing = self._timings.get(task_type)
+            if timing is None:
+                timing = {'average_seconds': seconds, 'count': 0}
+            else:
+                timing['average_seconds'] += self.smoothing * (seconds - timing['average_seconds'])
+            timing['count'] += 1
+            self._timings[task_type] = timing
+            self._save()
+
+
+    def _save(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._timings, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def annotate_plan(task_plan: TaskPlan, history: TaskTimingHistory = None) -> TaskPlan:
+    """
+    Annotates the plan with its estimated total duration (all tasks sequential) and
+    critical path duration (longest dependency chain), using historical per-task-type timings.
+    """
+    history = history or TaskTimingHistory()
+    dependencies = task_plan.dependency_graph()
+    estimates = {task.task_id: history.estimate(task.task_type) for task in task_plan.tasks}
+
+    # longest finish time of each task, assuming it starts once all its dependencies finished
+    finish: Dict[str, float] = {}
+    previous: Dict[str, str] = {}
+    for task_id in topological_order(dependencies):
+        start = 0.0
+        for dependency in dependencies[task_id]:
+            if dependency in finish and finish[dependency] > start:
+                start = finish[dependency]
+                previous[task_id] = dependency
+        finish[task_id] = start + estimates.get(task_id, 0.0)
+
+    critical_path = []
+    if finish:
+        task_id = max(finish, key=finish.get)
+        while task_id is not None:
+            critical_path.append(task_id)
+            task_id = previous.get(task_id)
+        critical_path.reverse()
+
+    task_plan.estimated_total_seconds = sum(estimates.values())
+    task_plan.estimated_critical_path_seconds = max(finish.values(), default=0.0)
+    task_plan.critical_path = critical_path
+
+    return task_plan
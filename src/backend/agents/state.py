@@ -1,12 +1,14 @@
 from click import Option
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, model_validator
 from typing import Literal, Annotated, List, Optional, Any, Dict
+from functools import lru_cache
 from langchain_core.messages import BaseMessage
-from langgraph.graph.message import add_messages
 
 import os, sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
+from agents.task_graph import find_cycle, find_unknown_dependencies
+from agents.history import add_messages_bounded
 
 
 ###### base classes
@@ -25,9 +27,23 @@ class AzCliToolCodeResult(ToolResult):
 class AzShellToolInput(BaseModel):
     command: str = Field(description="The bash or Azure CLI command to execute.")
 
+class SpilledOutput(BaseModel):
+    """handle to a command output spilled to disk, read pages with SpilledOutputReader."""
+    path: str = Field(description="The file holding the full output")
+    size_bytes: int = Field(default=0, description="Size of the full output in bytes")
+    line_count: int = Field(default=0, description="Number of lines in the full output")
+    head: str = Field(default='', description="The first lines of the output")
+    tail: str = Field(default='', description="The last lines of the output")
+
 class AzShellToolExecutionResult(ToolResult):
-    stdout: Optional[str] = Field(description="The output of the executed shell command.")
+    stdout: Optional[str] = Field(description="The output of the executed shell command. None when the output was spilled to disk.")
+    stdout_spill: Optional[SpilledOutput] = Field(default=None, description="Handle to the full stdout when it exceeded the spill threshold.")
     stderr: Optional[str] = Field(default=None, description="The error output of the executed shell command.")
+    exit_code: Optional[int] = Field(default=None, description="The exit code of the shell command, negative if killed by a signal.")
+    timed_out: bool = Field(default=False, description="True if the command was killed after exceeding the timeout.")
+    wall_time_seconds: float = Field(default=0.0, description="Wall time of the shell command in seconds.")
+    stdout_bytes: int = Field(default=0, description="Number of bytes the command wrote to stdout.")
+    stderr_bytes: int = Field(default=0, description="Number of bytes the command wrote to stderr.")
 
 ###### bash tool
 class BashToolInput(BaseModel):
@@ -87,10 +103,40 @@ class TaskPlannerTaskOutput(BaseModel):
     description: str = Field(default="", description="Brief description of the task")
     task_type: Literal['az_cli', 'python', 'deep_research', 'bash'] = Field(default='az_cli'),
     prompt: str = Field(default="", description="The prompt describing the task to be accomplished")
+    depends_on: List[str] = Field(default=[], description="task_ids of the tasks that must complete before this task can start. Empty if the task can start immediately")
 
 class TaskPlannerOutput(BaseModel):
     tasks: List[TaskPlannerTaskOutput] = Field(default=[], description="List of planned tasks")
 
+    @model_validator(mode='after')
+    def validate_dependencies(self) -> 'TaskPlannerOutput':
+        """rejects duplicate task_ids, dependencies on unknown tasks and dependency cycles."""
+        task_ids = [task.task_id for task in self.tasks]
+        duplicates = sorted({task_id for task_id in task_ids if task_ids.count(task_id) > 1})
+        if duplicates:
+            raise ValueError(f"duplicate task_id(s): {', '.join(duplicates)}")
+
+        dependencies = {task.task_id: task.depends_on for task in self.tasks}
+
+        unknown = find_unknown_dependencies(dependencies)
+        if unknown:
+            details = '; '.join(f"task {t} depends on {', '.join(d)}" for t, d in unknown.items())
+            raise ValueError(f"depends_on references unknown task_id(s): {details}")
+
+        cycle = find_cycle(dependencies)
+        if cycle:
+            raise ValueError(f"depends_on forms a cycle: {' -> '.join(cycle)}")
+
+        return self
+
+class IntentClassification(BaseModel):
+    intent: Literal['question', 'action', 'unsupported'] = Field(description="question: information only, action: something must be done, unsupported: impossible or out of scope")
+    reason: str = Field(default="", description="One sentence explaining the classification")
+
+class TaskPlannerFusedOutput(TaskPlannerOutput):
+    """prompt optimization and task planning answered by a single model call."""
+    optimized_prompt: str = Field(default="", description="The user prompt enhanced for planning, with placeholders for unknown Azure parameters")
+
 class MissingParameters(BaseModel):
     name: str = Field(default="", description="The name of the missing parameter")
     value: Optional[str] = Field(default=None, description="The value provided for the missing parameter")
@@ -103,6 +149,18 @@ class MissingParameterContext(BaseModel):
     missing_parameters: List[MissingParameters] = Field(default=[], description="List of missing parameters for this step")
 
 
+class BlobRef(BaseModel):
+    """reference to a payload kept in the BlobStore instead of the checkpointed state."""
+    digest: str = Field(description="sha256 of the stored payload")
+    size_bytes: int = Field(default=0, description="Size of the stored payload in bytes")
+    summary: str = Field(default='', description="Short human readable summary of the payload")
+
+
+# Task fields holding tool payloads that can grow with command output, offloaded to the BlobStore when large
+OFFLOADABLE_RESULT_FIELDS = ('az_cli_execution_result', 'bash_execution_result', 'python_execution_result', 'deep_research_result')
+SUMMARY_MAX_CHARS = 500
+
+
 class Task(BaseModel):
     """
     - task_type: "az_cli" | "python", "deep_research", "bash"
@@ -111,12 +169,18 @@ class Task(BaseModel):
     description: str = Field(default="", description="Brief description of the task")
     task_type: Literal['az_cli', 'python', 'deep_research', 'bash'] = Field(default='az_cli'),
     prompt: str = Field(default="", description="The prompt describing the task to be accomplished")
+    depends_on: List[str] = Field(default=[], description="task_ids of the tasks that must succeed before this task runs")
+    status: Literal['pending', 'running', 'succeeded', 'failed', 'skipped'] = Field(default='pending', description="The execution status of the task")
+    error: Optional[str] = Field(default=None, description="Why the task failed or was skipped")
+    duration_seconds: Optional[float] = Field(default=None, description="Wall time of the task execution in seconds")
     bash_commands: Optional[List[str]] = Field(default=[], description="The generated bash command(s) for this task. Empty if task is not bash step")
     az_cli_commands: Optional[List[str]] = Field(default=[], description="The generated Azure CLI command(s) for this task. Empty if task is not Azure CLI step")
     az_cli_execution_result: Optional[List[AzShellToolExecutionResult]] = Field(default=None, description="The execution result of the Azure CLI commands for this task")
     bash_execution_result: Optional[List[AzShellToolExecutionResult]] = Field(default=None, description="The execution result of the bash commands for this task")
     python_execution_result: Optional[CodeToolExecutionResult] = Field(default=None, description="The execution result of the python code for this task")
     deep_research_result: Optional[DeepResearchToolExecutionResult] = Field(default=None, description="The result of the deep web research for this task")
+    result_refs: Dict[str, BlobRef] = Field(default={}, description="Execution result field name -> blob holding its payload, for results offloaded to the BlobStore")
+    _loaded_results: Dict[str, Any] = PrivateAttr(default_factory=dict)
 
     #tool_execution_result: Optional[Dict[Literal['az_cli', 'python', 'deep_research', 'bash'], AzShellToolExecutionResult | CodeToolExecutionResult | DeepResearchToolExecutionResult]] = Field(default={}, description="The result from the tool execution for this task")
     # az_cli_tool_result: AzCliToolResult = Field(default=AzCliToolResult(), description="Azure CLI commands from tool based on user prompt")
@@ -128,9 +192,96 @@ class Task(BaseModel):
     # python: Optional[str] = Field(default="", description="The generated Python code snippet for this step. Empty if task is Azure CLI step")
     missing_parameter_context: Optional[MissingParameterContext] = Field(default=None, description="A dictionary describing what info is needed for each missing parameter")
 
+    def offload_results(self) -> None:
+        """
+        Moves execution results larger than the blob store threshold out of the task,
+        leaving a BlobRef with a summary so checkpoints do not grow with tool output.
+        """
+        from agents.blob_store import BlobStore
+        store = BlobStore()
+
+        for name in OFFLOADABLE_RESULT_FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            data = self._result_adapter(name).dump_json(value, fallback=str)
+            if len(data) <= store.threshold_bytes:
+                continue
+            self.result_refs[name] = BlobRef(digest=store.put(data), size_bytes=len(data), summary=_summarize_result(value))
+            self._loaded_results[name] = value
+            setattr(self, name, None)
+
+    def execution_result(self, name: str) -> Any:
+        """
+        the execution result in field `name`, read from the blob store on first access when it was
+        offloaded. None when its blob was pruned, only the summary in result_refs is left of it.
+        """
+        value = getattr(self, name)
+        if value is not None or name not in self.result_refs:
+            return value
+
+        if name not in self._loaded_results:
+            from agents.blob_store import BlobStore
+            try:
+                data = BlobStore().get(self.result_refs[name].digest)
+            except FileNotFoundError:
+                return None
+            self._loaded_results[name] = self._result_adapter(name).validate_json(data)
+        return self._loaded_results[name]
+
+    def with_execution_results(self) -> 'Task':
+        """a copy with the offloaded execution results read back, to serve the task to clients."""
+        if not self.result_refs:
+            return self
+        results = {name: self.execution_result(name) for name in self.result_refs}
+        return self.model_copy(update=results)
+
+    @staticmethod
+    def _result_adapter(name: str) -> TypeAdapter:
+        return _result_adapter(name)
+
+
+@lru_cache(maxsize=None)
+def _result_adapter(name: str) -> TypeAdapter:
+    return TypeAdapter(Task.model_fields[name].annotation)
+
+
+def _summarize_result(value: Any) -> str:
+    if isinstance(value, list):
+        exit_codes = ', '.join(str(r.exit_code) for r in value)
+        stdout_bytes = sum(r.stdout_bytes for r in value)
+        last_output = next((r.stderr or r.stdout for r in reversed(value) if r.stderr or r.stdout), '') or ''
+        summary = f"{len(value)} command(s), exit codes: {exit_codes}, stdout: {stdout_bytes} bytes. {last_output[-SUMMARY_MAX_CHARS:]}"
+    elif isinstance(value, CodeToolExecutionResult):
+        result = value.result.result if isinstance(value.result, CodeAgentActionOutput) else value.result
+        summary = f"{len(value.action_steps or [])} step(s), successful: {value.is_successful}. {result}"
+    elif isinstance(value, DeepResearchToolExecutionResult):
+        summary = value.result
+    else:
+        summary = str(value)
+    return summary[:SUMMARY_MAX_CHARS]
+
 
 class TaskPlan(BaseModel):
     tasks: List[Task] = Field(default=[], description="List of tasks in the execution plan")
+    estimated_total_seconds: Optional[float] = Field(default=None, description="Estimated duration when all tasks run one after another")
+    estimated_critical_path_seconds: Optional[float] = Field(default=None, description="Estimated duration of the longest dependency chain, the lower bound with unlimited concurrency")
+    critical_path: List[str] = Field(default=[], description="task_ids of the longest dependency chain by estimated duration")
+
+    def with_execution_results(self) -> 'TaskPlan':
+        tasks = [task.with_execution_results() for task in self.tasks]
+        return self.model_copy(update={'tasks': tasks})
+
+    def dependency_graph(self) -> Dict[str, List[str]]:
+        """
+        task_id -> task_ids it depends on.
+        Plans without any depends_on are treated as a chain in list order, their order is the only dependency information.
+        """
+        if not any(task.depends_on for task in self.tasks):
+            task_ids = [task.task_id for task in self.tasks]
+            return {task_id: task_ids[i - 1:i] for i, task_id in enumerate(task_ids)}
+
+        return {task.task_id: list(task.depends_on) for task in self.tasks}
     
     def task_results(self) -> Dict[str, Any]:
         results = {}
@@ -157,12 +308,20 @@ class Scratchpad(BaseModel):
     resolved_prompt: str = Field(default="", description="The resolved prompt with resolved Azure resource values")
     #missing_azure_values_in_prompt: MissingAzureValuesInPrompt = Field(default=MissingAzureValuesInPrompt(), description="A dictionary containing the missing information filled in by the user")
     #notes: dict = Field(default={}, description="A dict to hold general info or observations during workflow execution")
+    intent: Optional[Literal['question', 'action', 'unsupported']] = Field(default=None, description="The intent of the original prompt, decided by the intent router")
+    intent_reason: str = Field(default="", description="Why the prompt was routed to its intent, shown to the user when rejected")
+    answer: str = Field(default="", description="The direct answer for question prompts, which skip planning")
+    planning_mode: Optional[Literal['two_step', 'fused']] = Field(default=None, description="two_step optimizes the prompt then plans, fused does both in one model call. None uses Config.planning_mode")
     task_plan: TaskPlan = Field(default=TaskPlan(), description="The execution plan containing all tasks")
 
+    def with_execution_results(self) -> 'Scratchpad':
+        """a copy with the offloaded results of all tasks read back, checkpoints keep BlobRefs."""
+        return self.model_copy(update={'task_plan': self.task_plan.with_execution_results()})
+
 
 from config import Config
 class ExecutionState(BaseModel):
     username: str = Field(default="", description="The username of the person initiating the agent")
     tread_id: str = Field(default="", description="The LangGraph thread id associated with this execution")
     scratchpad: Scratchpad = Field(default=Scratchpad(), description="The scratchpad for temporary notes and observations")
-    messages: Annotated[list[BaseMessage], Field(default=[], description="Conversation history"), add_messages]
\ No newline at end of file
+    messages: Annotated[list[BaseMessage], Field(default=[], description="Conversation history, bounded by HistoryPolicy"), add_messages_bounded]
\ No newline at end of file
@@ -1,36 +1,214 @@
-from langchain_openai import AzureChatOpenAI
-from state import ExecutionState, Task
-from tools.az_cli import AzCliToolResult 
+from langchain_core.runnables import RunnableConfig
+from agents.state import ExecutionState, Task, TaskPlan
+from agents.tools.az_login import AzLoginManager, AzureIdentity
+from agents.tools.az_shell import AzShell
+from agents.tools.bash_session import BashSessionPool
+from agents.tools.code import CodeTool
+from agents.tools.deep_research import DeepResearchTool
+from agents.plan_analysis import TaskTimingHistory
+from agents.events import aemit_tool_output
+from agents.tracing import Tracer
+from config import Config
+from typing import Dict, List
+import asyncio
+import os
+import time
 
 
 class TaskExecutionOverseer:
-    
-    def run(self, execution_state: ExecutionState) -> None:
-
-
-        for task in execution_state.scratchpad.task_plan.tasks:
-            
-            # "az_cli" | "python", "deep_research", "bash"
-
-            if task.task_type == 'az_cli':
-                # execute az cli command
-                pass
-            elif task.task_type == 'python':
-                # execute python code
-                pass
-            elif task.task_type == 'deep_research':
-                # perform deep research
-                pass
-            elif task.task_type == 'bash':
-                # execute bash command
-                pass
-        
+    """
+    Executes a task plan as a dependency graph.
+
+    - a task starts as soon as all tasks in its `depends_on` have succeeded, independent tasks run concurrently
+    - concurrency is capped per task type by `Config.task_type_concurrency`
+    - when a task fails, every task depending on it directly or transitively is skipped
+    - az_cli and bash tasks without commands fail, tasks whose command generation failed never run
+    - plans without any `depends_on` run in list order, as their order is the only dependency information
+    """
+
+    async def run(self, execution_state: ExecutionState, config: RunnableConfig) -> dict:
+
+        thread_id = config['configurable']['thread_id']
+
+        await self.execute_plan(execution_state.scratchpad.task_plan, thread_id, execution_state.username)
+
         return {
             'scratchpad': execution_state.scratchpad,
             'messages': []
         }
-    
-    def _run_az_cli_task(self, task: Task) -> Task:
-        az_cli_tool = task.tool
 
-        
\ No newline at end of file
+
+    async def execute_plan(self, task_plan: TaskPlan, thread_id: str, username: str) -> TaskPlan:
+
+        dependencies = task_plan.dependency_graph()
+        tasks_by_id: Dict[str, Task] = {task.task_id: task for task in task_plan.tasks}
+
+        semaphores = {task_type: asyncio.Semaphore(limit) for task_type, limit in Config().task_type_concurrency.items()}
+        running: Dict[asyncio.Task, Task] = {}
+
+        try:
+            while True:
+                self._skip_blocked_tasks(task_plan, dependencies, tasks_by_id)
+
+                for task in self._ready_tasks(task_plan, dependencies, tasks_by_id):
+                    task.status = 'running'
+                    runner = asyncio.create_task(self._run_task(task, semaphores[task.task_type], thread_id, username))
+                    running[runner] = task
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for runner in done:
+                    running.pop(runner)
+        finally:
+            # cancelled run (client gone, job cancelled): stop the commands still running, their process groups are killed
+            for runner in running:
+                runner.cancel()
+            await asyncio.gather(*running.keys(), return_exceptions=True)
+
+        # tasks still pending never became ready, their dependencies form a cycle
+        for task in task_plan.tasks:
+            if task.status == 'pending':
+                task.status = 'skipped'
+                task.error = 'dependency cycle, waits on: ' + ', '.join(dependencies[task.task_id])
+
+        return task_plan
+
+
+    def _ready_tasks(self, task_plan: TaskPlan, dependencies: Dict[str, List[str]], tasks_by_id: Dict[str, Task]) -> List[Task]:
+        return [
+            task for task in task_plan.tasks
+            if task.status == 'pending'
+            and all(tasks_by_id[d].status == 'succeeded' for d in dependencies[task.task_id])
+        ]
+
+
+    def _skip_blocked_tasks(self, task_plan: TaskPlan, dependencies: Dict[str, List[str]], tasks_by_id: Dict[str, Task]) -> None:
+        """skip pending tasks with an unknown, failed or skipped dependency, until no more tasks get skipped."""
+        changed = True
+        while changed:
+            changed = False
+            for task in task_plan.tasks:
+                if task.status != 'pending':
+                    continue
+
+                unknown = [d for d in dependencies[task.task_id] if d not in tasks_by_id]
+                blocked = [d for d in dependencies[task.task_id]
+                           if d in tasks_by_id and tasks_by_id[d].status in ('failed', 'skipped')]
+
+                if unknown:
+                    task.error = 'depends on unknown task(s): ' + ', '.join(unknown)
+                elif blocked:
+                    task.error = 'dependency did not succeed: ' + ', '.join(blocked)
+                else:
+                    continue
+
+                task.status = 'skipped'
+                changed = True
+
+
+    async def _run_task(self, task: Task, semaphore: asyncio.Semaphore, thread_id: str, username: str) -> Task:
+        # the span includes waiting for the task type's concurrency slot
+        with Tracer().span('task', task_id=task.task_id, task_type=task.task_type,
+                           command_count=len(task.az_cli_commands or []) + len(task.bash_commands or [])) as span:
+            async with semaphore:
+                started = time.monotonic()
+                await aemit_tool_output(self.__class__.__name__, {'task_id': task.task_id, 'status': task.status})
+                try:
+                    agent_cwd = self._agent_cwd(thread_id, username)
+
+                    if task.task_type == 'az_cli':
+                        is_successful = await self._run_az_cli_task(task, agent_cwd)
+                    elif task.task_type == 'python':
+                        is_successful = await self._run_python_task(task, agent_cwd)
+                    elif task.task_type == 'deep_research':
+                        is_successful = await self._run_deep_research_task(task)
+                    elif task.task_type == 'bash':
+                        is_successful = await self._run_bash_task(task, thread_id, agent_cwd)
+                    else:
+                        raise ValueError(f"unsupported task type '{task.task_type}'")
+
+                    task.status = 'succeeded' if is_successful else 'failed'
+
+                except Exception as e:
+                    task.status = 'failed'
+                    task.error = str(e)
+
+                finally:
+                    task.duration_seconds = time.monotonic() - started
+
+                try:
+                    await asyncio.to_thread(task.offload_results)
+                except OSError:
+                    # results stay inline in the checkpoint when the blob store is not writable
+                    pass
+
+                if task.status == 'succeeded':
+                    await asyncio.to_thread(TaskTimingHistory().record, task.task_type, task.duration_seconds)
+
+                await aemit_tool_output(self.__class__.__name__, {'task_id': task.task_id, 'status': task.status, 'error': task.error})
+
+            span.set(task_status=task.status, duration_seconds=task.duration_seconds)
+
+        return task
+
+
+    async def _run_az_cli_task(self, task: Task, agent_cwd: str) -> bool:
+        if not task.az_cli_commands:
+            task.error = task.error or 'no az cli commands were generated'
+            return False
+
+        az_shell = AzShell(working_dir=agent_cwd)
+        task.az_cli_execution_result = []
+
+        for command in task.az_cli_commands:
+            result = await az_shell._arun(command, timeout=Config().az_cli_command_timeout_seconds)
+            task.az_cli_execution_result.append(result)
+            if not result.is_successful:
+                task.error = result.error
+                return False
+
+        return True
+
+
+    async def _run_bash_task(self, task: Task, thread_id: str, agent_cwd: str) -> bool:
+        """all commands of a bash task run in the thread's warm bash session, so cd and exports carry over."""
+        if not task.bash_commands:
+            task.error = task.error or 'no bash commands were generated'
+            return False
+
+        config = Config()
+        env = await AzLoginManager().env_for(AzureIdentity.from_config())
+
+        task.bash_execution_result = await BashSessionPool().run_commands(
+            thread_id,
+            task.bash_commands,
+            cwd=agent_cwd,
+            env=env,
+            timeout=config.bash_command_timeout_seconds
+        )
+
+        failed = [r for r in task.bash_execution_result if not r.is_successful]
+        if failed:
+            task.error = failed[0].error
+        return not failed
+
+
+    async def _run_python_task(self, task: Task, agent_cwd: str) -> bool:
+        code_tool = CodeTool(Config())
+        task.python_execution_result = await code_tool._arun(prompt=task.prompt, agent_cwd=agent_cwd)
+        return task.python_execution_result.is_successful
+
+
+    async def _run_deep_research_task(self, task: Task) -> bool:
+        task.deep_research_result = await DeepResearchTool()._arun(task.prompt)
+        task.error = task.deep_research_result.error or None
+        return task.deep_research_result.is_successful
+
+
+    def _agent_cwd(self, thread_id: str, username: str) -> str:
+        config = Config()
+        agent_cwd = os.path.join(config.agent_cwd, username, thread_id)
+        config.ensure_cwd_exists(agent_cwd)
+        return agent_cwd
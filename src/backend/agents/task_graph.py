@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional
+
+
+def find_unknown_dependencies(dependencies: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """returns task_id -> dependencies that reference no task in the graph."""
+    unknown = {}
+    for task_id, depends_on in dependencies.items():
+        missing = [d for d in depends_on if d not in dependencies]
+        if missing:
+            unknown[task_id] = missing
+    return unknown
+
+
+def find_cycle(dependencies: Dict[str, List[str]]) -> Optional[List[str]]:
+    """returns the task_ids of one dependency cycle, closed with its first task_id, or None if the graph is acyclic."""
+    visiting, done = set(), set()
+    path: List[str] = []
+
+    def visit(task_id: str) -> Optional[List[str]]:
+        visiting.add(task_id)
+        path.append(task_id)
+        for dependency in dependencies.get(task_id, []):
+            if dependency in visiting:
+                return path[path.index(dependency):] + [dependency]
+            if dependency not in done and dependency in dependencies:
+                cycle = visit(dependency)
+                if cycle:
+                    return cycle
+        visiting.remove(task_id)
+        path.pop()
+        done.add(task_id)
+        return None
+
+    for task_id in dependencies:
+        if task_id not in done:
+            cycle = visit(task_id)
+            if cycle:
+                return cycle
+    return None
+
+
+def topological_order(dependencies: Dict[str, List[str]]) -> List[str]:
+    """task_ids ordered so every task comes after its dependencies, the graph must be acyclic."""
+    order: List[str] = []
+    done = set()
+
+    def visit(task_id: str) -> None:
+        if task_id in done:
+            return
+        done.add(task_id)
+        for dependency in dependencies.get(task_id, []):
+            if dependency in dependencies:
+                visit(dependency)
+        order.append(task_id)
+
+    for task_id in dependencies:
+        visit(task_id)
+    return order
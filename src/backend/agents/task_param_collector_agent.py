@@ -83,13 +83,9 @@ class ValueResolverAgent:
 
         messages = ChatPromptTemplate.from_messages(
             [
-                SystemMessage(
-                    content=update_user_prompt_with_filled_values_system_prompt.format(
-                        user_prompt=user_prompt,
-                        filled_values=filled_values
-                    )
-                ),
-                HumanMessage(content="update original prompt using the previously missing Azure values and filled Azure values.")
+                SystemMessage(content=update_user_prompt_with_filled_values_system_prompt),
+                HumanMessage(content=f"Original user prompt: {user_prompt}\nFilled Azure values: {json.dumps(filled_values)}\n\n"
+                                     "update original prompt using the previously missing Azure values and filled Azure values.")
             ]
         )
 
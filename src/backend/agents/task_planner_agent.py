@@ -1,80 +1,317 @@
 from langchain_openai import AzureChatOpenAI
 from pydantic import BaseModel
-from state import ExecutionState
 from utils import Util
-from state import Task
-from agents.prompt import task_planner_system_prompt, task_planner_prompt_optimizer
-from agents.tools.az_cli import AzCliTool, AzCliToolCodeResult
-from agents.tools.bash import BashTool, BashToolCodeResult
+from agents.prompt import task_planner_system_prompt, task_planner_prompt_optimizer, task_planner_fused_system_prompt
+from agents.tools.az_cli import AzCliTool
+from agents.tools.bash import BashTool
 from agents.state import (ExecutionState,
-                          TaskPlannerOutput, TaskPlan, Task,
+                          TaskPlannerOutput, TaskPlannerFusedOutput, TaskPlannerTaskOutput, TaskPlan, Task, ToolResult,
                           AzCliToolCodeResult,
                           BashToolCodeResult)
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk, SystemMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate
-from typing import Any, Dict
+from langchain_core.tools import BaseTool
+from langchain_core.exceptions import OutputParserException
+from langchain_core.utils.json import parse_partial_json
+from pydantic import ValidationError
+from agents.plan_analysis import annotate_plan
+from agents.node_cache import NodeResultCache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from config import Config
 import asyncio
+import json
 
 
 class UserPromptOptimizerStructuredOutput(BaseModel):
     optimized_prompt: str
 
 
+class CommandGenerator:
+    """
+    Generates az_cli and bash commands for tasks concurrently, bounded by `command_generation_concurrency`.
+
+    Generations are keyed by task type and prompt: a task submitted while the plan is still streaming
+    is not generated again when the complete plan is applied, as long as the planner kept its prompt.
+    """
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(Config().command_generation_concurrency)
+        self.az_cli_tool = AzCliTool()
+        self.bash_tool = BashTool()
+        self._generations: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+    def submit(self, task_type: str, prompt: str) -> Optional[asyncio.Task]:
+        """starts generating commands for the task in the background, None for task types without commands."""
+        if task_type not in ('az_cli', 'bash'):
+            return None
+
+        key = (task_type, prompt)
+        if key not in self._generations:
+            self._generations[key] = asyncio.create_task(self._generate(task_type, prompt))
+        return self._generations[key]
+
+
+    async def apply(self, task_plan: TaskPlan) -> None:
+        """
+        Sets the commands of all az_cli and bash tasks of the plan, reusing generations already submitted.
+        A task whose generation fails or returns no commands is marked failed with the reason,
+        the other tasks are not affected and its dependents are skipped at execution.
+        """
+        generations = {task.task_id: self.submit(task.task_type, task.prompt) for task in task_plan.tasks}
+        generations = {task_id: generation for task_id, generation in generations.items() if generation is not None}
+        used = set(generations.values())
+
+        # tasks the planner dropped or rewrote after they were submitted
+        for generation in self._generations.values():
+            if generation not in used:
+                generation.cancel()
+
+        await asyncio.gather(*generations.values())
+
+        for task in task_plan.tasks:
+            if task.task_id not in generations:
+                continue
+            result: ToolResult = generations[task.task_id].result()
+            if task.task_type == 'az_cli':
+                task.az_cli_commands = result.commands
+            else:
+                task.bash_commands = result.commands
+
+            if not result.is_successful or not result.commands:
+                task.status = 'failed'
+                task.error = f"command generation failed: {result.error or 'no commands generated'}"
+
+
+    def cancel(self) -> None:
+        for generation in self._generations.values():
+            generation.cancel()
+
+
+    async def _generate(self, task_type: str, prompt: str) -> ToolResult:
+        async with self.semaphore:
+            if task_type == 'az_cli':
+                return await self._generate_commands(self.az_cli_tool, prompt, AzCliToolCodeResult)
+            return await self._generate_commands(self.bash_tool, prompt, BashToolCodeResult)
+
+
+    async def _generate_commands(self, tool: BaseTool, prompt: str, result_type: Type[ToolResult]) -> ToolResult:
+        try:
+            return await tool.arun({'prompt': prompt})
+        except Exception as e:
+            return result_type(is_successful=False, commands=[], error=str(e))
+
+
 class TaskPlanner:
     
-    def plan_tasks(self, execution_state: ExecutionState) -> Dict[str, Any]:
+    async def plan_tasks(self, execution_state: ExecutionState) -> Dict[str, Any]:
 
         assert execution_state.scratchpad.optimized_prompt is not None, "Optimized prompt is required"
 
-        llm : AzureChatOpenAI = Util.gpt_4o()
-        llm = llm.with_structured_output(TaskPlannerOutput)
-        
-        messages = ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(content=task_planner_system_prompt),
-                HumanMessage(content=execution_state.scratchpad.optimized_prompt)
-            ]   
-        )
+        node_cache = NodeResultCache()
+        cache_key = node_cache.key('plan_tasks', execution_state.scratchpad.optimized_prompt, task_planner_system_prompt)
+        cached_output = node_cache.get(cache_key)
+
+        command_generator = CommandGenerator()
+        try:
+            if cached_output is not None:
+                task_planner_tasks = TaskPlannerOutput.model_validate(cached_output)
+            else:
+                task_planner_tasks: TaskPlannerOutput = await self._invoke_planner(
+                    execution_state.scratchpad.optimized_prompt, command_generator=command_generator)
+                node_cache.set(cache_key, task_planner_tasks.model_dump())
+
+            execution_state.scratchpad.task_plan = await self._prepare_task_plan(task_planner_tasks, command_generator)
+        finally:
+            command_generator.cancel()
+
+        return {
+            'scratchpad': execution_state.scratchpad,
+            'messages': [AIMessage(content=self._task_plan_summary(execution_state.scratchpad.task_plan))]
+        }
 
-        chain = messages | llm
 
-        task_planner_tasks: TaskPlannerOutput = chain.invoke({})
+    async def plan_tasks_fused(self, execution_state: ExecutionState) -> Dict[str, Any]:
+        """optimize_prompt and plan_tasks in a single structured output call."""
 
-        task_plan = self._create_task_plan_from_output(task_planner_tasks)
+        node_cache = NodeResultCache()
+        cache_key = node_cache.key('plan_tasks_fused', execution_state.scratchpad.original_prompt, task_planner_fused_system_prompt)
+        cached_output = node_cache.get(cache_key)
 
-        asyncio.run(self._generate_az_cli_bash_commands_from_prompt(task_plan))
+        command_generator = CommandGenerator()
+        try:
+            if cached_output is not None:
+                fused_output = TaskPlannerFusedOutput.model_validate(cached_output)
+            else:
+                fused_output: TaskPlannerFusedOutput = await self._invoke_planner(
+                    execution_state.scratchpad.original_prompt, TaskPlannerFusedOutput, task_planner_fused_system_prompt,
+                    command_generator=command_generator)
+                node_cache.set(cache_key, fused_output.model_dump())
 
-        execution_state.scratchpad.task_plan = task_plan
+            execution_state.scratchpad.optimized_prompt = fused_output.optimized_prompt
+            execution_state.scratchpad.task_plan = await self._prepare_task_plan(fused_output, command_generator)
+        finally:
+            command_generator.cancel()
 
         return {
-            'execution_state': execution_state,
-            'messages': [AIMessage(content=task_plan.model_dump_json(indent=2))]
+            'scratchpad': execution_state.scratchpad,
+            'messages': [
+                AIMessage(content='optimized_prompt: ' + fused_output.optimized_prompt),
+                AIMessage(content=self._task_plan_summary(execution_state.scratchpad.task_plan))
+            ]
         }
+
+
+    def route_planning_mode(self, execution_state: ExecutionState) -> str:
+        """graph router: the first planning node for the request's planning mode."""
+        planning_mode = execution_state.scratchpad.planning_mode or Config().planning_mode
+        return 'plan_tasks_fused' if planning_mode == 'fused' else 'optimize_prompt'
+
+
+    async def _prepare_task_plan(self, task_planner_output: TaskPlannerOutput,
+                                 command_generator: Optional[CommandGenerator] = None) -> TaskPlan:
+        task_plan = self._create_task_plan_from_output(task_planner_output)
+
+        annotate_plan(task_plan)
+
+        await (command_generator or CommandGenerator()).apply(task_plan)
+
+        return task_plan
     
     
-    def optimize_user_prompt(self, execution_state: ExecutionState) -> str:
+    def _task_plan_summary(self, task_plan: TaskPlan) -> str:
+        """one line per task for the message history, the full plan lives in the scratchpad."""
+        lines = [f"task plan with {len(task_plan.tasks)} task(s):"]
+        for task in task_plan.tasks:
+            depends_on = f" after {', '.join(task.depends_on)}" if task.depends_on else ''
+            lines.append(f"{task.task_id} [{task.task_type}]{depends_on}: {task.description}")
+        return '\n'.join(lines)
+
+
+    async def _invoke_planner(self, prompt: str,
+                              output_type: Type[TaskPlannerOutput] = TaskPlannerOutput,
+                              system_prompt: str = task_planner_system_prompt,
+                              command_generator: Optional[CommandGenerator] = None) -> TaskPlannerOutput:
+        """
+        Plans tasks with structured output, a plan rejected by validation (unknown depends_on, cycles)
+        is sent back to the model with the validation error, up to `planner_max_attempts` times.
+
+        With a `command_generator` and `planner_streaming_enabled`, the plan is streamed and each task is
+        submitted for command generation as soon as the model has finished writing it.
+        """
+        llm : AzureChatOpenAI = Util.gpt_4o()
+        stream = command_generator is not None and Config().planner_streaming_enabled
+        if not stream:
+            llm = llm.with_structured_output(output_type)
+
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=prompt)
+        ]
+
+        max_attempts = Config().planner_max_attempts
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                if stream:
+                    return await self._astream_planner(llm, messages, output_type, command_generator.submit)
+                chain = ChatPromptTemplate.from_messages(messages) | llm
+                return await chain.ainvoke({})
+            except (ValidationError, OutputParserException) as e:
+                if attempt == max_attempts:
+                    raise
+                messages = messages + [
+                    HumanMessage(content=f"The task plan was rejected: {e}\nReturn a corrected task plan.")
+                ]
+
+
+    async def _astream_planner(self, llm: AzureChatOpenAI, messages: List[BaseMessage],
+                               output_type: Type[TaskPlannerOutput],
+                               on_task: Callable[[str, str], Any]) -> TaskPlannerOutput:
+        """
+        Streams the plan as the arguments of a forced tool call and calls `on_task(task_type, prompt)`
+        for every task once it is complete, i.e. once the model started writing the next one, or the plan ended.
+        """
+        llm = llm.bind_tools([output_type], tool_choice=output_type.__name__)
+
+        arguments = ''
+        submitted = 0
+
+        async for chunk in llm.astream(messages):
+            chunk: AIMessageChunk
+            chunk_arguments = ''.join(c.get('args') or '' for c in chunk.tool_call_chunks)
+            arguments += chunk_arguments
+
+            # a task is complete once the next one opens, skip parsing chunks that open no object
+            if '{' not in chunk_arguments:
+                continue
+
+            partial = parse_partial_json(arguments)
+            tasks = partial.get('tasks') if isinstance(partial, dict) else None
+            if not isinstance(tasks, list):
+                continue
+
+            while submitted < len(tasks) - 1:
+                self._submit_streamed_task(tasks[submitted], on_task)
+                submitted += 1
+
+        if not arguments:
+            raise OutputParserException("the planner returned no task plan")
+
+        try:
+            output = output_type.model_validate(json.loads(arguments))
+        except json.JSONDecodeError as e:
+            raise OutputParserException(f"the task plan is not valid JSON: {e}")
+
+        for task in output.tasks[submitted:]:
+            on_task(task.task_type, task.prompt)
+
+        return output
+
+
+    def _submit_streamed_task(self, task: Any, on_task: Callable[[str, str], Any]) -> None:
+        try:
+            task = TaskPlannerTaskOutput.model_validate(task)
+        except ValidationError:
+            # generated after the plan is complete instead
+            return
+        on_task(task.task_type, task.prompt)
+
+
+    async def optimize_user_prompt(self, execution_state: ExecutionState) -> Dict[str, Any]:
+
+        node_cache = NodeResultCache()
+        cache_key = node_cache.key('optimize_prompt', execution_state.scratchpad.original_prompt, task_planner_prompt_optimizer)
+        optimized_prompt = node_cache.get(cache_key)
+
+        if optimized_prompt is None:
+            optimized_prompt = await self._invoke_prompt_optimizer(execution_state.scratchpad.original_prompt)
+            node_cache.set(cache_key, optimized_prompt)
+
+        execution_state.scratchpad.optimized_prompt = optimized_prompt
+
+        return {
+            'scratchpad': execution_state.scratchpad,
+            'messages': [AIMessage(content='optimized_prompt: ' + optimized_prompt)]
+        }
+
+
+    async def _invoke_prompt_optimizer(self, original_prompt: str) -> str:
         llm : AzureChatOpenAI = Util.gpt_4o()
         llm = llm.with_structured_output(UserPromptOptimizerStructuredOutput)
 
         messages = ChatPromptTemplate.from_messages(
             [
                 SystemMessage(content=task_planner_prompt_optimizer),
-                HumanMessage(content=execution_state.scratchpad.original_prompt)
+                HumanMessage(content=original_prompt)
             ]   
         )
 
         chain = messages | llm
 
-        output: UserPromptOptimizerStructuredOutput = chain.invoke({})
+        output: UserPromptOptimizerStructuredOutput = await chain.ainvoke({})
 
-        optimized_prompt = output.optimized_prompt
-
-        execution_state.scratchpad.optimized_prompt = optimized_prompt
-
-        return {
-            'execution_state': execution_state,
-            'messages': [AIMessage(content='optimized_prompt: ' + optimized_prompt)]
-        }
+        return output.optimized_prompt
     
 
     def _create_task_plan_from_output(self, task_planner_output: TaskPlannerOutput) -> TaskPlan:
@@ -84,22 +321,8 @@ class TaskPlanner:
                 task_id=task_output.task_id,
                 description=task_output.description,
                 task_type=task_output.task_type,
-                prompt=task_output.prompt
+                prompt=task_output.prompt,
+                depends_on=task_output.depends_on
             )
             task_plan.tasks.append(task)
         return task_plan
-    
-
-    async def _generate_az_cli_bash_commands_from_prompt(self, task_plan: TaskPlan) -> str:
-        
-        for task in task_plan.tasks:  
-
-            if task.task_type == 'az_cli':
-                az_cli_tool = AzCliTool()
-                result: AzCliToolCodeResult = await az_cli_tool.arun({'prompt': task.prompt})
-                task.az_cli_commands = result.commands
-
-            elif task.task_type == 'bash':
-                bash_tool = BashTool()
-                result: BashToolCodeResult = await bash_tool.arun({'prompt': task.prompt})
-                task.bash_commands = result.commands
\ No newline at end of file
@@ -1,9 +1,4 @@
-from contextlib import asynccontextmanager
 import json
-from typing import AsyncGenerator
-from langchain_mcp_adapters.tools import load_mcp_tools
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from pydantic import BaseModel, Field
 from langchain_core.tools import BaseTool
 from typing import Type
@@ -12,7 +7,12 @@ import os, sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
 
-from state import AzCliToolCodeResult, AzureCliToolInput
+from agents.state import AzCliToolCodeResult, AzureCliToolInput
+from agents.tools.mcp_pool import McpSessionPool, azure_mcp_server_params
+from agents.tools.command_cache import CommandCache
+from agents.metrics import instrument_tool
+from agents.tracing import Tracer
+from config import Config
 
 class AzCliTool(BaseTool):
     name: str = "azure_cli_generate"
@@ -42,28 +42,31 @@ class AzCliTool(BaseTool):
         raise NotImplementedError("Synchronous code generation is not implemented.")
 
 
+    @instrument_tool('AzCliTool')
     async def _arun(self, prompt: str) -> AzCliToolCodeResult:
         """Asynchronously generate Azure CLI command from the given prompt."""
 
         az_cli_mcp_tool_name = "extension_cli_generate"
 
-        async with self.az_mcp_session() as session:
+        cache = CommandCache.for_tool(self.name) if Config().command_cache_enabled else None
+        cached_commands = cache.get(prompt) if cache else None
+        if cached_commands is not None:
+            return AzCliToolCodeResult(prompt=prompt, is_successful=True, commands=cached_commands)
 
-            # Load the MCP tools into a list of LangChain BaseTool objects
-            langchain_tools: list[BaseTool] = await load_mcp_tools(session)
+        pool = McpSessionPool.get('azure', azure_mcp_server_params)
 
-            # Format tools for Azure OpenAI
-            tools = [tool for tool in langchain_tools if tool.name == az_cli_mcp_tool_name]
+        async with pool.session() as session:
 
-            assert tools, "Error at Azure MCP tools, no Azure CLI generation tool found."
-            assert len(tools) == 1, "Error at Azure MCP tools, expected exactly one Azure CLI generation tool."
+            azcli = session.tools.get(az_cli_mcp_tool_name)
 
-            azcli = tools[0]
+            assert azcli is not None, "Error at Azure MCP tools, no Azure CLI generation tool found."
 
-            mcp_result = await azcli.ainvoke(input={
-                    "intent": prompt,
-                    "cli-type": "az"
-                })
+            with Tracer().span('mcp.request', mcp_tool=az_cli_mcp_tool_name, input_chars=len(prompt)) as span:
+                mcp_result = await azcli.ainvoke(input={
+                        "intent": prompt,
+                        "cli-type": "az"
+                    })
+                span.set(output_chars=sum(len(r.get('text', '')) for r in mcp_result))
 
             result = AzCliToolCodeResult(prompt=prompt)
             
@@ -77,34 +80,10 @@ class AzCliTool(BaseTool):
                     for cs in cd.get('commandSet', []):
                         result.commands.append(cs.get('example', ''))
 
-            return result
-        
-        
-    @asynccontextmanager
-    async def az_mcp_session(self) -> AsyncGenerator[ClientSession, None]:
-        """
-        Context manager that provides an MCP ClientSession.
-        
-        Usage:
-            async with az_mcp_session() as session:
-                # Use the session here
-        
-        Yields:
-            ClientSession: The MCP ClientSession
-        """
-        
-        server_params = StdioServerParameters(
-                command="npx",
-                args=["-y", "@azure/mcp@latest", "server", "start"],
-                env=None
-        )
-
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                yield session
-
+            if cache and result.is_successful:
+                cache.set(prompt, result.commands)
 
+            return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from pydantic import BaseModel, Field
+
+import os, sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, parent_dir)
+from config import Config
+from agents.tracing import Tracer
+from agents.cassette import Cassette
+
+
+class AzureIdentity(BaseModel):
+    tenant_id: str = Field(description="The Entra ID tenant of the service principal")
+    client_id: str = Field(description="The client id of the service principal")
+    client_secret: str = Field(repr=False, description="The client secret of the service principal")
+
+    @staticmethod
+    def from_config() -> 'AzureIdentity':
+        config = Config()
+        return AzureIdentity(
+            tenant_id=config.tenant_id,
+            client_id=config.client_id,
+            client_secret=config.client_secret
+        )
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.tenant_id, self.client_id)
+
+
+class AzLoginError(RuntimeError):
+    pass
+
+
+class AzLoginManager:
+    """
+    Logs in to Azure once per identity (tenant, client_id) instead of once per command.
+
+    Each identity gets its own AZURE_CONFIG_DIR under AZ_LOGIN_CONFIG_ROOT, outside the agent
+    working directory, so concurrent workflows of different identities never overwrite each
+    other's login state or token cache.
+    The client secret goes to `az login` through stdin, never on its command line.
+    The login is refreshed when the access token is within `refresh_margin_seconds` of expiry.
+
+    Usage:
+        env = await AzLoginManager().env_for(AzureIdentity.from_config())
+        # run az commands with env
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(AzLoginManager, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.config_root = config.az_login_config_root
+        self.refresh_margin_seconds = config.az_login_refresh_margin_seconds
+        self.login_timeout_seconds = config.az_login_timeout_seconds
+        self._expires_on: Dict[Tuple[str, str], float] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+    def config_dir(self, identity: AzureIdentity) -> str:
+        digest = hashlib.sha256(f'{identity.tenant_id}:{identity.client_id}'.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.config_root, digest)
+
+
+    async def env_for(self, identity: AzureIdentity) -> Dict[str, str]:
+        """returns the process environment to run az commands as the given identity, logging in if needed."""
+        await self.ensure_logged_in(identity)
+        env = os.environ.copy()
+        env['AZURE_CONFIG_DIR'] = self.config_dir(identity)
+        return env
+
+
+    async def ensure_logged_in(self, identity: AzureIdentity) -> None:
+        if Cassette().replaying:
+            # replayed commands need no login, and logins are never recorded
+            return
+
+        async with self._lock_for(identity):
+            expires_on = self._expires_on.get(identity.key, 0.0)
+            if time.time() < expires_on - self.refresh_margin_seconds:
+                return
+
+            config_dir = self.config_dir(identity)
+            Path(self.config_root).mkdir(parents=True, exist_ok=True, mode=0o700)
+            Path(config_dir).mkdir(parents=True, exist_ok=True, mode=0o700)
+
+            await self._login(identity, config_dir)
+            self._expires_on[identity.key] = await self._token_expires_on(config_dir)
+
+
+    def logout(self, identity: AzureIdentity) -> None:
+        """forget the login so the next command logs in again."""
+        self._expires_on.pop(identity.key, None)
+
+
+    def _lock_for(self, identity: AzureIdentity) -> asyncio.Lock:
+        # asyncio locks are bound to an event loop, recreate them when used from a new loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._locks = {}
+        if identity.key not in self._locks:
+            self._locks[identity.key] = asyncio.Lock()
+        return self._locks[identity.key]
+
+
+    async def _login(self, identity: AzureIdentity, config_dir: str) -> None:
+        # az reads '@<file>' argument values from the file: the secret is piped to stdin,
+        # it never shows in the process list or /proc/<pid>/cmdline
+        _, stderr, returncode = await self._run_az(config_dir,
+            'login', '--service-principal',
+            '--username', identity.client_id,
+            '--password', '@/dev/stdin',
+            '--tenant', identity.tenant_id,
+            '--output', 'none',
+            input=identity.client_secret.encode())
+
+        if returncode != 0:
+            raise AzLoginError(f"az login failed for client id {identity.client_id}: {stderr.strip()}")
+
+
+    async def _token_expires_on(self, config_dir: str) -> float:
+        """returns the expiry of the current access token as POSIX timestamp, defaults to 1 hour from now."""
+        default_expires_on = time.time() + 3600
+
+        stdout, _, returncode = await self._run_az(config_dir, 'account', 'get-access-token', '--output', 'json')
+        if returncode != 0:
+            return default_expires_on
+
+        try:
+            token = json.loads(stdout)
+            if 'expires_on' in token:
+                return float(token['expires_on'])
+            return datetime.fromisoformat(token['expiresOn']).timestamp()
+        except (ValueError, KeyError, TypeError):
+            return default_expires_on
+
+
+    async def _run_az(self, config_dir: str, *args: str,
+                      input: Optional[bytes] = None) -> Tuple[str, str, int]:
+        env = os.environ.copy()
+        env['AZURE_CONFIG_DIR'] = config_dir
+
+        # only the sub command is traced
+        with Tracer().span('subprocess', program='az', subcommand=args[0]) as span:
+            stdout, stderr, returncode = await self._communicate_az(env, *args, input=input)
+            span.set(exit_code=returncode, stdout_bytes=len(stdout))
+        return stdout, stderr, returncode
+
+
+    async def _communicate_az(self, env: Dict[str, str], *args: str,
+                              input: Optional[bytes] = None) -> Tuple[str, str, int]:
+        process = await asyncio.create_subprocess_exec(
+            'az', *args,
+            stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(input),
+                                                    timeout=self.login_timeout_seconds)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise AzLoginError(f"az {args[0]} timed out after {self.login_timeout_seconds} seconds")
+
+        return stdout.decode(), stderr.decode(), process.returncode
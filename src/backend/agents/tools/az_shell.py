@@ -1,18 +1,23 @@
 import asyncio
-from asyncio.subprocess import Process
-from typing import Optional, Tuple
-from click import command
+from typing import AsyncIterator, Optional
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import os
 from langchain_core.tools import BaseTool
 from typing import Type
-import subprocess
 
 import os, sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
-from state import AzShellToolInput, AzShellToolResult
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, parent_dir)
+from agents.state import AzShellToolInput, AzShellToolExecutionResult
+from agents.tools.az_login import AzLoginManager, AzureIdentity
+from agents.tools.process import AsyncProcess, ProcessOutputLine
+from agents.tools.output_store import OutputSpooler
+from agents.events import aemit_tool_output
+from agents.metrics import instrument_tool
+from config import Config
 
 load_dotenv()
 
@@ -36,7 +41,9 @@ class AzShell(BaseTool):
     Use this tool to directly execute commands on Azure cloud or local system. No authentication needed - shell is already logged into Azure.
     """
     args_schema: Type[BaseModel] = AzShellToolInput
-    response_format: Type[BaseModel] = AzShellToolResult
+    response_format: Type[BaseModel] = AzShellToolExecutionResult
+    identity: Optional[AzureIdentity] = Field(default=None, description="The identity to run az commands as, defaults to the service principal in Config")
+    working_dir: Optional[str] = Field(default=None, description="The thread's working directory, commands run in it and large outputs are spilled under it")
 
     # def __init__(self):
     #     self.client_id = os.getenv("AZURE_CLIENT_ID")
@@ -60,66 +67,107 @@ class AzShell(BaseTool):
         raise NotImplementedError("Synchronous code generation is not implemented.")
 
 
-    async def _arun(self, command: str, timeout: Optional[int] = 60) -> str:
-        """Asynchronously generate Azure CLI command from the given prompt."""
+    @instrument_tool('AzShell')
+    async def _arun(self, command: str, timeout: Optional[int] = 60) -> AzShellToolExecutionResult:
         """
-        Execute a command synchronously and return the output as a string.
-        Waits for the command to complete before returning.
+        Execute a command asynchronously and return the output when it completes.
         
         Args:
             command: The shell command to execute
-            timeout: Optional timeout in seconds  default 5 (raises TimeoutError if exceeded)
+            timeout: Optional timeout in seconds, the command's process group is killed when exceeded
         
         Returns:
-            Command output as string (stdout). If there's stderr, it's included.
-        
-        Raises:
-            TimeoutError: If command exceeds timeout
-            RuntimeError: If command returns non-zero exit code
+            AzShellToolExecutionResult with stdout, stderr, exit code, wall time and byte counts.
         """
-        
 
-        try:
-
-            # Azure authn with service principal
-            client_id = os.getenv("AZURE_CLIENT_ID")
-            client_secret = os.getenv("AZURE_CLIENT_SECRET")
-            tenant_id = os.getenv("AZURE_TENANT_ID")
-            
-            # subscription_id = os.getenv("AZURE_SUBSCRIPTION_ID")
-            az_login = f"az login --service-principal -u {client_id} -p {client_secret} --tenant {tenant_id} --output none"
-
-            command_to_run = az_login + ';' + command
-
-            # Start an interactive bash shell
-            process = subprocess.Popen(
-                command_to_run,
-                shell=True,
-                executable='/bin/bash',
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            stdout, stderr = process.communicate(timeout=timeout)
-
-            shell_result = AzShellToolResult(
-                is_successful=True if not stderr else False,
-                stdout=stdout,
-                error=stderr
-            )
-
-            return shell_result
+        stdout = OutputSpooler(self._spill_dir(), Config().output_spill_threshold_bytes)
+        stderr = []
 
+        try:
+            process = await self._spawn(command, timeout)
+
+            streamed_lines = 0
+            max_streamed_lines = Config().tool_output_stream_max_lines
+
+            async for output in process.stream():
+                if output.stream == 'stdout':
+                    stdout.write_line(output.line, continuation=output.continuation)
+                elif output.continuation and stderr:
+                    stderr[-1] += output.line
+                else:
+                    stderr.append(output.line)
+
+                # progress for SSE clients, capped so huge outputs don't flood the event stream
+                if streamed_lines < max_streamed_lines:
+                    streamed_lines += 1
+                    await aemit_tool_output(self.name, {'command': command, 'stream': output.stream,
+                                                        'line': output.line,
+                                                        'continuation': output.continuation})
+
+            stdout_text, stdout_spill = stdout.finish()
+            result = self._to_result(process, stdout_text, '\n'.join(stderr))
+            result.stdout_spill = stdout_spill
+            return result
 
         except Exception as e:
-            return AzShellToolResult(
-                    success=False,
-                    stdout='',
-                    stderr=str(e)
+            stdout_text, stdout_spill = stdout.finish()
+            return AzShellToolExecutionResult(
+                    is_successful=False,
+                    stdout=stdout_text,
+                    stdout_spill=stdout_spill,
+                    stderr='\n'.join(stderr),
+                    error=str(e)
                 )
 
 
+    async def stream_command(self, command: str, timeout: Optional[int] = 60) -> AsyncIterator[ProcessOutputLine | AzShellToolExecutionResult]:
+        """
+        Execute a command and stream stdout/stderr line by line as ProcessOutputLine,
+        pieces of over-long lines are marked as continuation.
+        The last item yielded is the AzShellToolExecutionResult, with stdout/stderr left empty as they were streamed.
+
+        Usage:
+            async for item in AzShell().stream_command("az vm list -o table"):
+                if isinstance(item, ProcessOutputLine): ...
+        """
+        process = await self._spawn(command, timeout)
+
+        async for output in process.stream():
+            yield output
+
+        yield self._to_result(process, '', '')
+
+
+    async def _spawn(self, command: str, timeout: Optional[int]) -> AsyncProcess:
+        # logged in once per identity, az commands run with the identity's own AZURE_CONFIG_DIR
+        env = await AzLoginManager().env_for(self.identity or AzureIdentity.from_config())
+        return AsyncProcess(command, timeout=timeout, env=env, cwd=self.working_dir)
+
+
+    def _spill_dir(self) -> str:
+        return os.path.join(self.working_dir or Config().agent_cwd, '.outputs')
+
+
+    def _to_result(self, process: AsyncProcess, stdout: str, stderr: str) -> AzShellToolExecutionResult:
+        process_result = process.result
+
+        error = stderr
+        if process_result.timed_out:
+            error = f"command timed out after {process.timeout} seconds and was killed.\n{stderr}".strip()
+
+        return AzShellToolExecutionResult(
+            is_successful=process_result.exit_code == 0 and not process_result.timed_out,
+            stdout=stdout,
+            stderr=stderr,
+            error=error,
+            exit_code=process_result.exit_code,
+            timed_out=process_result.timed_out,
+            wall_time_seconds=process_result.wall_time_seconds,
+            stdout_bytes=process_result.stdout_bytes,
+            stderr_bytes=process_result.stderr_bytes
+        )
+
+
     # async def _get_stdout_stderr(self, process: Process, timeout: float) -> Tuple[bool, str, str]:
     #     """
     #     Helper function to read stdout and stderr with timeout.
@@ -189,7 +237,7 @@ if __name__ == "__main__":
 
         result = await az_shell.ainvoke(command_2, timeout=60)
 
-        print("Success:", result.success)
+        print("Success:", result.is_successful)
         print("STDOUT:", result.stdout)
         print("STDERR:", result.stderr)
 
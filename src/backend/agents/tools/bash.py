@@ -5,11 +5,15 @@ from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from typing import List, Optional, List, Type
 from agents.utils import Util
+from agents.tools.command_cache import CommandCache
+from agents.metrics import instrument_tool
+from agents.prompt import bash_command_generator_system_prompt
 
 import os, sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
-from state import BashToolInput, BashToolCodeResult
+from agents.state import BashToolInput, BashToolCodeResult
+from config import Config
 
 class BashToolStructuredOutput(BaseModel):
     commands: List[str] = Field(description="The generated bash command based on the prompt.")
@@ -28,53 +32,39 @@ class BashTool(BaseTool):
         raise NotImplementedError("Synchronous code generation is not implemented.")
 
 
+    @instrument_tool('BashTool')
     async def _arun(self, prompt: str) -> BashToolCodeResult:
         """Asynchronously generate bash command from the given prompt.""" 
         
         try:
 
+            cache = CommandCache.for_tool(self.name) if Config().command_cache_enabled else None
+            cached_commands = cache.get(prompt) if cache else None
+            if cached_commands is not None:
+                return BashToolCodeResult(
+                    is_successful=True,
+                    commands=cached_commands,
+                    error="")
+
             llm : AzureChatOpenAI = Util.gpt_4o()
             llm = llm.with_structured_output(BashToolStructuredOutput)
             
             messages = ChatPromptTemplate.from_messages(
                 [
-                    SystemMessage(content="""
-                    You are a Linux bash command generator.
-                                
-                    <Key Requirements>
-                    1. Generate one or a list of multiple bash commands to fulfill the user prompt task.
-                    2. Always generate only the bash commands without any explanation.
-                                
-                    <command generation scenarios>
-                    - Docker build and run commands like docker build, docker runtext processing with 'cat', 'grep', 'head', 'tail', file and directory operations with 'touch', 'mkdir', 'ls', 'cd', 'mv', 'cp', 'rm' and etc.
-                    - text processing with 'cat', 'grep', 'head', 'tail'
-                    - file and directory operations with 'touch', 'mkdir', 'ls', 'cd', 'mv', 'cp', 'rm'
-                    - more...
-                    
-                    <Examples>
-                    1. User prompt: "Create a new directory named 'test_dir' and navigate into it."
-                    Generated bash command: {
-                                  commands: ["mkdir test_dir", "cd test_dir"]
-                    }
-                    2. User prompt: "List all files in the current directory with detailed information."
-                    Generated bash command: {
-                                  commands: ["ls -l"]
-                    }
-                    3. User prompt: "Display the first 10 lines of a file named 'example.txt'."
-                    Generated bash command: {
-                                  commands: ["head -n 10 example.txt"]
-                    }
-                    """),
+                    SystemMessage(content=bash_command_generator_system_prompt),
                     HumanMessage(content=prompt)
                 ]   
             )
 
             chain = messages | llm
 
-            output: BashToolStructuredOutput = chain.invoke({})
+            output: BashToolStructuredOutput = await chain.ainvoke({})
 
             bash_commands = output.commands
 
+            if cache:
+                cache.set(prompt, bash_commands)
+
             return BashToolCodeResult(
                 is_successful=True,
                 commands=bash_commands,
@@ -0,0 +1,249 @@
+import asyncio
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+import pexpect
+
+import os, sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, parent_dir)
+from agents.state import AzShellToolExecutionResult, SpilledOutput
+from config import Config
+from agents.tools.output_store import OutputSpooler
+from agents.cassette import Cassette
+
+
+class BashSession:
+    """
+    A long-lived interactive bash process driven by pexpect.
+
+    Commands run one after another in the same shell so `cd`, exported variables and activated
+    environments carry over between commands.
+    The end of each command is detected by a sentinel line carrying a per-session random marker and
+    the command's exit code. The marker is printed from printf arguments so the sentinel text never
+    appears in the command itself.
+    """
+
+    def __init__(self, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None):
+        self.cwd = cwd
+        self.env = env
+        self.marker = uuid.uuid4().hex
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self._sentinel = re.compile(rf'__lena_{self.marker}:(\d+)\r?\n')
+        self._process = pexpect.spawn('/bin/bash', ['--noprofile', '--norc', '--noediting'],
+                                      cwd=cwd, env=env, encoding='utf-8',
+                                      codec_errors='replace', echo=False, timeout=None)
+        self._process.sendline("export PS1='' PS2=''; unset PROMPT_COMMAND")
+        self._ready = False
+
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process.isalive()
+
+
+    async def run(self, command: str, timeout: Optional[float] = 300) -> AzShellToolExecutionResult:
+        """
+        Run a command in the session and wait for it to finish.
+        On timeout the command is interrupted with Ctrl-C and the session is closed, as the state
+        of a shell with a half finished command cannot be trusted.
+        """
+        cassette = Cassette()
+        if cassette.enabled:
+            return await cassette.acall('bash', command, lambda: self._run(command, timeout),
+                                        dump=lambda result: result.model_dump(),
+                                        load=AzShellToolExecutionResult.model_validate)
+        return await self._run(command, timeout)
+
+
+    async def _run(self, command: str, timeout: Optional[float]) -> AzShellToolExecutionResult:
+        if not self._ready:
+            await self._sync(timeout=30)
+            self._ready = True
+
+        started = time.monotonic()
+        self.last_used = started
+
+        self._process.sendline(command)
+        self._process.sendline(f"printf '\\n__lena_%s:%s\\n' '{self.marker}' \"$?\"")
+
+        try:
+            await self._process.expect(self._sentinel, timeout=timeout, async_=True)
+        except (pexpect.TIMEOUT, pexpect.EOF) as e:
+            output = self._process.before or ''
+            self.close()
+            timed_out = isinstance(e, pexpect.TIMEOUT)
+            return AzShellToolExecutionResult(
+                is_successful=False,
+                stdout=output,
+                error=f"command timed out after {timeout} seconds, bash session closed." if timed_out else "bash session exited.",
+                timed_out=timed_out,
+                wall_time_seconds=time.monotonic() - started,
+                stdout_bytes=len(output.encode())
+            )
+
+        # the pty translates newlines to \r\n, the sentinel adds one newline of its own
+        output = self._process.before.replace('\r\n', '\n')
+        output = output[:-1].rstrip('\n') if output.endswith('\n') else output
+        exit_code = int(self._process.match.group(1))
+        self.last_used = time.monotonic()
+        stdout, stdout_spill = self._spool(output)
+
+        return AzShellToolExecutionResult(
+            is_successful=exit_code == 0,
+            stdout=stdout,
+            stdout_spill=stdout_spill,
+            error='' if exit_code == 0 or stdout is None else stdout,
+            exit_code=exit_code,
+            wall_time_seconds=self.last_used - started,
+            stdout_bytes=len(output.encode())
+        )
+
+
+    def _spool(self, output: str) -> Tuple[Optional[str], Optional[SpilledOutput]]:
+        """spill outputs above the threshold to the session's working directory."""
+        config = Config()
+        if len(output) <= config.output_spill_threshold_bytes:
+            return output, None
+
+        spooler = OutputSpooler(os.path.join(self.cwd or config.agent_cwd, '.outputs'), config.output_spill_threshold_bytes)
+        for line in output.split('\n'):
+            spooler.write_line(line)
+        return spooler.finish()
+
+
+    async def _sync(self, timeout: float) -> None:
+        """wait for the setup line to run and discard anything bash printed on start."""
+        self._process.sendline(f"printf '__lena_%s:%s\\n' '{self.marker}' 0")
+        await self._process.expect(self._sentinel, timeout=timeout, async_=True)
+
+
+    def close(self) -> None:
+        if self._process.isalive():
+            self._process.sendintr()
+            self._process.close(force=True)
+
+
+class BashSessionPool:
+    """
+    Pool of warm bash sessions keyed by LangGraph thread id.
+
+    A thread reuses its session across commands and tasks, sessions idle for longer than
+    `idle_timeout_seconds` are closed on the next acquire, and every `reap_interval_seconds`
+    once start() ran. stop() closes all sessions, the server calls both from its lifespan.
+
+    Usage:
+        async with BashSessionPool().session(thread_id, cwd=agent_cwd) as session:
+            result = await session.run("cd test_dir")
+    """
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(BashSessionPool, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.idle_timeout_seconds = config.bash_session_idle_timeout_seconds
+        self.max_sessions = config.bash_session_max_sessions
+        self.reap_interval_seconds = config.bash_session_reap_interval_seconds
+        self._sessions: Dict[str, BashSession] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+
+    async def start(self) -> None:
+        """closes idle sessions in the background, so an idle server does not keep bash processes alive."""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap(), name='bash-session-reaper')
+
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        self.close_all()
+
+
+    @asynccontextmanager
+    async def session(self, thread_id: str, cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None) -> AsyncGenerator[BashSession, None]:
+        """borrow the thread's session, commands of one thread are serialized on it."""
+        bash_session = self._acquire(thread_id, cwd, env)
+        async with bash_session.lock:
+            try:
+                yield bash_session
+            finally:
+                bash_session.last_used = time.monotonic()
+
+
+    async def run_commands(self, thread_id: str, commands: List[str],
+                           cwd: Optional[str] = None,
+                           env: Optional[Dict[str, str]] = None,
+                           timeout: Optional[float] = 300) -> List[AzShellToolExecutionResult]:
+        """run commands in order in the thread's session, stops at the first failing command."""
+        results = []
+        async with self.session(thread_id, cwd=cwd, env=env) as bash_session:
+            for command in commands:
+                result = await bash_session.run(command, timeout=timeout)
+                results.append(result)
+                if not result.is_successful:
+                    break
+        return results
+
+
+    def close(self, thread_id: str) -> None:
+        bash_session = self._sessions.pop(thread_id, None)
+        if bash_session:
+            bash_session.close()
+
+
+    def close_all(self) -> None:
+        for thread_id in list(self._sessions):
+            self.close(thread_id)
+
+
+    def _acquire(self, thread_id: str, cwd: Optional[str], env: Optional[Dict[str, str]]) -> BashSession:
+        self._close_idle()
+
+        bash_session = self._sessions.get(thread_id)
+        if bash_session is not None and not bash_session.is_alive:
+            self.close(thread_id)
+            bash_session = None
+
+        if bash_session is None:
+            if len(self._sessions) >= self.max_sessions:
+                self._close_least_recently_used()
+            bash_session = BashSession(cwd=cwd, env=env)
+            self._sessions[thread_id] = bash_session
+
+        return bash_session
+
+
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(self.reap_interval_seconds)
+            self._close_idle()
+
+
+    def _close_idle(self) -> None:
+        now = time.monotonic()
+        for thread_id, bash_session in list(self._sessions.items()):
+            if not bash_session.lock.locked() and now - bash_session.last_used > self.idle_timeout_seconds:
+                self.close(thread_id)
+
+
+    def _close_least_recently_used(self) -> None:
+        idle = [(s.last_used, t) for t, s in self._sessions.items() if not s.lock.locked()]
+        if idle:
+            self.close(min(idle)[1])
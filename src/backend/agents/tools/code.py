@@ -1,9 +1,10 @@
 
-from smolagents import OpenAIServerModel, DuckDuckGoSearchTool, CodeAgent, ToolCall, ActionStep, ActionOutput
+from smolagents import DuckDuckGoSearchTool, CodeAgent, ToolCall, ActionStep, ActionOutput
 from smolagents.agents import ActionStep, ActionOutput
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
 from typing import Type, Any, List, Optional, Dict
+import asyncio
 import os
 import sys
 
@@ -13,8 +14,11 @@ sys.path.insert(0, parent_dir)
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.insert(0, parent_dir)
 
-from state import CodeToolExecutionResult, CodeAgentActionOutput, CodeAgentActionStep, CodeAgentToolCall, CodeToolInput
+from agents.state import CodeToolExecutionResult, CodeAgentActionOutput, CodeAgentActionStep, CodeAgentToolCall, CodeToolInput
 from config import Config
+from agents.llm_gateway import LLMGateway
+from agents.metrics import instrument_tool
+from agents.prompt import code_agent_task_prompt
 
 # Get the absolute path of the parent directory
 # parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -51,9 +55,10 @@ class CodeTool(BaseTool):
     - Execute any task that requires Python code
     """
 
+    config: Any = Field(default=None, exclude=True, description="The agent Config")
+
     def __init__(self, config: Config):
-        super().__init__()
-        self.config = config
+        super().__init__(config=config)
 
     args_schema: Type[BaseModel] = CodeToolInput
     response_format: Type[BaseModel] = CodeToolExecutionResult
@@ -64,22 +69,13 @@ class CodeTool(BaseTool):
         raise NotImplementedError("Synchronous code generation is not implemented.")
 
 
+    @instrument_tool('CodeTool')
     async def _arun(self, prompt: str, agent_cwd: str = None) -> CodeToolExecutionResult:
         """Asynchronous version of the code generator and executor"""
 
         try:
 
-            config = Config()
-
-            deployment_name = config.azure_openai_deployment_name
-            foundry_endpoint = config.foundry_endpoint
-            api_key = config.azure_openai_api_key
-
-            llm = OpenAIServerModel(
-                model_id=deployment_name,
-                api_base=foundry_endpoint,
-                api_key=api_key
-            )
+            llm = LLMGateway().smol_model()
             
             authorized_imports = [
                 "os", "sys", "json", "csv", "math", "random", "datetime", "time", 
@@ -111,33 +107,8 @@ class CodeTool(BaseTool):
                 'matplotlib.table'
             ] #'bs4'
 
-            prompt_template = """
-
-            - You have full access to local file system within the working directory: {agent_cwd}. Anything you do with files must be done within this directory.
-            - Whenever user request to analyze files or process data from any Azure service or request to download any files, make sure to read/write files only within this directory: {agent_cwd}.
-            - The Python code you generate can read and write files in this directory '{agent_cwd}' as needed to complete the task.
-            
-            <user request>
-            {prompt}
-
-            <output>
-            You must provide the final output in <JSON format> as below.
-            
-            * Only at final thought and observation with no alternate solution and if error occurs , provide help technical error message to support debugging.
-            * If is not final thought and observation and has alternate solution to try, do not provide error message.
-
-            <JSON format>
-            {{
-                'is_successful': {{true or false}},
-                "result": {{the final execution result in string}}
-            }}
-            """
-
-
-            prompt = prompt_template.format(
-                agent_cwd=agent_cwd,
-                prompt=prompt
-            )
+            # static instructions first and the per-call values last, keeps the task prefix cacheable
+            prompt = f"{code_agent_task_prompt}\n<working directory>\n{agent_cwd}\n\n<user request>\n{prompt}\n"
 
             code_agent = CodeAgent(model=llm, 
                                    use_structured_outputs_internally=True,
@@ -145,52 +116,8 @@ class CodeTool(BaseTool):
                                    executor_type="local",
                                    tools=[DuckDuckGoSearchTool()])
 
-            result = CodeToolExecutionResult()
-
-
-            stream_generator = code_agent.run(prompt, stream=True)
-
-            for response in stream_generator:
-                
-                if self._has_messages(response):
-                    result.messages = response.model_input_messages
-
-                # if self._is_tool_call(response):
-                #     result.tool_calls.append(CodeAgentToolCall(
-                #         name=response.name,
-                #         arg=response.arguments
-                #     ))
-
-                if self._is_action_step(response):
-                    action_step = CodeAgentActionStep(
-                        step_number=response.step_number or -1,
-                        code_action=response.code_action or None,
-                        action_output=response.action_output or None,
-                        observations=response.observations or None,
-                        error=str(response.error) or None,
-                        llm_output=response.model_output or None,
-                        tool_calls=[
-                            CodeAgentToolCall(
-                                name=tool_call.name,
-                                arg=tool_call.arguments
-                            ) for tool_call in response.tool_calls
-                        ]
-                    )
-                    result.action_steps.append(action_step)
-               
-                if self._is_action_output(response):
-                    if response.output and 'result' in response.output:
-                        result.action_outputs.append(CodeAgentActionOutput(
-                            is_successful = response.output['is_successful'],
-                            result = response.output['result']
-                        ))
-
-
-            final_output = result.action_outputs[-1] if result.action_outputs else None
-            result.is_successful = final_output.is_successful if final_output else False
-            result.result = final_output.result if final_output else None
-
-            return result
+            # smolagents runs synchronously, keep it off the event loop serving other workflows
+            return await asyncio.to_thread(self._run_agent, code_agent, prompt)
         
         except Exception as e:
             result = CodeToolExecutionResult()
@@ -200,7 +127,56 @@ class CodeTool(BaseTool):
             )]
             return result
 
-        
+
+    def _run_agent(self, code_agent: CodeAgent, prompt: str) -> CodeToolExecutionResult:
+
+        result = CodeToolExecutionResult()
+
+        stream_generator = code_agent.run(prompt, stream=True)
+
+        for response in stream_generator:
+            
+            if self._has_messages(response):
+                result.messages = response.model_input_messages
+
+            # if self._is_tool_call(response):
+            #     result.tool_calls.append(CodeAgentToolCall(
+            #         name=response.name,
+            #         arg=response.arguments
+            #     ))
+
+            if self._is_action_step(response):
+                action_step = CodeAgentActionStep(
+                    step_number=response.step_number or -1,
+                    code_action=response.code_action or None,
+                    action_output=response.action_output or None,
+                    observations=response.observations or None,
+                    error=str(response.error) or None,
+                    llm_output=response.model_output or None,
+                    tool_calls=[
+                        CodeAgentToolCall(
+                            name=tool_call.name,
+                            arg=tool_call.arguments
+                        ) for tool_call in response.tool_calls
+                    ]
+                )
+                result.action_steps.append(action_step)
+           
+            if self._is_action_output(response):
+                if response.output and 'result' in response.output:
+                    result.action_outputs.append(CodeAgentActionOutput(
+                        is_successful = response.output['is_successful'],
+                        result = response.output['result']
+                    ))
+
+
+        final_output = result.action_outputs[-1] if result.action_outputs else None
+        result.is_successful = final_output.is_successful if final_output else False
+        result.result = final_output
+
+        return result
+
+
     def _is_tool_call(self, obj: any) -> bool:
         return isinstance(obj, ToolCall)
     
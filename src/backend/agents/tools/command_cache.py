@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import os
+import re
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, parent_dir)
+from config import Config
+from agents.cache import LRUTTLCache
+
+
+# `<vnet_name_1>`: name `vnet_name`, numeric suffix `1`
+PLACEHOLDER_PATTERN = re.compile(r'<([A-Za-z_][\w\-\.]*?)(?:[_\-]?\d+)?>')
+SLOT_PATTERN = re.compile(r'<__slot_(\d+)__>')
+
+
+class CommandCache:
+    """
+    Content-addressed cache of generated commands, shared by command generator tools.
+
+    Prompts are normalized before hashing: whitespace is collapsed and the numeric suffix of
+    every `<placeholder>` is replaced by its position, so "create VNet <vnet_name_1> in rg-a" and
+    "create VNet <vnet_name_2> in rg-a" share one cache entry. Placeholder names and literal values
+    stay part of the key: "<vnet_name>" and "<subnet_name>" prompts, or prompts naming "rg-a" and
+    "rg-b", do not share entries.
+    Commands are stored as templates with the same positional slots and re-substituted with the
+    placeholders of the prompt being looked up, only `<placeholder>` tokens are templatized.
+
+    Usage:
+        cache = CommandCache.for_tool('azure_cli_generate')
+        commands = cache.get(prompt)
+        if commands is None:
+            commands = generate(prompt)
+            cache.set(prompt, commands)
+    """
+
+    __shared_store: Optional[LRUTTLCache] = None
+    __instances: Dict[str, 'CommandCache'] = {}
+
+    @classmethod
+    def for_tool(cls, tool_name: str) -> 'CommandCache':
+        """returns the process-wide cache for a tool, all tools share one disk-backed store."""
+        if tool_name not in cls.__instances:
+            if cls.__shared_store is None:
+                config = Config()
+                cls.__shared_store = LRUTTLCache(
+                    max_entries=config.command_cache_max_entries,
+                    ttl_seconds=config.command_cache_ttl_seconds,
+                    db_path=config.command_cache_path
+                )
+            cls.__instances[tool_name] = CommandCache(tool_name, cls.__shared_store)
+        return cls.__instances[tool_name]
+
+
+    def __init__(self, namespace: str, store: LRUTTLCache):
+        self.namespace = namespace
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def normalize(prompt: str) -> Tuple[str, List[str]]:
+        """
+        returns the normalized prompt and its distinct placeholders as written (`<vnet_name_1>`),
+        in order of first appearance.
+        """
+        placeholders: List[str] = []
+
+        def to_slot(match: re.Match) -> str:
+            if match.group(0) not in placeholders:
+                placeholders.append(match.group(0))
+            return f'<{match.group(1)}:{placeholders.index(match.group(0))}>'
+
+        normalized = PLACEHOLDER_PATTERN.sub(to_slot, prompt)
+        normalized = ' '.join(normalized.split())
+        return normalized, placeholders
+
+
+    def key(self, prompt: str) -> str:
+        normalized, _ = self.normalize(prompt)
+        return hashlib.sha256(f'{self.namespace}\n{normalized}'.encode('utf-8')).hexdigest()
+
+
+    def get(self, prompt: str) -> Optional[List[str]]:
+        _, placeholders = self.normalize(prompt)
+        templates: Optional[List[str]] = self.store.get(self.key(prompt))
+
+        # an entry whose slots the prompt can't fill is not served
+        slots = [int(s) for template in templates or [] for s in SLOT_PATTERN.findall(template)]
+        if templates is None or any(slot >= len(placeholders) for slot in slots):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [self._substitute(template, placeholders) for template in templates]
+
+
+    def set(self, prompt: str, commands: List[str]) -> None:
+        if not commands:
+            return
+        _, placeholders = self.normalize(prompt)
+        templates = [self._templatize(command, placeholders) for command in commands]
+        self.store.set(self.key(prompt), templates)
+
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'round_trips_saved': self.hits
+        }
+
+
+    @classmethod
+    def stats_by_tool(cls) -> Dict[str, Dict[str, int]]:
+        """stats of every tool's cache, for /llm/stats and /metrics."""
+        return {tool_name: cache.stats() for tool_name, cache in cls.__instances.items()}
+
+
+    def _templatize(self, command: str, placeholders: List[str]) -> str:
+        for i, placeholder in enumerate(placeholders):
+            command = command.replace(placeholder, f'<__slot_{i}__>')
+        return command
+
+
+    def _substitute(self, template: str, placeholders: List[str]) -> str:
+        for i, placeholder in enumerate(placeholders):
+            template = template.replace(f'<__slot_{i}__>', placeholder)
+        return template
@@ -3,7 +3,6 @@ from typing import Type
 from pydantic import BaseModel, Field
 from langchain_core.tools import BaseTool
 from agent_framework import ChatAgent
-from agent_framework.azure import AzureOpenAIChatClient
 from agent_framework import MagenticBuilder
 from typing import cast
 from agent_framework import (
@@ -17,7 +16,9 @@ import os, sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
 
-from state import DeepResearchToolInput, DeepResearchToolExecutionResult
+from agents.state import DeepResearchToolInput, DeepResearchToolExecutionResult
+from agents.llm_gateway import LLMGateway
+from agents.metrics import instrument_tool
 
 
 class DeepResearchTool(BaseTool):
@@ -33,6 +34,7 @@ class DeepResearchTool(BaseTool):
         raise NotImplementedError("Synchronous execution is not implemented. Please use the asynchronous method '_arun'.")
 
 
+    @instrument_tool('DeepResearchTool')
     async def _arun(self, prompt: str) -> DeepResearchToolExecutionResult:
         """The asynchronous method for the tool (optional)."""
 
@@ -44,7 +46,7 @@ class DeepResearchTool(BaseTool):
                     "You are a Researcher. You find information without additional computation or quantitative analysis."
                 ),
                 # This agent requires the gpt-4o-search-preview model to perform web searches
-                chat_client=AzureOpenAIChatClient(
+                chat_client=LLMGateway().agent_framework_chat_client(
                     deployment_name="gpt-4o",
                     api_version="2024-12-01-preview"
                 )
@@ -55,7 +57,7 @@ class DeepResearchTool(BaseTool):
                 name="MagenticManager",
                 description="Orchestrator that coordinates the research and coding workflow",
                 instructions="You coordinate a team to complete complex tasks efficiently.",
-                chat_client=AzureOpenAIChatClient(
+                chat_client=LLMGateway().agent_framework_chat_client(
                     deployment_name="gpt-4o",
                     api_version="2024-12-01-preview"
                 )
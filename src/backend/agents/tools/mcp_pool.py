@@ -0,0 +1,315 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, List, Optional
+from langchain_mcp_adapters.tools import load_mcp_tools
+from langchain_core.tools import BaseTool
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+import os, sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, parent_dir)
+from config import Config
+from agents.tracing import Tracer
+from agents.cassette import Cassette
+
+
+azure_mcp_server_params = StdioServerParameters(
+    command="npx",
+    args=["-y", "@azure/mcp@latest", "server", "start"],
+    env=None
+)
+
+
+class McpSession:
+    """
+    A long-lived MCP ClientSession running in its own task.
+
+    The stdio_client / ClientSession context managers must be entered and exited in the same task,
+    so the session is owned by a runner task that stays alive until close() is called.
+    Tool discovery (load_mcp_tools) runs once at session start, the result is kept in `tools`.
+    """
+
+    def __init__(self, server_params: StdioServerParameters, max_concurrency: int):
+        self.server_params = server_params
+        self.max_concurrency = max_concurrency
+        self.session: Optional[ClientSession] = None
+        self.tools: Dict[str, BaseTool] = {}
+        # borrowers running a request or queued on the semaphore
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+
+    async def start(self, timeout: float) -> None:
+        self._runner = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except BaseException:
+            # timed out, or the borrower starting it was cancelled
+            await self.close()
+            raise
+        if self._error:
+            await self.close()
+            raise self._error
+
+
+    async def _run(self) -> None:
+        try:
+            async with stdio_client(self.server_params) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    langchain_tools: list[BaseTool] = await load_mcp_tools(session)
+                    self.tools = {tool.name: tool for tool in langchain_tools}
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except BaseException as e:
+            self._error = e
+            raise
+        finally:
+            self.session = None
+            self._ready.set()
+
+
+    @property
+    def is_alive(self) -> bool:
+        return self.session is not None and self._runner is not None and not self._runner.done()
+
+
+    @property
+    def is_starting(self) -> bool:
+        return not self._ready.is_set()
+
+
+    async def wait_started(self) -> None:
+        """waits for a session another borrower is starting, raises when it failed to start."""
+        await self._ready.wait()
+        if not self.is_alive:
+            raise RuntimeError('MCP session failed to start') from self._error
+
+
+    async def ping(self, timeout: float) -> bool:
+        """health check, a dead or unresponsive server process fails the ping."""
+        if not self.is_alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._runner is not None:
+            if not self._ready.is_set():
+                # still starting, _stop is only waited on once the session is up
+                self._runner.cancel()
+            try:
+                await self._runner
+            except BaseException:
+                pass
+
+
+class McpSessionPool:
+    """
+    Pool of long-lived MCP sessions to one MCP server.
+
+    - sessions are spawned lazily up to `size` and reused across tool calls
+    - each session multiplexes up to `max_concurrency_per_session` concurrent requests
+    - sessions failing the health check are closed and respawned on next borrow
+    - the pool lock only guards picking and reserving a session, pings and spawns run outside it
+
+    Usage:
+        pool = McpSessionPool.get('azure', azure_mcp_server_params)
+        async with pool.session() as session:
+            tool = session.tools['extension_cli_generate']
+            result = await tool.ainvoke(...)
+    """
+
+    __pools: Dict[str, 'McpSessionPool'] = {}
+
+    @classmethod
+    def get(cls, name: str, server_params: StdioServerParameters) -> 'McpSessionPool':
+        """returns the process-wide pool for a MCP server, creating it on first use."""
+        pool = cls.__pools.get(name)
+        if pool is None:
+            config = Config()
+            pool = McpSessionPool(
+                server_params=server_params,
+                size=config.mcp_pool_size,
+                max_concurrency_per_session=config.mcp_pool_max_concurrency_per_session,
+                health_check_interval=config.mcp_pool_health_check_interval
+            )
+            cls.__pools[name] = pool
+        return pool
+
+
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """closes the process-wide pools, on server shutdown."""
+        for pool in cls.__pools.values():
+            await pool.aclose()
+
+
+    def __init__(self,
+                 server_params: StdioServerParameters,
+                 size: int = 2,
+                 max_concurrency_per_session: int = 4,
+                 health_check_interval: float = 30.0,
+                 start_timeout: float = 120.0,
+                 ping_timeout: float = 10.0):
+        self.server_params = server_params
+        self.size = size
+        self.max_concurrency_per_session = max_concurrency_per_session
+        self.health_check_interval = health_check_interval
+        self.start_timeout = start_timeout
+        self.ping_timeout = ping_timeout
+        self._sessions: List[McpSession] = []
+        self._last_health_check: Dict[int, float] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+    def _bind_loop(self) -> None:
+        """
+        Sessions belong to the event loop that spawned them.
+        When called from a new loop (e.g. a later asyncio.run), the old loop's sessions are dropped.
+        Their runner tasks are cancelled by the old loop on shutdown, which ends the server process.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._sessions = []
+            self._last_health_check = {}
+
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator[McpSession, None]:
+        """Borrow the least busy healthy session, spawning or respawning sessions as needed."""
+        cassette = Cassette()
+        if cassette.replaying:
+            # tool calls come from the cassette, no server is started
+            yield cassette.mcp_session()
+            return
+
+        self._bind_loop()
+
+        mcp_session = await self._acquire()
+
+        try:
+            async with mcp_session._semaphore:
+                yield cassette.mcp_session(mcp_session) if cassette.recording else mcp_session
+        finally:
+            mcp_session.in_flight -= 1
+
+
+    async def _acquire(self) -> McpSession:
+        """
+        picks a session and counts the caller in its in_flight,
+        so callers queued on a busy session spread to others.
+        """
+        await self._evict_unhealthy()
+
+        async with self._lock:
+            idle = [s for s in self._sessions if s.in_flight < s.max_concurrency]
+
+            starting = not self._sessions or (not idle and len(self._sessions) < self.size)
+            if starting:
+                # reserve the slot, the server process starts outside the lock
+                mcp_session = self._new_session()
+                self._sessions.append(mcp_session)
+            else:
+                # reuse the least busy session, at capacity the caller queues on its semaphore
+                mcp_session = min(idle or self._sessions, key=lambda s: s.in_flight)
+
+            mcp_session.in_flight += 1
+
+        try:
+            if starting:
+                await self._spawn(mcp_session)
+            else:
+                await mcp_session.wait_started()
+        except BaseException:
+            mcp_session.in_flight -= 1
+            raise
+        return mcp_session
+
+
+    def _new_session(self) -> McpSession:
+        return McpSession(self.server_params, self.max_concurrency_per_session)
+
+
+    async def _spawn(self, mcp_session: McpSession) -> None:
+        try:
+            with Tracer().span('mcp.spawn', program=self.server_params.command,
+                               pool_sessions=len(self._sessions)):
+                await mcp_session.start(timeout=self.start_timeout)
+        except BaseException:
+            self._discard(mcp_session)
+            raise
+        self._last_health_check[id(mcp_session)] = self._loop.time()
+
+
+    async def _evict_unhealthy(self) -> None:
+        async with self._lock:
+            now = self._loop.time()
+            dead, due = [], []
+            for mcp_session in self._sessions:
+                if mcp_session.is_starting:
+                    continue
+                if not mcp_session.is_alive:
+                    dead.append(mcp_session)
+                    continue
+
+                # only ping idle sessions, busy sessions prove their health by serving requests
+                last_check = self._last_health_check.get(id(mcp_session), 0.0)
+                if mcp_session.in_flight == 0 and now - last_check >= self.health_check_interval:
+                    # claims the check, concurrent borrowers don't ping the same session again
+                    self._last_health_check[id(mcp_session)] = now
+                    due.append(mcp_session)
+
+            for mcp_session in dead:
+                self._discard(mcp_session)
+
+        # pings and closing run outside the lock so they don't hold up borrowers of other sessions
+        for mcp_session in dead:
+            await mcp_session.close()
+
+        for mcp_session in due:
+            if await mcp_session.ping(timeout=self.ping_timeout):
+                continue
+            if mcp_session.in_flight == 0:
+                self._discard(mcp_session)
+                await mcp_session.close()
+            else:
+                # borrowed while the ping was running, checked again once idle
+                self._last_health_check[id(mcp_session)] = 0.0
+
+
+    def _discard(self, mcp_session: McpSession) -> None:
+        if mcp_session in self._sessions:
+            self._sessions.remove(mcp_session)
+        self._last_health_check.pop(id(mcp_session), None)
+
+
+    async def aclose(self) -> None:
+        """close all sessions and their MCP server processes."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        sessions, self._sessions = self._sessions, []
+        self._last_health_check = {}
+        for mcp_session in sessions:
+            await mcp_session.close()
+
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sessions': len(self._sessions),
+            'in_flight': sum(s.in_flight for s in self._sessions)
+        }
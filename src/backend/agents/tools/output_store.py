@@ -0,0 +1,222 @@
+import mmap
+import threading
+import time
+import uuid
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import IO, List, Optional, Tuple
+
+import os, sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+from agents.state import SpilledOutput
+from config import Config
+
+
+class OutputSpooler:
+    """
+    Collects command output line by line and spills it to a file once it grows above `threshold_bytes`.
+
+    Below the threshold the output is returned as a string, above it only a SpilledOutput handle with
+    head/tail preview and size metadata is kept in memory.
+    Spill files older than OUTPUT_SPILL_TTL_SECONDS are pruned, at most once per
+    `prune_interval_seconds`.
+
+    Usage:
+        spooler = OutputSpooler(spill_dir, threshold_bytes=256 * 1024)
+        for line in lines:
+            spooler.write_line(line)
+        text, spilled = spooler.finish()
+    """
+
+    prune_interval_seconds = 60 * 60
+    _last_prune = time.time()
+    _prune_lock = threading.Lock()
+
+    def __init__(self, spill_dir: str, threshold_bytes: int, preview_lines: int = 20, name: str = 'stdout'):
+        self.spill_dir = spill_dir
+        self.threshold_bytes = threshold_bytes
+        self.preview_lines = preview_lines
+        self.name = name
+        self.size_bytes = 0
+        self.line_count = 0
+        self._lines: List[str] = []
+        self._head: List[str] = []
+        self._tail: deque = deque(maxlen=preview_lines)
+        self._file: Optional[IO[bytes]] = None
+        self._path: Optional[str] = None
+
+
+    def write_line(self, line: str, continuation: bool = False) -> None:
+        """`continuation` appends the line to the previous one, for pieces of an over-long line."""
+        if continuation and self.line_count:
+            self._append(line)
+            return
+
+        data = (line + '\n').encode()
+        self.size_bytes += len(data)
+        self.line_count += 1
+
+        if len(self._head) < self.preview_lines:
+            self._head.append(line)
+        self._tail.append(line)
+
+        if self._file is not None:
+            self._file.write(data)
+            return
+
+        self._lines.append(line)
+        if self.size_bytes > self.threshold_bytes:
+            self._spill()
+
+
+    def finish(self) -> Tuple[Optional[str], Optional[SpilledOutput]]:
+        """returns the output as string when small, otherwise None and the SpilledOutput handle."""
+        if self._file is None:
+            return '\n'.join(self._lines), None
+
+        self._file.close()
+        self._file = None
+
+        return None, SpilledOutput(
+            path=self._path,
+            size_bytes=self.size_bytes,
+            line_count=self.line_count,
+            head='\n'.join(self._head),
+            tail='\n'.join(self._tail)
+        )
+
+
+    def _append(self, piece: str) -> None:
+        data = piece.encode()
+        self.size_bytes += len(data)
+
+        if self.line_count <= self.preview_lines:
+            self._head[-1] += piece
+        self._tail[-1] += piece
+
+        if self._file is not None:
+            # overwrite the newline ending the previous line
+            self._file.seek(-1, os.SEEK_CUR)
+            self._file.write(data + b'\n')
+            return
+
+        self._lines[-1] += piece
+        if self.size_bytes > self.threshold_bytes:
+            self._spill()
+
+
+    def _spill(self) -> None:
+        Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+        self._path = os.path.join(self.spill_dir, f'{self.name}-{uuid.uuid4().hex}.log')
+        self._file = open(self._path, 'wb')
+        for line in self._lines:
+            self._file.write((line + '\n').encode())
+        self._lines = []
+        self._maybe_prune()
+
+
+    @staticmethod
+    def prune(root: str, older_than_seconds: float) -> int:
+        """
+        deletes spill files not modified within the last `older_than_seconds`, returns how many.
+        Spill dirs are `.outputs` in `root` (the agent working directory) and in thread directories.
+        """
+        cutoff = time.time() - older_than_seconds
+        deleted = 0
+        for pattern in ('.outputs/*.log', '*/*/.outputs/*.log'):
+            for path in Path(root).glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        deleted += 1
+                except FileNotFoundError:
+                    pass
+        return deleted
+
+
+    @classmethod
+    def _maybe_prune(cls) -> None:
+        config = Config()
+        with cls._prune_lock:
+            now = time.time()
+            if now - cls._last_prune < cls.prune_interval_seconds:
+                return
+            cls._last_prune = now
+        cls.prune(config.agent_cwd, config.output_spill_ttl_seconds)
+
+
+class SpilledOutputReader:
+    """
+    Paged, mmap-backed access to a spilled output without loading the whole file.
+
+    The line index (offset of every line start) is built on first line access by scanning the mapping.
+
+    Usage:
+        with SpilledOutputReader(result.stdout_spill) as reader:
+            first_page = reader.read_lines(0, 100)
+            chunk = reader.read_bytes(4096, 1024)
+    """
+
+    def __init__(self, spilled: SpilledOutput):
+        self.spilled = spilled
+        self._file = open(spilled.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._line_offsets: Optional[array] = None
+
+
+    def __enter__(self) -> 'SpilledOutputReader':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._mmap) if self._mmap is not None else 0
+
+
+    @property
+    def line_count(self) -> int:
+        return len(self._index()) - 1
+
+
+    def read_bytes(self, offset: int, length: int) -> bytes:
+        if self._mmap is None:
+            return b''
+        return self._mmap[offset:offset + length]
+
+
+    def read_lines(self, start: int, count: int) -> List[str]:
+        """returns up to `count` lines starting at 0-based line `start`, without trailing newlines."""
+        index = self._index()
+        end = min(start + count, len(index) - 1)
+        if start >= end:
+            return []
+        data = self._mmap[index[start]:index[end]]
+        # only '\n' ends a line, as in the index, so page boundaries and line numbers agree
+        return data.decode(errors='replace').split('\n')[:end - start]
+
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+    def _index(self) -> array:
+        """offsets of each line start, with the file size appended as end of the last line."""
+        if self._line_offsets is None:
+            offsets = array('Q', [0])
+            if self._mmap is not None:
+                position = self._mmap.find(b'\n')
+                while position != -1:
+                    offsets.append(position + 1)
+                    position = self._mmap.find(b'\n', position + 1)
+                if offsets[-1] != len(self._mmap):
+                    offsets.append(len(self._mmap))
+            self._line_offsets = offsets
+        return self._line_offsets
@@ -0,0 +1,205 @@
+import asyncio
+import codecs
+import os
+import signal
+import time
+from typing import AsyncIterator, Dict, Literal, Optional
+from pydantic import BaseModel, Field
+from agents.metrics import Metrics, command_program
+from agents.tracing import Tracer
+from agents.cassette import Cassette
+
+
+class ProcessOutputLine(BaseModel):
+    stream: Literal['stdout', 'stderr'] = Field(description="The stream the line was read from")
+    line: str = Field(description="The line without trailing newline")
+    continuation: bool = Field(
+        default=False,
+        description="True when this continues the previous line of the stream, split because it "
+                    "was longer than line_limit. Append it to that line without a separator")
+
+
+class ProcessResult(BaseModel):
+    exit_code: Optional[int] = Field(default=None, description="Exit code of the process, negative if killed by a signal")
+    timed_out: bool = Field(default=False, description="True if the process group was killed after exceeding the timeout")
+    wall_time_seconds: float = Field(default=0.0, description="Wall time from spawn to exit")
+    stdout_bytes: int = Field(default=0, description="Number of bytes written to stdout")
+    stderr_bytes: int = Field(default=0, description="Number of bytes written to stderr")
+
+
+class AsyncProcess:
+    """
+    Runs a bash command without blocking the event loop and streams its output line by line.
+
+    The command runs in its own process group, on timeout or when the consumer stops iterating
+    the whole group is killed so no child process is left running.
+    Lines longer than `line_limit` are yielded in pieces, every piece after the first is marked as
+    `continuation`. Output is decoded incrementally, a UTF-8 character split by a piece stays whole.
+
+    Usage:
+        process = AsyncProcess("az vm list -o table", timeout=60)
+        async for output in process.stream():
+            print(output.stream, output.line)
+        print(process.result.exit_code)
+    """
+
+    # longest line yielded at once, longer lines are split into several
+    line_limit = 1024 * 1024
+    read_chunk_size = 64 * 1024
+    kill_grace_seconds = 5.0
+
+    def __init__(self,
+                 command: str,
+                 timeout: Optional[float] = 60,
+                 env: Optional[Dict[str, str]] = None,
+                 cwd: Optional[str] = None):
+        self.command = command
+        self.timeout = timeout
+        self.env = env
+        self.cwd = cwd
+        self.result: Optional[ProcessResult] = None
+
+
+    def stream(self) -> AsyncIterator[ProcessOutputLine]:
+        cassette = Cassette()
+        return cassette.stream_process(self, self._stream) if cassette.enabled else self._stream()
+
+
+    async def _stream(self) -> AsyncIterator[ProcessOutputLine]:
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout else None
+        result = ProcessResult()
+        # ended explicitly, the current span can't be switched inside an async generator
+        span = Tracer().start_span('subprocess', program=command_program(self.command), timeout=self.timeout)
+
+        process = await asyncio.create_subprocess_exec(
+            '/bin/bash', '-c', self.command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=self.env,
+            cwd=self.cwd,
+            start_new_session=True,
+            limit=self.line_limit
+        )
+
+        queue: asyncio.Queue = asyncio.Queue()
+        decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace')
+                    for name in ('stdout', 'stderr')}
+        readers = [
+            asyncio.create_task(self._read(process.stdout, 'stdout', queue)),
+            asyncio.create_task(self._read(process.stderr, 'stderr', queue))
+        ]
+
+        try:
+            open_streams = len(readers)
+            while open_streams:
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise asyncio.TimeoutError()
+
+                item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                stream_name, raw, continuation = item
+                if raw is None:
+                    open_streams -= 1
+                    # bytes of a character cut off by the end of the stream
+                    rest = decoders[stream_name].decode(b'', final=True)
+                    if rest:
+                        yield ProcessOutputLine(stream=stream_name, line=rest,
+                                                continuation=continuation)
+                    continue
+
+                if stream_name == 'stdout':
+                    result.stdout_bytes += len(raw)
+                else:
+                    result.stderr_bytes += len(raw)
+
+                line = decoders[stream_name].decode(raw)
+                if raw.endswith(b'\n'):
+                    line = line.rstrip('\r\n')
+                yield ProcessOutputLine(stream=stream_name, line=line, continuation=continuation)
+
+            remaining = deadline - time.monotonic() if deadline else None
+            await asyncio.wait_for(process.wait(), timeout=remaining)
+
+        except asyncio.TimeoutError:
+            result.timed_out = True
+
+        finally:
+            if result.timed_out or process.returncode is None:
+                await self._kill_group(process)
+            for reader in readers:
+                reader.cancel()
+            await asyncio.gather(*readers, return_exceptions=True)
+
+            result.exit_code = process.returncode
+            result.wall_time_seconds = time.monotonic() - started
+            self.result = result
+            Metrics().observe_process(self.command, result.wall_time_seconds, result.exit_code, result.timed_out)
+            span.end(status='timeout' if result.timed_out else None, exit_code=result.exit_code,
+                     stdout_bytes=result.stdout_bytes, stderr_bytes=result.stderr_bytes)
+
+
+    async def run(self) -> ProcessResult:
+        """run to completion discarding output, returns the result."""
+        async for _ in self.stream():
+            pass
+        return self.result
+
+
+    async def _read(self, stream: asyncio.StreamReader, stream_name: str, queue: asyncio.Queue) -> None:
+        """
+        reads in chunks and splits lines itself, so lines longer than line_limit lose no bytes.
+        Queues (stream_name, bytes, continuation) items, ending with an item whose bytes are None.
+        """
+        # the last piece queued did not end its line
+        continuation = False
+
+        async def put(piece: bytes) -> None:
+            nonlocal continuation
+            await queue.put((stream_name, piece, continuation))
+            continuation = not piece.endswith(b'\n')
+
+        try:
+            buffer = b''
+            while True:
+                chunk = await stream.read(self.read_chunk_size)
+                if not chunk:
+                    break
+                buffer += chunk
+
+                start = 0
+                while True:
+                    end = buffer.find(b'\n', start, start + self.line_limit)
+                    if end != -1:
+                        await put(buffer[start:end + 1])
+                        start = end + 1
+                    elif len(buffer) - start >= self.line_limit:
+                        await put(buffer[start:start + self.line_limit])
+                        start += self.line_limit
+                    else:
+                        break
+                buffer = buffer[start:]
+
+            if buffer:
+                await put(buffer)
+        finally:
+            await queue.put((stream_name, None, continuation))
+
+
+    async def _kill_group(self, process: asyncio.subprocess.Process) -> None:
+        """SIGTERM the process group, then SIGKILL whatever is left of it after the grace period."""
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+
+        try:
+            await asyncio.wait_for(process.wait(), timeout=self.kill_grace_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
@@ -0,0 +1,457 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import httpx
+
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, parent_dir)
+from config import Config
+
+
+class Span:
+    """
+    A timed operation of a workflow run. Spans of one run share a trace_id and form a tree through parent_id:
+    workflow → node → task → tool → llm.request / subprocess / mcp.request.
+    """
+
+    def __init__(self, tracer: 'Tracer', name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self._started = time.monotonic()
+
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+
+    def end(self, status: Optional[str] = None, error: Optional[str] = None, **attributes: Any) -> None:
+        """ends and exports the span, later calls are ignored."""
+        if self.end_time is not None:
+            return
+        # wall clock start plus monotonic duration, clock adjustments during the span don't skew it
+        self.end_time = self.start_time + (time.monotonic() - self._started)
+        self.status = status or self.status
+        self.error = error
+        self.attributes.update(attributes)
+        self._tracer._export(self)
+
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start_time,
+            'end': self.end_time,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """returned while tracing is disabled, so instrumented code needs no checks."""
+    trace_id = span_id = parent_id = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def end(self, status: Optional[str] = None, error: Optional[str] = None, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('lena_current_span', default=None)
+
+
+class JsonlSpanExporter:
+    """appends finished spans as JSON lines to a local file."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(span, default=str) + '\n' for span in spans)
+
+
+class OtlpHttpSpanExporter:
+    """posts finished spans as OTLP/HTTP JSON to `{endpoint}/v1/traces`, batches failing to send are dropped."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.client = httpx.Client(timeout=timeout)
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        try:
+            self.client.post(self.url, json=to_otlp(spans))
+        except httpx.HTTPError:
+            pass
+
+
+class Tracer:
+    """
+    Process-wide tracer keeping the current span in a context variable, so spans nest across awaits,
+    asyncio tasks and asyncio.to_thread without passing them around.
+
+    Finished spans are queued and exported in batches by a background thread, TRACING_EXPORTER selects
+    none (default), jsonl (TRACING_JSONL_PATH) or otlp (TRACING_OTLP_ENDPOINT).
+    View runs with `python -m agents.tracing waterfall`.
+
+    Usage:
+        with Tracer().span('node', node='plan_tasks'):
+            ...
+        span = Tracer().start_span('subprocess', program='az')   # leaf span, ended explicitly
+        span.end(exit_code=0)
+    """
+
+    batch_size = 256
+    flush_interval_seconds = 1.0
+
+    __instance = None
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(Tracer, cls).__new__(cls)
+            cls.__instance.__initialized = False
+        return cls.__instance
+
+    def __init__(self):
+        if self.__initialized:
+            return
+        self.__initialized = True
+
+        config = Config()
+        self.exporter = None
+        if config.tracing_exporter == 'jsonl':
+            self.exporter = JsonlSpanExporter(config.tracing_jsonl_path)
+        elif config.tracing_exporter == 'otlp':
+            self.exporter = OtlpHttpSpanExporter(config.tracing_otlp_endpoint)
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """child span of the current span, current itself until the block exits."""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(status=_status_of(e), error=str(e) or type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+    def start_span(self, name: str, **attributes: Any) -> Span:
+        """child span of the current span that does not become current, for leaves ended from callbacks."""
+        if not self.enabled:
+            return NOOP_SPAN
+
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        return Span(self, name, trace_id, parent.span_id if parent else None, attributes)
+
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """waits until the spans queued so far are exported."""
+        done = threading.Event()
+        self._queue.put(done)
+        self._ensure_worker()
+        done.wait(timeout)
+
+
+    def _export(self, span: Span) -> None:
+        self._queue.put(span.to_dict())
+        self._ensure_worker()
+
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name='span-exporter', daemon=True)
+                self._worker.start()
+
+
+    def _work(self) -> None:
+        while True:
+            batch, events = [], []
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if isinstance(item, threading.Event):
+                    events.append(item)
+                    break
+                batch.append(item)
+
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    # tracing must never fail a workflow
+                    pass
+            for event in events:
+                event.set()
+
+
+def _status_of(e: BaseException) -> str:
+    name = type(e).__name__
+    if name == 'CancelledError':
+        return 'cancelled'
+    if name in ('GraphInterrupt', 'NodeInterrupt'):
+        return 'interrupted'
+    return 'error'
+
+
+STATUS_ATTRIBUTE = 'lena.status'
+
+
+def to_otlp(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """spans in the OTLP/JSON ExportTraceServiceRequest layout."""
+    return {'resourceSpans': [{
+        'resource': {'attributes': [_otlp_attribute('service.name', 'lena-ai')]},
+        'scopeSpans': [{
+            'scope': {'name': 'lena.tracing'},
+            'spans': [{
+                'traceId': span['trace_id'],
+                'spanId': span['span_id'],
+                'parentSpanId': span['parent_id'] or '',
+                'name': span['name'],
+                'kind': 1,
+                'startTimeUnixNano': str(int(span['start'] * 1e9)),
+                'endTimeUnixNano': str(int(span['end'] * 1e9)),
+                'attributes': ([_otlp_attribute(k, v) for k, v in span['attributes'].items()]
+                               + _otlp_status_attribute(span)),
+                'status': {'code': 1 if span['status'] == 'ok' else 2, 'message': span['error'] or span['status']}
+            } for span in spans]
+        }]
+    }]}
+
+
+def from_otlp(request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """inverse of to_otlp, for the collector stand-in."""
+    spans = []
+    for resource_spans in request.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for span in scope_spans.get('spans', []):
+                status = span.get('status', {})
+                attributes = {a['key']: _from_otlp_value(a['value']) for a in span.get('attributes', [])}
+                status_name = attributes.pop(STATUS_ATTRIBUTE, None)
+                spans.append({
+                    'trace_id': span['traceId'],
+                    'span_id': span['spanId'],
+                    'parent_id': span.get('parentSpanId') or None,
+                    'name': span['name'],
+                    'start': int(span['startTimeUnixNano']) / 1e9,
+                    'end': int(span['endTimeUnixNano']) / 1e9,
+                    'status': status_name or ('ok' if status.get('code', 1) != 2 else 'error'),
+                    'error': status.get('message') if status.get('code') == 2 else None,
+                    'attributes': attributes
+                })
+    return spans
+
+
+def _otlp_status_attribute(span: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # OTLP status codes only tell ok from error, the attribute keeps interrupted and cancelled apart
+    return [] if span['status'] == 'ok' else [_otlp_attribute(STATUS_ATTRIBUTE, span['status'])]
+
+
+def _from_otlp_value(value: Dict[str, Any]) -> Any:
+    if 'intValue' in value:
+        return int(value['intValue'])
+    return next(iter(value.values()), None)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64 bit integers as strings
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': '' if value is None else str(value)}}
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                # a line cut short by a crash
+                continue
+    return spans
+
+
+def waterfall(spans: List[Dict[str, Any]], width: int = 50) -> str:
+    """one line per span of a trace: offset, duration, the span tree and a bar on the run's timeline."""
+    if not spans:
+        return 'no spans'
+
+    trace_start = min(span['start'] for span in spans)
+    trace_end = max(span['end'] for span in spans)
+    total = max(trace_end - trace_start, 1e-9)
+
+    span_ids = {span['span_id'] for span in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in spans:
+        parent_id = span['parent_id'] if span['parent_id'] in span_ids else None
+        children.setdefault(parent_id, []).append(span)
+
+    roots = children.get(None, [])
+    root_attributes = roots[0]['attributes'] if roots else {}
+    lines = [f"trace {spans[0]['trace_id']}  thread_id={root_attributes.get('thread_id', '-')}  {total:.3f}s  {len(spans)} spans"]
+
+    def visit(span: Dict[str, Any], depth: int) -> None:
+        offset = span['start'] - trace_start
+        duration = span['end'] - span['start']
+        begin = int(offset / total * width)
+        length = max(1, int(round(duration / total * width)))
+        bar = ' ' * begin + '█' * min(length, width - begin)
+        label = '  ' * depth + span['name'] + _label_detail(span)
+        status = '' if span['status'] == 'ok' else f"  [{span['status']}]"
+        lines.append(f"{offset:9.3f}s {duration:9.3f}s  {label[:48]:<48} |{bar:<{width}}|{status}")
+        for child in sorted(children.get(span['span_id'], []), key=lambda s: s['start']):
+            visit(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s['start']):
+        visit(root, 0)
+    return '\n'.join(lines)
+
+
+def _label_detail(span: Dict[str, Any]) -> str:
+    attributes = span['attributes']
+    for key in ('node', 'task_id', 'tool', 'deployment', 'program', 'mcp_tool'):
+        if key in attributes:
+            return f" {attributes[key]}"
+    return ''
+
+
+def group_traces(spans: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        traces.setdefault(span['trace_id'], []).append(span)
+    return traces
+
+
+def serve_collector(path: str, host: str = '127.0.0.1', port: int = 4318) -> None:
+    """OTLP/HTTP JSON collector stand-in: appends spans posted to /v1/traces to a JSONL file."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    exporter = JsonlSpanExporter(path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/v1/traces':
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                exporter.export(from_otlp(json.loads(body)))
+            except (ValueError, KeyError) as e:
+                self.send_response(400)
+                self.end_headers()
+                self.wfile.write(str(e).encode())
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"collecting spans on http://{host}:{port}/v1/traces into {path}")
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="inspect workflow traces exported as JSONL")
+    parser.add_argument('--file', help="span JSONL file, defaults to TRACING_JSONL_PATH")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="list the traces in the file")
+    waterfall_parser = commands.add_parser('waterfall', help="print the waterfall of a run, the latest by default")
+    waterfall_parser.add_argument('--trace-id')
+    waterfall_parser.add_argument('--thread-id', help="the latest run of this workflow thread")
+    waterfall_parser.add_argument('--width', type=int, default=50)
+    collect_parser = commands.add_parser('collect', help="run an OTLP/HTTP JSON collector stand-in writing to the file")
+    collect_parser.add_argument('--host', default='127.0.0.1')
+    collect_parser.add_argument('--port', type=int, default=4318)
+    args = parser.parse_args()
+
+    path = args.file or Config().tracing_jsonl_path
+
+    if args.command == 'collect':
+        serve_collector(path, args.host, args.port)
+        sys.exit(0)
+
+    traces = group_traces(load_spans(path))
+    ordered = sorted(traces.values(), key=lambda spans: min(s['start'] for s in spans))
+
+    if args.command == 'list':
+        for spans in ordered:
+            root = min(spans, key=lambda s: s['start'])
+            duration = max(s['end'] for s in spans) - root['start']
+            started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(root['start']))
+            print(f"{root['trace_id']}  {started}  {duration:9.3f}s  {len(spans):5} spans  "
+                  f"thread_id={root['attributes'].get('thread_id', '-')}  status={root['attributes'].get('workflow_status', root['status'])}")
+        sys.exit(0)
+
+    if args.trace_id:
+        selected = traces.get(args.trace_id)
+    elif args.thread_id:
+        runs = [spans for spans in ordered if any(s['attributes'].get('thread_id') == args.thread_id for s in spans)]
+        selected = runs[-1] if runs else None
+    else:
+        selected = ordered[-1] if ordered else None
+
+    print(waterfall(selected, args.width) if selected else 'no matching trace')
@@ -5,19 +5,14 @@ import sys
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
 from config import Config
+from agents.llm_gateway import LLMGateway
 
 class Util:
 
     @staticmethod
     def gpt_4o() -> AzureChatOpenAI:
-        config = Config()
-
-        return AzureChatOpenAI(
-                        deployment_name=config.azure_openai_deployment_name,
-                        model=config.azure_openai_model_name,
-                        api_version=config.azure_openai_api_version,
-                        temperature=0.0
-                    )
+        # shared instance with pooled keep-alive connections
+        return LLMGateway().chat_model(temperature=0.0)
     
     @staticmethod
     def import_parent_dir_module(current_file_dunder: str):
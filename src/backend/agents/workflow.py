@@ -1,11 +1,14 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.state import CompiledStateGraph, StateT, ContextT, InputT, OutputT
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.types import interrupt, Command
 from langchain_core.messages import HumanMessage
 
 from agents.state import ExecutionState, Scratchpad
 from agents.task_planner_agent import TaskPlanner
+from agents.task_execution_overseer import TaskExecutionOverseer
+from agents.intent_router import IntentRouter
+from agents.checkpointer import create_checkpointer
+from agents.metrics import instrument_node
 # from agents.task_param_collector_agent import ValueResolverAgent
 from typing import Tuple
 
@@ -15,18 +18,32 @@ class AzureWorkflow:
     def __init__(self):
         self.state: ExecutionState = ExecutionState()
         self.task_planner = TaskPlanner()
+        self.task_execution_overseer = TaskExecutionOverseer()
+        self.intent_router = IntentRouter()
     
     def build_graph(self) -> CompiledStateGraph[StateT, ContextT, InputT, OutputT]:
 
-        checkpointer = InMemorySaver()
+        checkpointer = create_checkpointer()
 
         self.workflow = StateGraph(ExecutionState)
 
-        self.workflow.add_node("plan_tasks", self.task_planner.plan_tasks)
-        self.workflow.add_node("optimize_prompt", self.task_planner.optimize_user_prompt)
-        self.workflow.add_edge(START, "optimize_prompt")
+        self.workflow.add_node("route_intent", instrument_node("route_intent", self.intent_router.route_intent))
+        self.workflow.add_node("answer_question", instrument_node("answer_question", self.intent_router.answer_question))
+        self.workflow.add_node("reject_request", instrument_node("reject_request", self.intent_router.reject_request))
+        self.workflow.add_edge(START, "route_intent")
+        self.workflow.add_conditional_edges(
+            "route_intent", self._after_intent, ["answer_question", "reject_request", "optimize_prompt", "plan_tasks_fused"]
+        )
+        self.workflow.add_edge("answer_question", END)
+        self.workflow.add_edge("reject_request", END)
+        self.workflow.add_node("plan_tasks", instrument_node("plan_tasks", self.task_planner.plan_tasks))
+        self.workflow.add_node("optimize_prompt", instrument_node("optimize_prompt", self.task_planner.optimize_user_prompt))
+        self.workflow.add_node("plan_tasks_fused", instrument_node("plan_tasks_fused", self.task_planner.plan_tasks_fused))
+        self.workflow.add_node("execute_tasks", instrument_node("execute_tasks", self.task_execution_overseer.run))
         self.workflow.add_edge("optimize_prompt", "plan_tasks")
-        self.workflow.add_edge("plan_tasks", END)
+        self.workflow.add_edge("plan_tasks", "execute_tasks")
+        self.workflow.add_edge("plan_tasks_fused", "execute_tasks")
+        self.workflow.add_edge("execute_tasks", END)
         # self.workflow.add_node("check_for_missing_azure_values", self.value_resolver_agent.check_for_missing_azure_values)
         # self.workflow.add_node("check_with_human_on_missing_values", self.value_resolver_agent.check_with_human_on_missing_values)
         # self.workflow.add_node('update_prompt_with_filled_values', self.value_resolver_agent.update_prompt_with_filled_values)
@@ -46,10 +63,17 @@ class AzureWorkflow:
         return self.workflow
     
 
-    def invoke(self, user_prompt: str) -> dict:
+    def _after_intent(self, execution_state: ExecutionState) -> str:
+        next_node = self.intent_router.next_node(execution_state)
+        if next_node == 'plan':
+            return self.task_planner.route_planning_mode(execution_state)
+        return next_node
+
+
+    async def ainvoke(self, user_prompt: str, config: dict) -> dict:
 
         self.state.scratchpad.original_prompt = user_prompt
-        return self.workflow.invoke(self.state)
+        return await self.workflow.ainvoke(self.state, config)
     
 
     def is_missing_values_for_human_input(self, result: dict) -> Tuple[bool, dict[str,str]]:
@@ -107,7 +131,8 @@ if __name__ == "__main__":
         )
     )
     
-    result = graph.invoke(input=state, config=graph_config)
+    import asyncio
+    result = asyncio.run(graph.ainvoke(input=state, config=graph_config))
 
     pass
     # yes, missing_values = workflow.is_missing_values_for_human_input(result)
@@ -0,0 +1,308 @@
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+from langgraph.graph.state import CompiledStateGraph
+from langgraph.types import Command
+
+from agents.checkpointer import SqliteCheckpointSaver
+from agents.metrics import Metrics
+from agents.tracing import Tracer
+from agents.events import stream_workflow_events, pending_interrupts, to_sse, to_jsonable, ERROR_EVENT, INTERRUPT_EVENT
+
+
+class WorkflowQueueFullError(RuntimeError):
+
+    def __init__(self, retry_after_seconds: int):
+        super().__init__('workflow queue is full')
+        self.retry_after_seconds = retry_after_seconds
+
+
+class WorkflowBusyError(RuntimeError):
+    pass
+
+
+# job statuses, the last three are persisted final states of a run
+QUEUED = 'queued'
+RUNNING = 'running'
+WAITING_FOR_INPUT = 'waiting_for_input'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+class WorkflowJob:
+    """
+    One workflow thread and the SSE frames of its latest run (start or resume).
+    Frames are buffered up to `max_frames` so clients connecting late or reconnecting can replay the run.
+    """
+
+    def __init__(self, thread_id: str, max_frames: int):
+        self.thread_id = thread_id
+        self.config = {"configurable": {"thread_id": thread_id}}
+        self.status = QUEUED
+        self.result: Any = None
+        self.interrupt_data: Any = None
+        self.error: Optional[str] = None
+        self.frames: Deque[str] = deque(maxlen=max_frames)
+        self.frame_count = 0
+        self.finished = False
+        self._changed = asyncio.Condition()
+
+
+    def start_run(self) -> None:
+        self.status = QUEUED
+        self.frames.clear()
+        self.frame_count = 0
+        self.finished = False
+
+
+    async def publish(self, frame: str) -> None:
+        async with self._changed:
+            self.frames.append(frame)
+            self.frame_count += 1
+            self._changed.notify_all()
+
+
+    async def finish(self, status: str) -> None:
+        async with self._changed:
+            self.status = status
+            self.finished = True
+            self._changed.notify_all()
+
+
+    async def follow(self) -> AsyncIterator[str]:
+        """yields the run's frames from the first still buffered one until the run finishes."""
+        sent = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.frame_count > sent or self.finished)
+                first = self.frame_count - len(self.frames)
+                sent = max(sent, first)
+                pending = list(self.frames)[sent - first:]
+                finished = self.finished
+            for frame in pending:
+                yield frame
+            sent += len(pending)
+            if finished and sent >= self.frame_count:
+                return
+
+
+class WorkflowJobStore:
+    """
+    SQLite (WAL) record of each thread's latest run outcome, so clients can read results
+    and reconnect after the run finished or the server restarted.
+    """
+
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS workflow_jobs (
+                thread_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                result TEXT,
+                interrupt_data TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )""")
+        self._db.commit()
+
+
+    def save(self, job: WorkflowJob) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workflow_jobs (thread_id, status, result, interrupt_data, error, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.thread_id, job.status,
+                 json.dumps(job.result, default=to_jsonable),
+                 json.dumps(job.interrupt_data, default=to_jsonable),
+                 job.error, time.time()))
+            self._db.commit()
+
+
+    def load(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, result, interrupt_data, error FROM workflow_jobs WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'status': row[0],
+            'result': json.loads(row[1]) if row[1] else None,
+            'interrupt_data': json.loads(row[2]) if row[2] else None,
+            'error': row[3]
+        }
+
+
+class WorkflowJobQueue:
+    """
+    Runs workflow graphs in the background on a bounded pool of async workers.
+
+    - `submit` enqueues a run (initial state or Command(resume=...)) and returns immediately,
+      raising WorkflowQueueFullError when `max_queue_size` runs are already waiting
+    - runs continue when SSE clients disconnect, `follow` lets any number of clients attach to a run
+    - each run's outcome is persisted in the WorkflowJobStore
+
+    Usage:
+        jobs = WorkflowJobQueue(graph, workers=4, max_queue_size=100, store=WorkflowJobStore(path))
+        await jobs.start()
+        jobs.submit(thread_id, initial_state)
+        async for frame in jobs.follow(thread_id): ...
+    """
+
+    def __init__(self, graph: CompiledStateGraph, workers: int, max_queue_size: int,
+                 store: WorkflowJobStore, retry_after_seconds: int = 5, max_frames: int = 5000,
+                 max_jobs_in_memory: int = 1000):
+        self.graph = graph
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.store = store
+        self.retry_after_seconds = retry_after_seconds
+        self.max_frames = max_frames
+        self.max_jobs_in_memory = max_jobs_in_memory
+        self.active = 0
+        self._jobs: Dict[str, WorkflowJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._work(), name=f'workflow-worker-{i}') for i in range(self.workers)]
+
+
+    async def stop(self) -> None:
+        """cancels the running runs and fails the queued ones, both are persisted as failed."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        while self._queue is not None and not self._queue.empty():
+            job, _ = self._queue.get_nowait()
+            job.error = 'the server shut down before the workflow started, submit it again'
+            await job.publish(to_sse({'thread_id': job.thread_id, 'error': job.error}, ERROR_EVENT))
+            job.status = FAILED
+            self.store.save(job)
+            await job.finish(FAILED)
+
+
+    def submit(self, thread_id: str, input: Any) -> WorkflowJob:
+        job = self._jobs.get(thread_id)
+        if job is not None and not job.finished:
+            raise WorkflowBusyError(f'workflow {thread_id} is already {job.status}')
+        if self._queue.full():
+            raise WorkflowQueueFullError(self.retry_after_seconds)
+
+        if job is None:
+            job = WorkflowJob(thread_id, self.max_frames)
+        job.start_run()
+        self._remember(job)
+        self._queue.put_nowait((job, input))
+        return job
+
+
+    def get(self, thread_id: str) -> Optional[WorkflowJob]:
+        """the thread's job, restored from the store as a finished run when it is not in memory."""
+        job = self._jobs.get(thread_id)
+        if job is not None:
+            return job
+
+        record = self.store.load(thread_id)
+        if record is None:
+            return None
+
+        job = WorkflowJob(thread_id, self.max_frames)
+        job.status, job.result, job.interrupt_data, job.error = record['status'], record['result'], record['interrupt_data'], record['error']
+        job.finished = True
+        job.frames.append(self._final_frame(job))
+        job.frame_count = 1
+        self._remember(job)
+        return job
+
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': len(self._workers),
+            'active': self.active,
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'max_queue_size': self.max_queue_size
+        }
+
+
+    async def _work(self) -> None:
+        while True:
+            job, input = await self._queue.get()
+            self.active += 1
+            try:
+                await self._run(job, input)
+            finally:
+                self.active -= 1
+                self._queue.task_done()
+
+
+    async def _run(self, job: WorkflowJob, input: Any) -> None:
+        # root span of the run, every node, task, tool and LLM call of the run nests below it
+        with Tracer().span('workflow', thread_id=job.thread_id, resume=isinstance(input, Command)) as span:
+            await self._execute(job, input)
+            span.set(workflow_status=job.status)
+
+
+    async def _execute(self, job: WorkflowJob, input: Any) -> None:
+        started = time.monotonic()
+        job.status = RUNNING
+        job.error = None
+        try:
+            async for frame in stream_workflow_events(self.graph, input, job.config):
+                await job.publish(frame)
+
+            state = await self.graph.aget_state(job.config)
+            interrupts = pending_interrupts(state)
+            job.interrupt_data = interrupts[0] if interrupts else None
+            job.result = state.values.get('scratchpad')
+            status = WAITING_FOR_INPUT if interrupts else COMPLETED
+
+        except asyncio.CancelledError:
+            job.error = 'workflow was cancelled'
+            Metrics().observe_workflow(time.monotonic() - started, FAILED)
+            await job.finish(FAILED)
+            self.store.save(job)
+            raise
+
+        except Exception as e:
+            job.error = str(e)
+            await job.publish(to_sse({'thread_id': job.thread_id, 'error': job.error}, ERROR_EVENT))
+            status = FAILED
+
+        job.status = status
+        Metrics().observe_workflow(time.monotonic() - started, status)
+        self.store.save(job)
+        if status != WAITING_FOR_INPUT and isinstance(self.graph.checkpointer, SqliteCheckpointSaver):
+            self.graph.checkpointer.mark_finished(job.thread_id)
+        await job.finish(status)
+
+
+    def _remember(self, job: WorkflowJob) -> None:
+        # most recently used last, finished runs beyond max_jobs_in_memory are served from the store
+        self._jobs.pop(job.thread_id, None)
+        self._jobs[job.thread_id] = job
+        for thread_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs_in_memory:
+                break
+            if self._jobs[thread_id].finished:
+                del self._jobs[thread_id]
+
+
+    @staticmethod
+    def _final_frame(job: WorkflowJob) -> str:
+        if job.status == WAITING_FOR_INPUT:
+            return to_sse({'thread_id': job.thread_id, 'interrupt_data': job.interrupt_data, 'interrupts': [job.interrupt_data]}, INTERRUPT_EVENT)
+        if job.status == FAILED:
+            return to_sse({'thread_id': job.thread_id, 'error': job.error}, ERROR_EVENT)
+        return to_sse({'thread_id': job.thread_id, 'result': job.result})
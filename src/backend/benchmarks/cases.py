@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import List, Optional
+import yaml
+from pydantic import BaseModel, Field
+
+
+EVALUATION_DIR = Path(__file__).resolve().parents[2] / 'evaluation'
+
+
+class EvaluationCase(BaseModel):
+    category: str = Field(description="The test case category, e.g. data_analysis")
+    name: str = Field(description="The test case name")
+    case_id: Optional[int] = Field(default=None, description="The case id within its category")
+    prompt: str = Field(description="The user prompt of the case")
+    source: str = Field(default='', description="The YAML file the case was read from")
+
+    @property
+    def key(self) -> str:
+        # names repeat across files, e.g. resource_search/search_resource_group
+        return f"{Path(self.source).stem}/{self.name}"
+
+
+def load_cases(evaluation_dir: Path = EVALUATION_DIR, categories: Optional[List[str]] = None) -> List[EvaluationCase]:
+    """
+    Reads the test cases of src/evaluation/*.yaml.
+    A category lists its cases under `cases`, or is a single case itself with `name` and `prompt`.
+    """
+    cases: List[EvaluationCase] = []
+    for path in sorted(Path(evaluation_dir).glob('*.yaml')):
+        with open(path, 'r', encoding='utf-8') as f:
+            document = yaml.safe_load(f) or {}
+
+        for category in document.get('test_cases', []):
+            entries = category.get('cases') or [category]
+            for entry in entries:
+                cases.append(EvaluationCase(
+                    category=category['category'],
+                    name=entry['name'],
+                    case_id=entry.get('case_id'),
+                    prompt=entry['prompt'].strip(),
+                    source=path.name
+                ))
+
+    if categories:
+        cases = [case for case in cases if case.category in categories]
+    return cases
@@ -0,0 +1,247 @@
+"""
+Benchmarks the orchestration layer offline: every src/evaluation case runs through the full
+AzureWorkflow graph (intent routing, planning, command generation, overseer, checkpointer) with the
+LLM, MCP server and shell replaced by simulated backends of configurable latency,
+see benchmarks/simulated_backends.py.
+
+Latencies are read from the workflow's tracing spans, reported as p50/p95 per node, per tool
+and end to end.
+With --replay the backends replay a cassette recorded with CASSETTE_MODE=record instead
+(see agents/cassette.py), at recorded speed or, with --replay-time-scale 0, as fast as possible
+to measure the framework overhead alone.
+Node and command caches are disabled, every run pays for every call.
+No Azure or OpenAI access is needed, settings missing from the environment and .env are dummies.
+Replays need the deployment settings of the recording, LLM requests are matched by deployment path.
+
+Usage (from src/backend):
+    python -m benchmarks.orchestration --runs 5 --time-scale 0.1 --output orchestration.json
+    python -m benchmarks.orchestration --runs 5 --time-scale 0.1 \
+        --baseline orchestration.json --tolerance 0.2
+    python -m benchmarks.orchestration --replay recorded.jsonl --replay-time-scale 0 \
+        --output overhead.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import uuid
+
+import os, sys
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, os.path.join(backend_dir, 'agents'))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# before Config is created: caches would hide the latency of repeated runs
+os.environ['NODE_CACHE_ENABLED'] = 'false'
+os.environ['COMMAND_CACHE_ENABLED'] = 'false'
+os.environ['TRACING_EXPORTER'] = 'none'
+os.environ.setdefault('AGENT_WORKING_DIRECTORY', tempfile.mkdtemp(prefix='lena-benchmark-'))
+for name, value in {
+    'AZURE_CLIENT_ID': 'benchmark', 'AZURE_CLIENT_SECRET': 'benchmark',
+    'AZURE_TENANT_ID': 'benchmark',
+    'AZURE_OPENAI_DEPLOYMENT_NAME': 'benchmark', 'AZURE_OPENAI_MODEL_NAME': 'benchmark',
+    'AZURE_OPENAI_ENDPOINT': 'https://benchmark.invalid',
+    'FOUNDRY_ENDPOINT': 'https://benchmark.invalid',
+    'AZURE_OPENAI_API_KEY': 'benchmark', 'AZURE_OPENAI_API_VERSION': '2024-12-01-preview'
+}.items():
+    os.environ.setdefault(name, value)
+
+from config import Config
+from agents.state import ExecutionState, Scratchpad
+from agents.tracing import Tracer
+from agents.cassette import Cassette
+from agents.workflow import AzureWorkflow
+from benchmarks.cases import EvaluationCase, load_cases
+from benchmarks.simulated_backends import LatencyProfile, install
+from benchmarks.stats import latency_summary
+
+
+class MemorySpanExporter:
+    """keeps finished spans in memory for the summary."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        self.spans.extend(spans)
+
+
+async def run_case(graph: Any, case: EvaluationCase, run: int, planning_mode: Optional[str],
+                   semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    thread_id = f'benchmark-{run}-{uuid.uuid4().hex[:8]}'
+    username = 'benchmark'
+    Config().ensure_cwd_exists(os.path.join(Config().agent_cwd, username, thread_id))
+
+    state = ExecutionState(
+        username=username,
+        tread_id=thread_id,
+        scratchpad=Scratchpad(original_prompt=case.prompt, planning_mode=planning_mode)
+    )
+
+    async with semaphore:
+        started = time.perf_counter()
+        error = None
+        failed_tasks = []
+        try:
+            with Tracer().span('workflow', thread_id=thread_id, case=case.key):
+                result = await graph.ainvoke(state, {'configurable': {'thread_id': thread_id}})
+            failed_tasks = [
+                {'case': case.key, 'task_id': task.task_id, 'task_type': task.task_type,
+                 'status': task.status, 'error': task.error}
+                for task in result['scratchpad'].task_plan.tasks if task.status != 'succeeded'
+            ]
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        seconds = time.perf_counter() - started
+
+    print(f"{case.key} run {run + 1}: {seconds:.2f}s{' ' + error if error else ''}",
+          file=sys.stderr)
+    return {'case': case.key, 'run': run, 'thread_id': thread_id, 'seconds': seconds,
+            'error': error, 'failed_tasks': failed_tasks}
+
+
+async def benchmark(cases: List[EvaluationCase], runs: int, concurrency: int,
+                    planning_mode: Optional[str]) -> Dict[str, Any]:
+    exporter = MemorySpanExporter()
+    Tracer().exporter = exporter
+
+    graph = AzureWorkflow().build_graph()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    samples = await asyncio.gather(*[
+        run_case(graph, case, run, planning_mode, semaphore)
+        for run in range(runs)
+        for case in cases
+    ])
+    Tracer().flush()
+
+    return {'samples': list(samples), 'summary': summarize(exporter.spans, list(samples))}
+
+
+def summarize(spans: List[Dict[str, Any]], samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """latency summaries of the recorded spans, grouped by what they measured."""
+    def durations(name: str, attribute: str) -> Dict[str, List[float]]:
+        groups: Dict[str, List[float]] = {}
+        for span in spans:
+            if span['name'] == name:
+                group = groups.setdefault(str(span['attributes'].get(attribute)), [])
+                group.append(span['end'] - span['start'])
+        return groups
+
+    def summaries(groups: Dict[str, List[float]]) -> Dict[str, Dict[str, Any]]:
+        return {key: latency_summary(values) for key, values in sorted(groups.items())}
+
+    workflows = durations('workflow', 'case')
+    return {
+        'end_to_end': latency_summary(seconds for values in workflows.values()
+                                      for seconds in values),
+        'cases': summaries(workflows),
+        'nodes': summaries(durations('node', 'node')),
+        'tools': summaries(durations('tool', 'tool')),
+        'task_types': summaries(durations('task', 'task_type')),
+        'failed_tasks': [task for sample in samples for task in sample['failed_tasks']],
+        'errors': [sample for sample in samples if sample['error']]
+    }
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """p95 latencies over the baseline's by more than `tolerance` (a fraction), one line each."""
+    groups = ('nodes', 'tools', 'task_types')
+    regressions = []
+    current_groups = {'end_to_end': {'workflow': summary['end_to_end']},
+                      **{g: summary[g] for g in groups}}
+    baseline_groups = {'end_to_end': {'workflow': baseline['end_to_end']},
+                       **{g: baseline.get(g, {}) for g in groups}}
+
+    for group, entries in current_groups.items():
+        for name, current in entries.items():
+            previous = baseline_groups[group].get(name)
+            if not previous or previous.get('p95_seconds') is None:
+                continue
+            if current.get('p95_seconds') is None:
+                continue
+            if current['p95_seconds'] > previous['p95_seconds'] * (1 + tolerance):
+                regressions.append(f"{group}/{name}: p95 {current['p95_seconds']:.3f}s, "
+                                   f"baseline {previous['p95_seconds']:.3f}s")
+    return regressions
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"{'':<40}{'count':>8}{'p50':>10}{'p95':>10}{'max':>10}")
+    rows = [('end_to_end', summary['end_to_end'])]
+    for group in ('nodes', 'tools', 'task_types'):
+        rows += [(f'{group}/{name}', values) for name, values in summary[group].items()]
+    for name, values in rows:
+        print(f"{name:<40}{values['count']:>8}" + ''.join(
+            f"{'-' if values[k] is None else round(values[k], 3):>10}"
+            for k in ('p50_seconds', 'p95_seconds', 'max_seconds')))
+    print(f"failed tasks: {len(summary['failed_tasks'])}, errors: {len(summary['errors'])}")
+
+
+if __name__ == "__main__":
+    defaults = LatencyProfile()
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='runs per case')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='workflow runs in flight at once')
+    parser.add_argument('--category', action='append',
+                        help='only run cases of this category, repeatable')
+    parser.add_argument('--planning-mode', choices=['two_step', 'fused'], default=None,
+                        help='defaults to PLANNING_MODE')
+    for field, info in LatencyProfile.model_fields.items():
+        default = getattr(defaults, field)
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default,
+                            help=info.description)
+    parser.add_argument('--replay', default=None,
+                        help='cassette to replay instead of the simulated backends')
+    parser.add_argument('--replay-time-scale', type=float, default=1.0,
+                        help='1.0 replays at recorded speed, 0 as fast as possible')
+    parser.add_argument('--output', default='orchestration.json', help='JSON report path')
+    parser.add_argument('--baseline', default=None,
+                        help='JSON report of an earlier run, exits with 1 when a p95 regressed')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p95 increase over the baseline, as a fraction')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        # read first, the output may overwrite it
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    profile = LatencyProfile(**{field: getattr(args, field)
+                                for field in LatencyProfile.model_fields})
+    if args.replay:
+        cassette = Cassette()
+        cassette.mode, cassette.path = 'replay', args.replay
+        cassette.time_scale = args.replay_time_scale
+    else:
+        install(profile)
+
+    report = asyncio.run(benchmark(load_cases(categories=args.category), args.runs,
+                                   args.concurrency, args.planning_mode))
+    report['settings'] = {
+        'runs': args.runs,
+        'concurrency': args.concurrency,
+        'planning_mode': args.planning_mode or Config().planning_mode,
+        'latencies': None if args.replay else profile.model_dump(),
+        'replay': ({'cassette': args.replay, 'time_scale': args.replay_time_scale}
+                   if args.replay else None)
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print_summary(report['summary'])
+
+    if baseline:
+        regressions = compare(report['summary'], baseline['summary'], args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,153 @@
+"""
+Benchmarks the two planning modes on the src/evaluation cases:
+- two_step: prompt optimizer call, then task planner call (optimize_prompt -> plan_tasks)
+- fused: one structured output call returning the optimized prompt and the tasks (plan_tasks_fused)
+
+Only the planning LLM calls are measured, node caches and command generation are bypassed.
+Needs the Azure OpenAI settings of the .env file.
+
+Usage (from src/backend):
+    python -m benchmarks.planning_modes --runs 3 --output planning_modes.json
+"""
+from typing import Any, Dict, List
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import os, sys
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, os.path.join(backend_dir, 'agents'))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from agents.prompt import task_planner_fused_system_prompt
+from agents.state import TaskPlannerOutput, TaskPlannerFusedOutput
+from agents.task_planner_agent import TaskPlanner
+from agents.plan_analysis import annotate_plan
+from benchmarks.cases import EvaluationCase, load_cases
+from benchmarks.stats import percentile, mean
+
+
+MODES = ('two_step', 'fused')
+PLACEHOLDER = re.compile(r'<[a-zA-Z0-9_ ]+>')
+
+
+async def plan(planner: TaskPlanner, mode: str, prompt: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with get_usage_metadata_callback() as usage:
+        try:
+            if mode == 'fused':
+                output: TaskPlannerFusedOutput = await planner._invoke_planner(
+                    prompt, TaskPlannerFusedOutput, task_planner_fused_system_prompt)
+                optimized_prompt = output.optimized_prompt
+            else:
+                optimized_prompt = await planner._invoke_prompt_optimizer(prompt)
+                output: TaskPlannerOutput = await planner._invoke_planner(optimized_prompt)
+            error = None
+        except Exception as e:
+            output, optimized_prompt, error = None, '', str(e)
+    latency = time.perf_counter() - started
+
+    tokens = {'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0}
+    for model_usage in usage.usage_metadata.values():
+        tokens['input_tokens'] += model_usage.get('input_tokens', 0)
+        tokens['cached_input_tokens'] += (model_usage.get('input_token_details') or {}).get('cache_read', 0) or 0
+        tokens['output_tokens'] += model_usage.get('output_tokens', 0)
+
+    return {'latency_seconds': latency, **tokens, 'error': error, **plan_quality(planner, output, optimized_prompt)}
+
+
+def plan_quality(planner: TaskPlanner, output: TaskPlannerOutput, optimized_prompt: str) -> Dict[str, Any]:
+    """plan shape indicators comparable across modes, None values when planning failed."""
+    if output is None:
+        return {'valid': False, 'task_count': None, 'task_types': None, 'placeholders': None,
+                'dependency_edges': None, 'parallelism': None}
+
+    task_plan = annotate_plan(planner._create_task_plan_from_output(output))
+    critical_path = task_plan.estimated_critical_path_seconds or 0.0
+    return {
+        'valid': bool(output.tasks),
+        'task_count': len(output.tasks),
+        'task_types': [task.task_type for task in output.tasks],
+        'placeholders': len(PLACEHOLDER.findall(optimized_prompt + ' '.join(t.prompt for t in output.tasks))),
+        'dependency_edges': sum(len(task.depends_on) for task in output.tasks),
+        # estimated sequential duration over critical path duration, 1.0 means no task can run in parallel
+        'parallelism': round(task_plan.estimated_total_seconds / critical_path, 2) if critical_path else None,
+        'optimized_prompt': optimized_prompt
+    }
+
+
+async def benchmark(cases: List[EvaluationCase], runs: int) -> Dict[str, Any]:
+    planner = TaskPlanner()
+    results: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+
+    for case in cases:
+        results[case.key] = {mode: [] for mode in MODES}
+        for run in range(runs):
+            # alternate which mode goes first, so warm connections do not favour one mode
+            modes = MODES if run % 2 == 0 else tuple(reversed(MODES))
+            for mode in modes:
+                results[case.key][mode].append(await plan(planner, mode, case.prompt))
+                print(f"{case.key} [{mode}] run {run + 1}: {results[case.key][mode][-1]['latency_seconds']:.2f}s", file=sys.stderr)
+
+    return {'runs': runs, 'cases': results, 'summary': summarize(results)}
+
+
+def summarize(results: Dict[str, Dict[str, List[Dict[str, Any]]]]) -> Dict[str, Dict[str, Any]]:
+    summary = {}
+    for mode in MODES:
+        samples = [sample for case in results.values() for sample in case[mode]]
+        latencies = sorted(sample['latency_seconds'] for sample in samples)
+        valid = [sample for sample in samples if sample['valid']]
+        summary[mode] = {
+            'samples': len(samples),
+            'latency_p50_seconds': percentile(latencies, 50),
+            'latency_p95_seconds': percentile(latencies, 95),
+            'input_tokens_mean': mean(sample['input_tokens'] for sample in samples),
+            'cached_input_tokens_mean': mean(sample['cached_input_tokens'] for sample in samples),
+            'output_tokens_mean': mean(sample['output_tokens'] for sample in samples),
+            'valid_rate': len(valid) / len(samples) if samples else None,
+            'task_count_mean': mean(sample['task_count'] for sample in valid),
+            'placeholders_mean': mean(sample['placeholders'] for sample in valid),
+            'parallelism_mean': mean(sample['parallelism'] for sample in valid if sample['parallelism'])
+        }
+
+    # per case, how often both modes planned the same sequence of task types
+    same_types = [
+        a['task_types'] == b['task_types']
+        for case in results.values()
+        for a, b in zip(case['two_step'], case['fused'])
+        if a['valid'] and b['valid']
+    ]
+    summary['agreement'] = {'same_task_types_rate': sum(same_types) / len(same_types) if same_types else None}
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]]) -> None:
+    columns = ['latency_p50_seconds', 'latency_p95_seconds', 'input_tokens_mean', 'cached_input_tokens_mean', 'output_tokens_mean',
+               'valid_rate', 'task_count_mean', 'placeholders_mean', 'parallelism_mean']
+    print(f"{'metric':<26}" + ''.join(f"{mode:>12}" for mode in MODES))
+    for column in columns:
+        row = [summary[mode][column] for mode in MODES]
+        print(f"{column:<26}" + ''.join(f"{'-' if v is None else round(v, 2):>12}" for v in row))
+    print(f"same task types rate: {summary['agreement']['same_task_types_rate']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='runs per case and mode')
+    parser.add_argument('--category', action='append', help='only run cases of this category, repeatable')
+    parser.add_argument('--output', default='planning_modes.json', help='JSON report path')
+    args = parser.parse_args()
+
+    report = asyncio.run(benchmark(load_cases(categories=args.category), args.runs))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print_summary(report['summary'])
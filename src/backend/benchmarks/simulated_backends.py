@@ -0,0 +1,291 @@
+"""
+Simulated LLM, MCP and shell backends for offline benchmarks of the orchestration layer.
+
+`install(profile)` patches the seams the workflow reaches external services through:
+- LLMGateway.chat_model: a SimulatedChatModel answering structured output, streamed tool call
+  and chat calls
+- McpSessionPool.get: a SimulatedMcpPool whose Azure CLI generation tool returns a command
+  per intent
+- AzShell._spawn and BashSessionPool.run_commands: commands sleep instead of running
+- CodeTool._arun and DeepResearchTool._arun: sleep and succeed, still instrumented as tools
+
+Everything else (graph, planner, command generation, overseer, checkpointer, blob store)
+runs for real.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
+import asyncio
+import json
+import random
+import re
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from pydantic import BaseModel, Field, PrivateAttr
+
+from agents.state import (AzShellToolExecutionResult, CodeAgentActionOutput,
+                          CodeToolExecutionResult, DeepResearchToolExecutionResult)
+from agents.tools.process import AsyncProcess, ProcessOutputLine, ProcessResult
+from agents.metrics import instrument_tool
+from agents.tracing import Tracer
+
+
+class LatencyProfile(BaseModel):
+    """
+    simulated latencies in seconds, every sleep is multiplied by `time_scale`
+    and varied by +-`jitter`.
+    """
+    llm_first_token_seconds: float = Field(
+        default=0.6, description="Time to the first token of a LLM call")
+    llm_output_tokens_per_second: float = Field(
+        default=80.0, description="Output token rate, streamed plans arrive at this rate")
+    mcp_spawn_seconds: float = Field(default=3.0, description="Start of a MCP server session")
+    mcp_request_seconds: float = Field(default=0.4, description="One MCP tool call")
+    shell_command_seconds: float = Field(default=1.0, description="One az or bash command")
+    python_task_seconds: float = Field(default=5.0, description="A CodeTool run")
+    deep_research_seconds: float = Field(default=10.0, description="A DeepResearchTool run")
+    jitter: float = Field(default=0.2, description="Relative random variation of every latency")
+    time_scale: float = Field(
+        default=1.0, description="Multiplier of all latencies, below 1 for quick runs")
+    seed: int = Field(
+        default=7, description="Seed of the jitter, runs with the same profile sleep the same")
+    _random: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._random = random.Random(self.seed)
+
+    async def sleep(self, seconds: float) -> None:
+        variation = 1 + self._random.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(0.0, seconds * variation * self.time_scale))
+
+
+# keywords deciding the task type of a simulated plan step, az_cli otherwise
+TASK_TYPE_KEYWORDS = [
+    ('python', re.compile(r'\b(analy[sz]e|analysis|plot|chart|csv|pandas|python|dataframe|trend'
+                          r'|merge|transform|column)', re.IGNORECASE)),
+    ('bash', re.compile(r'\b(docker|dockerfile|build|bash|container image|mkdir|file system)',
+                        re.IGNORECASE)),
+    ('deep_research', re.compile(r'\b(research|best practices?|documentation|recommend)',
+                                 re.IGNORECASE)),
+]
+MAX_SIMULATED_TASKS = 8
+
+
+def simulated_plan(prompt: str) -> List[Dict[str, Any]]:
+    """
+    A deterministic task plan for a prompt: one task per numbered line or sentence, typed by
+    keywords. A task depends on the previous one when the tool changes, so plans mix sequential
+    and parallel steps.
+    """
+    steps = [s.strip(' -*\t') for s in re.split(r'\n\s*\d+[.)]\s*|\n|(?<=[.;])\s+', prompt)]
+    steps = [s for s in steps if len(s) > 3][:MAX_SIMULATED_TASKS] or [prompt.strip()]
+
+    tasks = []
+    for index, step in enumerate(steps, start=1):
+        task_type = next((t for t, keywords in TASK_TYPE_KEYWORDS if keywords.search(step)),
+                         'az_cli')
+        tool_changed = tasks and tasks[-1]['task_type'] != task_type
+        depends_on = [tasks[-1]['task_id']] if tool_changed else []
+        tasks.append({
+            'task_id': str(index),
+            'description': step[:60],
+            'task_type': task_type,
+            'prompt': step,
+            'depends_on': depends_on
+        })
+    return tasks
+
+
+def _last_human_text(messages: List[BaseMessage]) -> str:
+    human = [m for m in messages if m.type == 'human']
+    return str(human[-1].content if human else messages[-1].content if messages else '')
+
+
+def _messages(input: Any) -> List[BaseMessage]:
+    if isinstance(input, PromptValue):
+        return input.to_messages()
+    return list(input) if isinstance(input, (list, tuple)) else []
+
+
+class SimulatedChatModel(Runnable):
+    """stands in for AzureChatOpenAI: latency from the profile, outputs made from the prompt."""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None,
+               **kwargs: Any) -> AIMessage:
+        raise NotImplementedError("the workflow calls models asynchronously")
+
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None,
+                      **kwargs: Any) -> AIMessage:
+        text = f"Simulated answer to: {_last_human_text(_messages(input))[:200]}"
+        await self._generate(text)
+        return AIMessage(content=text)
+
+
+    def with_structured_output(self, schema: Type[BaseModel], **kwargs: Any) -> Runnable:
+        async def structured(input: Any) -> BaseModel:
+            output = self.structured_output(schema, _last_human_text(_messages(input)))
+            await self._generate(output.model_dump_json())
+            return output
+        return RunnableLambda(structured)
+
+
+    def bind_tools(self, tools: List[Type[BaseModel]], **kwargs: Any) -> 'SimulatedToolCallStream':
+        return SimulatedToolCallStream(self, tools[0])
+
+
+    def structured_output(self, schema: Type[BaseModel], prompt: str) -> BaseModel:
+        values: Dict[str, Any] = {}
+        if 'tasks' in schema.model_fields:
+            values['tasks'] = simulated_plan(prompt)
+        if 'optimized_prompt' in schema.model_fields:
+            values['optimized_prompt'] = prompt
+        if 'commands' in schema.model_fields:
+            values['commands'] = [f"echo simulated {len(prompt)}"]
+        return schema.model_validate(values)
+
+
+    async def _generate(self, text: str) -> None:
+        # output tokens approximated as characters / 4
+        output_seconds = len(text) / 4 / self.profile.llm_output_tokens_per_second
+        await self.profile.sleep(self.profile.llm_first_token_seconds + output_seconds)
+
+
+class SimulatedToolCallStream:
+    """a forced tool call streamed as argument chunks at the profile's token rate."""
+
+    chunk_chars = 16
+
+    def __init__(self, model: SimulatedChatModel, schema: Type[BaseModel]):
+        self.model = model
+        self.schema = schema
+
+
+    async def astream(self, messages: List[BaseMessage],
+                      **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        profile = self.model.profile
+        output = self.model.structured_output(self.schema, _last_human_text(messages))
+        arguments = output.model_dump_json()
+
+        await profile.sleep(profile.llm_first_token_seconds)
+        for start in range(0, len(arguments), self.chunk_chars):
+            await profile.sleep(self.chunk_chars / 4 / profile.llm_output_tokens_per_second)
+            yield AIMessageChunk(content='', tool_call_chunks=[{
+                'name': self.schema.__name__ if start == 0 else None,
+                'args': arguments[start:start + self.chunk_chars],
+                'id': 'simulated' if start == 0 else None,
+                'index': 0
+            }])
+
+
+class SimulatedMcpTool:
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+    async def ainvoke(self, input: Dict[str, Any]) -> List[Dict[str, str]]:
+        await self.profile.sleep(self.profile.mcp_request_seconds)
+        example = f"az simulated --intent-chars {len(input.get('intent', ''))}"
+        command = {'data': [{'commandSet': [{'example': example}]}]}
+        results = {'command': json.dumps(command)}
+        return [{'text': json.dumps({'message': 'Success', 'results': results})}]
+
+
+class SimulatedMcpSession:
+
+    def __init__(self, profile: LatencyProfile):
+        self.tools = {'extension_cli_generate': SimulatedMcpTool(profile)}
+
+
+class SimulatedMcpPool:
+    """one shared session, spawned on first use like the real pool."""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self._session: Optional[SimulatedMcpSession] = None
+        self._lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[SimulatedMcpSession]:
+        async with self._lock:
+            if self._session is None:
+                with Tracer().span('mcp.spawn', program='simulated'):
+                    await self.profile.sleep(self.profile.mcp_spawn_seconds)
+                self._session = SimulatedMcpSession(self.profile)
+        yield self._session
+
+
+class SimulatedProcess(AsyncProcess):
+    """AsyncProcess that sleeps instead of spawning, prints one line and exits 0."""
+
+    def __init__(self, command: str, profile: LatencyProfile, **kwargs: Any):
+        super().__init__(command, **kwargs)
+        self.profile = profile
+
+    async def stream(self) -> AsyncIterator[ProcessOutputLine]:
+        span = Tracer().start_span('subprocess', program='simulated')
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await self.profile.sleep(self.profile.shell_command_seconds)
+        line = f"simulated output of: {self.command[:80]}"
+        yield ProcessOutputLine(stream='stdout', line=line)
+        self.result = ProcessResult(exit_code=0, wall_time_seconds=loop.time() - started,
+                                    stdout_bytes=len(line) + 1)
+        span.end(exit_code=0)
+
+
+def install(profile: LatencyProfile) -> None:
+    """patches the external backends of the workflow with simulated ones, for the whole process."""
+    from agents.llm_gateway import LLMGateway
+    from agents.tools.mcp_pool import McpSessionPool
+    from agents.tools.az_shell import AzShell
+    from agents.tools.bash_session import BashSessionPool
+    from agents.tools.code import CodeTool
+    from agents.tools.deep_research import DeepResearchTool
+
+    chat_model = SimulatedChatModel(profile)
+    mcp_pool = SimulatedMcpPool(profile)
+
+    async def spawn(self, command: str, timeout: Optional[int]) -> AsyncProcess:
+        return SimulatedProcess(command, profile, timeout=timeout, cwd=self.working_dir)
+
+    async def run_commands(self, thread_id: str, commands: List[str], cwd: Optional[str] = None,
+                           env: Optional[Dict[str, str]] = None,
+                           timeout: Optional[float] = 300) -> List[AzShellToolExecutionResult]:
+        results = []
+        for command in commands:
+            process = SimulatedProcess(command, profile, timeout=timeout, cwd=cwd)
+            lines = [output.line async for output in process.stream()]
+            results.append(AzShellToolExecutionResult(
+                is_successful=True, stdout='\n'.join(lines), exit_code=0,
+                wall_time_seconds=process.result.wall_time_seconds))
+        return results
+
+    @instrument_tool('CodeTool')
+    async def code_tool(self, prompt: str, agent_cwd: str = None) -> CodeToolExecutionResult:
+        await profile.sleep(profile.python_task_seconds)
+        output = CodeAgentActionOutput(is_successful=True, result='simulated python result')
+        return CodeToolExecutionResult(is_successful=True, action_outputs=[output], result=output)
+
+    @instrument_tool('DeepResearchTool')
+    async def deep_research_tool(self, prompt: str) -> DeepResearchToolExecutionResult:
+        await profile.sleep(profile.deep_research_seconds)
+        return DeepResearchToolExecutionResult(is_successful=True, result='simulated research')
+
+    async def env_for(self, identity: Any) -> Dict[str, str]:
+        return {}
+
+    from agents.tools.az_login import AzLoginManager
+
+    LLMGateway.chat_model = lambda self, deployment_name=None, temperature=0.0: chat_model
+    McpSessionPool.get = classmethod(lambda cls, name, server_params: mcp_pool)
+    AzShell._spawn = spawn
+    BashSessionPool.run_commands = run_commands
+    AzLoginManager.env_for = env_for
+    CodeTool._arun = code_tool
+    DeepResearchTool._arun = deep_research_tool
@@ -0,0 +1,30 @@
+from typing import Any, Dict, Iterable, List, Optional
+import statistics
+
+
+def percentile(values: List[float], percentile: float) -> Optional[float]:
+    """nearest rank percentile of sorted values, None without values."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(percentile / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def mean(values: Iterable[float]) -> Optional[float]:
+    values = list(values)
+    return round(statistics.mean(values), 2) if values else None
+
+
+def latency_summary(seconds: Iterable[float]) -> Dict[str, Any]:
+    values = sorted(seconds)
+    return {
+        'count': len(values),
+        'p50_seconds': _rounded(percentile(values, 50)),
+        'p95_seconds': _rounded(percentile(values, 95)),
+        'mean_seconds': _rounded(statistics.mean(values)) if values else None,
+        'max_seconds': _rounded(values[-1]) if values else None
+    }
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 4)
@@ -38,6 +38,139 @@ class Config:
         self.azure_openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
         self.azure_openai_api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
 
+        # LLM gateway connection pools
+        self.llm_max_connections_per_deployment = int(
+            os.getenv("LLM_MAX_CONNECTIONS_PER_DEPLOYMENT", "32"))
+        self.llm_max_keepalive_connections_per_deployment = int(
+            os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS_PER_DEPLOYMENT", "16"))
+        self.llm_keepalive_expiry_seconds = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "120"))
+        self.llm_request_timeout_seconds = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "120"))
+
+        # MCP session pool
+        self.mcp_pool_size = int(os.getenv("MCP_POOL_SIZE", "2"))
+        self.mcp_pool_max_concurrency_per_session = int(
+            os.getenv("MCP_POOL_MAX_CONCURRENCY_PER_SESSION", "4"))
+        self.mcp_pool_health_check_interval = float(
+            os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+
+        # task planner
+        self.command_generation_concurrency = int(os.getenv("COMMAND_GENERATION_CONCURRENCY", "8"))
+        self.planner_max_attempts = int(os.getenv("PLANNER_MAX_ATTEMPTS", "2"))
+        # two_step: optimize_prompt then plan_tasks, fused: plan_tasks_fused does both in one call
+        self.planning_mode = os.getenv("PLANNING_MODE", "two_step")
+
+        # stream the plan and generate commands for each task as soon as it is complete,
+        # while later tasks are still planned
+        self.planner_streaming_enabled = os.getenv(
+            "PLANNER_STREAMING_ENABLED", "true").lower() == "true"
+        self.task_timing_history_path = os.getenv(
+            "TASK_TIMING_HISTORY_PATH", os.path.join(self.agent_cwd, ".cache", "task_timings.json"))
+
+        # intent router, routes questions and unsupported requests around planning
+        self.intent_router_enabled = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+        # small model deployment classifying prompts the heuristics cannot decide, empty plans them
+        self.intent_classifier_deployment = os.getenv("INTENT_CLASSIFIER_DEPLOYMENT", "")
+        # deployment answering question prompts, empty uses AZURE_OPENAI_DEPLOYMENT_NAME
+        self.intent_answer_deployment = os.getenv("INTENT_ANSWER_DEPLOYMENT", "")
+
+        # task execution, max concurrently running tasks per task type
+        self.task_type_concurrency = {
+            'az_cli': int(os.getenv("TASK_CONCURRENCY_AZ_CLI", "4")),
+            'bash': int(os.getenv("TASK_CONCURRENCY_BASH", "1")),
+            'python': int(os.getenv("TASK_CONCURRENCY_PYTHON", "2")),
+            'deep_research': int(os.getenv("TASK_CONCURRENCY_DEEP_RESEARCH", "2")),
+        }
+        self.az_cli_command_timeout_seconds = float(
+            os.getenv("AZ_CLI_COMMAND_TIMEOUT_SECONDS", "1800"))
+
+        # az login
+        self.az_login_refresh_margin_seconds = float(
+            os.getenv("AZ_LOGIN_REFRESH_MARGIN_SECONDS", "300"))
+        self.az_login_timeout_seconds = float(os.getenv("AZ_LOGIN_TIMEOUT_SECONDS", "120"))
+        # per identity AZURE_CONFIG_DIRs with the az tokens, outside the agent working directory
+        self.az_login_config_root = os.path.abspath(
+            os.getenv("AZ_LOGIN_CONFIG_ROOT", os.path.join(Path.home(), ".lena", "azure")))
+        agent_cwd = Path(self.agent_cwd).resolve()
+        assert not Path(self.az_login_config_root).resolve().is_relative_to(agent_cwd), \
+            "AZ_LOGIN_CONFIG_ROOT must be outside AGENT_WORKING_DIRECTORY."
+
+        # bash sessions
+        self.bash_session_idle_timeout_seconds = float(
+            os.getenv("BASH_SESSION_IDLE_TIMEOUT_SECONDS", "600"))
+        self.bash_session_max_sessions = int(os.getenv("BASH_SESSION_MAX_SESSIONS", "64"))
+        self.bash_session_reap_interval_seconds = float(
+            os.getenv("BASH_SESSION_REAP_INTERVAL_SECONDS", "60"))
+        self.bash_command_timeout_seconds = float(os.getenv("BASH_COMMAND_TIMEOUT_SECONDS", "300"))
+
+        # command outputs above this size are spilled to the thread's working directory,
+        # spill files are deleted once not modified for the TTL
+        self.output_spill_threshold_bytes = int(
+            os.getenv("OUTPUT_SPILL_THRESHOLD_BYTES", str(256 * 1024)))
+        self.output_spill_ttl_seconds = float(
+            os.getenv("OUTPUT_SPILL_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+        # graph node result cache, NODE_CACHE_PATH enables SQLite backing
+        self.node_cache_enabled = os.getenv("NODE_CACHE_ENABLED", "true").lower() == "true"
+        self.node_cache_path = os.getenv("NODE_CACHE_PATH", "")
+        self.node_cache_max_entries = int(os.getenv("NODE_CACHE_MAX_ENTRIES", "512"))
+        self.node_cache_ttl_seconds = float(os.getenv("NODE_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+
+        # max lines of each command's output sent to SSE clients as tool_output events
+        self.tool_output_stream_max_lines = int(os.getenv("TOOL_OUTPUT_STREAM_MAX_LINES", "200"))
+
+        # generated command cache
+        self.command_cache_enabled = os.getenv("COMMAND_CACHE_ENABLED", "true").lower() == "true"
+        self.command_cache_path = os.getenv(
+            "COMMAND_CACHE_PATH", os.path.join(self.agent_cwd, ".cache", "command_cache.sqlite"))
+        self.command_cache_max_entries = int(os.getenv("COMMAND_CACHE_MAX_ENTRIES", "2048"))
+        self.command_cache_ttl_seconds = float(
+            os.getenv("COMMAND_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+        # background workflow runs
+        self.workflow_workers = int(os.getenv("WORKFLOW_WORKERS", "4"))
+        self.workflow_queue_max_size = int(os.getenv("WORKFLOW_QUEUE_MAX_SIZE", "100"))
+        self.workflow_retry_after_seconds = int(os.getenv("WORKFLOW_RETRY_AFTER_SECONDS", "5"))
+        self.workflow_job_store_path = os.getenv("WORKFLOW_JOB_STORE_PATH", os.path.join(
+            self.agent_cwd, ".cache", "workflow_jobs.sqlite"))
+
+        # graph checkpoints, CHECKPOINTER=memory keeps them in process memory instead of SQLite
+        self.checkpointer = os.getenv("CHECKPOINTER", "sqlite").lower()
+        self.checkpoint_path = os.getenv(
+            "CHECKPOINT_PATH", os.path.join(self.agent_cwd, ".cache", "checkpoints.sqlite"))
+        self.checkpoint_max_per_thread = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "3"))
+        self.checkpoint_finished_ttl_seconds = float(
+            os.getenv("CHECKPOINT_FINISHED_TTL_SECONDS", str(24 * 60 * 60)))
+        self.checkpoint_idle_ttl_seconds = float(
+            os.getenv("CHECKPOINT_IDLE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+        self.checkpoint_cleanup_interval_seconds = float(
+            os.getenv("CHECKPOINT_CLEANUP_INTERVAL_SECONDS", "60"))
+
+        # span export of workflow runs: none, jsonl (local file) or otlp (OTLP/HTTP JSON collector)
+        self.tracing_exporter = os.getenv("TRACING_EXPORTER", "none").lower()
+        self.tracing_jsonl_path = os.getenv(
+            "TRACING_JSONL_PATH", os.path.join(self.agent_cwd, ".cache", "traces.jsonl"))
+        self.tracing_otlp_endpoint = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318")
+
+        # record/replay of LLM, MCP and subprocess interactions: off, record or replay
+        self.cassette_mode = os.getenv("CASSETTE_MODE", "off").lower()
+        self.cassette_path = os.getenv(
+            "CASSETTE_PATH", os.path.join(self.agent_cwd, ".cache", "cassette.jsonl"))
+        # replay waits the recorded time multiplied by this, 0 replays as fast as possible
+        self.cassette_replay_time_scale = float(os.getenv("CASSETTE_REPLAY_TIME_SCALE", "1.0"))
+
+        # task results above this size are kept in the blob store,
+        # checkpoints only hold a reference and summary
+        self.blob_store_path = os.getenv("BLOB_STORE_PATH", os.path.join(self.agent_cwd, ".blobs"))
+        self.blob_store_threshold_bytes = int(
+            os.getenv("BLOB_STORE_THRESHOLD_BYTES", str(16 * 1024)))
+        self.blob_store_ttl_seconds = float(
+            os.getenv("BLOB_STORE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+        # thread message history, older messages above the cap are folded into a digest
+        self.history_max_tokens = int(os.getenv("HISTORY_MAX_TOKENS", "4000"))
+        self.history_keep_recent_tokens = int(os.getenv("HISTORY_KEEP_RECENT_TOKENS", "2000"))
+        self.history_digest_max_chars = int(os.getenv("HISTORY_DIGEST_MAX_CHARS", "2000"))
+
     
     def ensure_cwd_exists(self, path: str = None):
         path = Path(path)
@@ -1,135 +1,200 @@
+from contextlib import asynccontextmanager
+from typing import Any, Literal, Optional
+import uuid
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
-import asyncio
-import json
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from langgraph.types import Command
 from agents.workflow import AzureWorkflow
+from agents.workflow_jobs import WorkflowJob, WorkflowJobQueue, WorkflowJobStore, WorkflowQueueFullError, WorkflowBusyError
 from agents.state import ExecutionState, Scratchpad
+from agents.events import pending_interrupts, to_jsonable
+from agents.llm_gateway import LLMGateway
+from agents.metrics import Metrics, Counter, Gauge
+from agents.tools.command_cache import CommandCache
+from agents.tools.bash_session import BashSessionPool
+from agents.tools.mcp_pool import McpSessionPool
+from config import Config
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI()
+workflow = AzureWorkflow()
+graph = workflow.build_graph()
+
+config = Config()
+jobs = WorkflowJobQueue(
+    graph,
+    workers=config.workflow_workers,
+    max_queue_size=config.workflow_queue_max_size,
+    store=WorkflowJobStore(config.workflow_job_store_path),
+    retry_after_seconds=config.workflow_retry_after_seconds
+)
+
+Metrics().register(Gauge('lena_workflow_queue_depth', 'Workflow runs waiting for a worker',
+                         collect=lambda: {(): float(jobs.stats()['queue_depth'])}))
+Metrics().register(Gauge('lena_workflow_active_runs', 'Workflow runs executing on a worker',
+                         collect=lambda: {(): float(jobs.stats()['active'])}))
+Metrics().register(Counter('lena_command_cache_lookups_total', 'Command cache lookups per generator tool, result: hit or miss', ['tool', 'result'],
+                           collect=lambda: {key: value for tool, stats in CommandCache.stats_by_tool().items()
+                                            for key, value in (((tool, 'hit'), float(stats['hits'])), ((tool, 'miss'), float(stats['misses'])))}))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await jobs.start()
+    await BashSessionPool().start()
+    yield
+    await jobs.stop()
+    await BashSessionPool().stop()
+    await McpSessionPool.aclose_all()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+class StartWorkflowRequest(BaseModel):
+    prompt: str = Field(description="what the user wants to get done in Azure")
+    username: str = Field(default="", description="the user the workflow runs for, scopes its working directory")
+    planning_mode: Optional[Literal['two_step', 'fused']] = Field(default=None, description="fused plans in one model call instead of optimize then plan, defaults to PLANNING_MODE")
+
+
+class ResumeWorkflowRequest(BaseModel):
+    user_input: Any = Field(default=None, description="the value returned by interrupt() in the paused node")
+
+
+@app.exception_handler(WorkflowQueueFullError)
+async def queue_full_handler(request, e: WorkflowQueueFullError):
+    return JSONResponse(
+        status_code=429,
+        content={'detail': 'too many workflows queued, retry later'},
+        headers={'Retry-After': str(e.retry_after_seconds)}
+    )
+
+
+@app.exception_handler(WorkflowBusyError)
+async def busy_handler(request, e: WorkflowBusyError):
+    return JSONResponse(status_code=409, content={'detail': str(e)})
+
+
+@app.post("/workflow/start")
+async def start_workflow(request: StartWorkflowRequest):
+    """
+    Queues a new workflow and returns right away, the graph runs on a background worker.
+    Follow it with /workflow/{workflow_id}/stream.
+    """
+    thread_id = str(uuid.uuid4())
+
+    job = jobs.submit(thread_id, ExecutionState(
+        username=request.username,
+        tread_id=thread_id,
+        scratchpad=Scratchpad(original_prompt=request.prompt, planning_mode=request.planning_mode)
+    ))
+
+    return {'workflow_id': thread_id, 'thread_id': thread_id, 'status': job.status}
 
 
 @app.get("/workflow/{thread_id}/stream")
 async def stream_workflow(thread_id: str):
+    """
+    Streams the typed SSE events of the thread's latest run, from the start of the run:
+    token, node_start, node_end, tool_output, then interrupt, error or the result, followed by [DONE].
+    Disconnecting does not stop the run, reconnect to pick it up again.
+    """
+    job = _get_job(thread_id)
+
     async def event_generator():
-        config = workflows[thread_id]["config"]
-        
-        # Stream workflow events
-        for event in graph.stream(None, config, stream_mode="values"):
-            yield f"data: {json.dumps(event)}\n\n"
-            
-            if event.get("status") == "waiting_for_input":
-                yield f"event: interrupt\ndata: {json.dumps(event)}\n\n"
-                break
-        
+        async for frame in job.follow():
+            yield frame
+
         yield "data: [DONE]\n\n"
-    
+
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
-# Client with SSE
-# import sseclient
-# import requests
 
-# response = requests.get(f"{BASE_URL}/workflow/{workflow_id}/stream", stream=True)
-# client = sseclient.SSEClient(response)
+@app.post("/workflow/{thread_id}/resume")
+async def resume_workflow(thread_id: str, request: ResumeWorkflowRequest):
+    """
+    Answers the interrupt the thread is paused on and queues the rest of the run.
+    """
+    job = _get_job(thread_id)
+    state = await graph.aget_state(job.config)
+    interrupts = pending_interrupts(state)
 
-# for event in client.events():
-#     if event.event == "interrupt":
-#         # Handle interrupt immediately
-#         user_input = collect_input(json.loads(event.data))
-#         requests.post(f"{BASE_URL}/workflow/{workflow_id}/resume", 
-#                      json={"user_input": user_input})
+    if not job.finished or not interrupts:
+        raise HTTPException(status_code=409, detail=f"workflow {thread_id} is not waiting for input")
 
+    if request.user_input is None:
+        return {'workflow_id': thread_id, 'status': 'waiting_for_input', 'interrupt_data': interrupts[0]}
 
+    job = jobs.submit(thread_id, Command(resume=request.user_input))
 
-workflow = AzureWorkflow()
-graph = workflow.build_graph()
+    return {'workflow_id': thread_id, 'status': job.status}
 
-prompt_1 = "Create an Azure VM with 4 CPUs and 16GB RAM in East US region."
 
-config = {"configurable": {"thread_id": '1'}}
+@app.get("/workflow/{thread_id}/status")
+async def workflow_status(thread_id: str):
+    job = _get_job(thread_id)
+    state = await graph.aget_state(job.config)
+    scratchpad: Optional[Scratchpad] = state.values.get('scratchpad')
+
+    return {
+        'workflow_id': thread_id,
+        'status': job.status,
+        'next': list(state.next),
+        'interrupt_data': job.interrupt_data,
+        'error': job.error,
+        'tasks': [
+            {'task_id': task.task_id, 'task_type': task.task_type, 'status': task.status}
+            for task in scratchpad.task_plan.tasks
+        ] if scratchpad else []
+    }
+
+
+@app.get("/workflow/{thread_id}/result")
+async def workflow_result(thread_id: str):
+    """outcome of the thread's latest finished run, also available after a server restart."""
+    job = _get_job(thread_id)
+    return {
+        'workflow_id': thread_id,
+        'status': job.status,
+        # a result restored from the job store is JSON already
+        'result': to_jsonable(job.result) if isinstance(job.result, BaseModel) else job.result,
+        'interrupt_data': job.interrupt_data,
+        'error': job.error
+    }
+
+
+@app.get("/workflows/stats")
+async def workflows_stats():
+    return jobs.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition format."""
+    return PlainTextResponse(Metrics().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """
+    connection pools per deployment, cached versus uncached prompt tokens per static prompt prefix,
+    and the command generation round trips saved by the command cache per tool.
+    """
+    gateway = LLMGateway()
+    return {'deployments': gateway.stats(), 'prompt_cache': gateway.prompt_cache_usage.stats(),
+            'command_cache': CommandCache.stats_by_tool()}
+
+
+def _get_job(thread_id: str) -> WorkflowJob:
+    job = jobs.get(thread_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"workflow {thread_id} not found")
+    return job
 
-state = ExecutionState(
-        scratchpad = Scratchpad(
-            original_prompt = prompt_1
-        )
-    )
 
-from typing import Tuple
-from langgraph.types import interrupt, Command
-def is_hitl_needed(result: dict) -> Tuple[bool, dict[str,str]]:
-    interrupt = result.get('__interrupt__', False)
-    interrupt_key = 'value_resolver_agent_missing_values'
-
-    if not interrupt or interrupt_key not in interrupt[0].value:
-        return False, ''
-    
-    missing_values_prompt = interrupt[0].value[interrupt_key]
-
-    return True, missing_values_prompt
-
-
-# stream event to client with SSE.  
-# from fastapi.responses import StreamingResponse
-# import asyncio
-
-# @app.get("/workflow/{workflow_id}/stream")
-# async def stream_workflow(workflow_id: str):
-#     async def event_generator():
-#         config = workflows[workflow_id]["config"]
-        
-#         # Stream workflow events
-#         for event in graph.stream(None, config, stream_mode="values"):
-#             yield f"data: {json.dumps(event)}\n\n"
-            
-#             if event.get("status") == "waiting_for_input":
-#                 yield f"event: interrupt\ndata: {json.dumps(event)}\n\n"
-#                 break
-        
-#         yield "data: [DONE]\n\n"
-    
-#     return StreamingResponse(event_generator(), media_type="text/event-stream")
-
-# # Client with SSE
-# import sseclient
-# import requests
-
-# response = requests.get(f"{BASE_URL}/workflow/{workflow_id}/stream", stream=True)
-# client = sseclient.SSEClient(response)
-
-# for event in client.events():
-#     if event.event == "interrupt":
-#         # Handle interrupt immediately
-#         user_input = collect_input(json.loads(event.data))
-#         requests.post(f"{BASE_URL}/workflow/{workflow_id}/resume", 
-#                      json={"user_input": user_input})
-
-
-while True:
-
-    current_input = state
-
-    # when interrupt() on server-side, this loop will break
-    for event in graph.stream(input=state, config=config, stream_mode="values"):
-        data = event #f"data: {json.dumps(event)}\n\n"
-
-    # Check if interrupted
-    state_snapshot = graph.get_state(config)
-    
-    if not state.next:
-        # Completed
-        print("Workflow completed!")
-        break
-        
-    yes, missing_values = is_hitl_needed(event)
-    if yes:
-        filled_values = missing_values.copy()
-
-        for k, v in missing_values.items():
-            k_input = input(f"Please provide value for '{k}': ")
-            filled_values[k] = k_input
-
-        current_input = Command(resume=filled_values, update=state)
-
-        
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,18 @@
+import os, sys
+import tempfile
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, os.path.join(backend_dir, 'agents'))
+
+# Config asserts these are set, tests never reach Azure or OpenAI
+os.environ.setdefault('AGENT_WORKING_DIRECTORY', tempfile.mkdtemp(prefix='lena-tests-'))
+for name, value in {
+    'AZURE_CLIENT_ID': 'test', 'AZURE_CLIENT_SECRET': 'test', 'AZURE_TENANT_ID': 'test',
+    'AZURE_OPENAI_DEPLOYMENT_NAME': 'test', 'AZURE_OPENAI_MODEL_NAME': 'test',
+    'AZURE_OPENAI_ENDPOINT': 'https://test.invalid', 'FOUNDRY_ENDPOINT': 'https://test.invalid',
+    'AZURE_OPENAI_API_KEY': 'test', 'AZURE_OPENAI_API_VERSION': '2024-12-01-preview'
+}.items():
+    os.environ.setdefault(name, value)
+os.environ['NODE_CACHE_ENABLED'] = 'false'
+os.environ['COMMAND_CACHE_ENABLED'] = 'false'
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from agents.tools.az_login import AzLoginError, AzLoginManager, AzureIdentity
+from config import Config
+
+IDENTITY = AzureIdentity(tenant_id='tenant', client_id='client', client_secret='s3cret')
+
+
+class FakeAz:
+    """answers az login and az account get-access-token, recording each call."""
+
+    def __init__(self, expires_in: float = 3600, login_returncode: int = 0):
+        self.expires_in = expires_in
+        self.login_returncode = login_returncode
+        self.calls = []
+
+    async def __call__(self, env, *args, input=None):
+        self.calls.append({'args': args, 'input': input, 'config_dir': env['AZURE_CONFIG_DIR']})
+        if args[0] == 'login':
+            return '', 'login failed' if self.login_returncode else '', self.login_returncode
+        return json.dumps({'expires_on': time.time() + self.expires_in}), '', 0
+
+    def logins(self):
+        return [call for call in self.calls if call['args'][0] == 'login']
+
+
+@pytest.fixture
+def manager(monkeypatch, tmp_path):
+    manager = AzLoginManager()
+    monkeypatch.setattr(manager, 'config_root', str(tmp_path / 'azure'))
+    monkeypatch.setattr(manager, '_expires_on', {})
+    return manager
+
+
+def test_the_secret_is_piped_to_stdin_not_passed_on_the_command_line(manager, monkeypatch):
+    az = FakeAz()
+    monkeypatch.setattr(manager, '_communicate_az', az)
+    env = asyncio.run(manager.env_for(IDENTITY))
+
+    login, = az.logins()
+    assert 's3cret' not in ' '.join(login['args'])
+    assert login['args'][login['args'].index('--password') + 1] == '@/dev/stdin'
+    assert login['input'] == b's3cret'
+    assert env['AZURE_CONFIG_DIR'] == login['config_dir'] == manager.config_dir(IDENTITY)
+
+
+def test_config_dirs_are_outside_the_agent_working_directory():
+    agent_cwd = os.path.realpath(Config().agent_cwd)
+    config_dir = os.path.realpath(AzLoginManager().config_dir(IDENTITY))
+
+    assert os.path.commonpath([agent_cwd, config_dir]) != agent_cwd
+
+
+def test_login_is_reused_until_the_token_nears_expiry(manager, monkeypatch):
+    az = FakeAz(expires_in=3600)
+    monkeypatch.setattr(manager, '_communicate_az', az)
+
+    async def run():
+        await manager.env_for(IDENTITY)
+        await manager.env_for(IDENTITY)
+        # within refresh_margin_seconds of expiry, the next command logs in again
+        az.expires_in = manager.refresh_margin_seconds / 2
+        manager.logout(IDENTITY)
+        await manager.env_for(IDENTITY)
+        await manager.env_for(IDENTITY)
+
+    asyncio.run(run())
+
+    assert len(az.logins()) == 3
+
+
+def test_concurrent_commands_log_in_once(manager, monkeypatch):
+    az = FakeAz()
+    monkeypatch.setattr(manager, '_communicate_az', az)
+
+    async def run():
+        await asyncio.gather(*[manager.env_for(IDENTITY) for _ in range(5)])
+
+    asyncio.run(run())
+
+    assert len(az.logins()) == 1
+
+
+def test_a_failed_login_raises_without_the_secret(manager, monkeypatch):
+    monkeypatch.setattr(manager, '_communicate_az', FakeAz(login_returncode=1))
+
+    with pytest.raises(AzLoginError) as error:
+        asyncio.run(manager.env_for(IDENTITY))
+
+    assert 'client' in str(error.value) and 's3cret' not in str(error.value)
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('pexpect')
+
+from agents.tools.bash_session import BashSessionPool
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    pool = BashSessionPool()
+    monkeypatch.setattr(pool, 'reap_interval_seconds', 0.05)
+    monkeypatch.setattr(pool, 'idle_timeout_seconds', 0.1)
+    yield pool
+    pool.close_all()
+
+
+def test_reaper_closes_idle_sessions(pool, tmp_path):
+    async def run():
+        await pool.start()
+        try:
+            async with pool.session('busy', cwd=str(tmp_path)) as busy:
+                async with pool.session('idle', cwd=str(tmp_path)) as idle:
+                    await idle.run('true')
+                await asyncio.sleep(0.4)
+                # a borrowed session is never reaped, however long its command runs
+                return set(pool._sessions), idle.is_alive, busy.is_alive
+        finally:
+            await pool.stop()
+
+    sessions, idle_alive, busy_alive = asyncio.run(run())
+
+    assert sessions == {'busy'}
+    assert not idle_alive
+    assert busy_alive
+
+
+def test_stop_closes_all_sessions(pool, tmp_path):
+    async def run():
+        await pool.start()
+        async with pool.session('thread-1', cwd=str(tmp_path)) as bash_session:
+            await bash_session.run('true')
+        await pool.stop()
+        return bash_session
+
+    bash_session = asyncio.run(run())
+
+    assert pool._sessions == {}
+    assert not bash_session.is_alive
+    assert pool._reaper is None
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from agents.blob_store import BlobStore
+from agents.events import to_jsonable
+from agents.state import AzShellToolExecutionResult, Scratchpad, Task, TaskPlan
+
+
+@pytest.fixture
+def blob_store(monkeypatch, tmp_path):
+    store = BlobStore()
+    monkeypatch.setattr(store, 'root', tmp_path)
+    monkeypatch.setattr(store, 'threshold_bytes', 1024)
+    return store
+
+
+def task_with_output(stdout):
+    result = AzShellToolExecutionResult(is_successful=True, stdout=stdout, exit_code=0,
+                                        stdout_bytes=len(stdout))
+    return Task(task_id='1', task_type='az_cli', status='succeeded',
+                az_cli_execution_result=[result])
+
+
+def test_results_below_the_threshold_stay_inline(blob_store):
+    task = task_with_output('small')
+    task.offload_results()
+
+    assert task.result_refs == {}
+    assert task.az_cli_execution_result[0].stdout == 'small'
+
+
+def test_large_results_round_trip_through_the_blob_store(blob_store):
+    task = task_with_output('x' * 4096)
+    task.offload_results()
+
+    ref = task.result_refs['az_cli_execution_result']
+    assert task.az_cli_execution_result is None
+    assert blob_store.exists(ref.digest) and ref.size_bytes > 4096
+    assert 'exit codes: 0' in ref.summary
+
+    # a task restored from a checkpoint has no loaded results, they are read from the blob
+    restored = Task.model_validate(task.model_dump())
+    assert restored.execution_result('az_cli_execution_result')[0].stdout == 'x' * 4096
+
+
+def test_served_results_are_read_back(blob_store):
+    task = task_with_output('x' * 4096)
+    task.offload_results()
+    scratchpad = Scratchpad(task_plan=TaskPlan(tasks=[Task.model_validate(task.model_dump())]))
+
+    served = json.loads(json.dumps({'result': scratchpad}, default=to_jsonable))
+
+    served_task = served['result']['task_plan']['tasks'][0]
+    assert served_task['az_cli_execution_result'][0]['stdout'] == 'x' * 4096
+    assert served_task['result_refs']['az_cli_execution_result']['digest']
+    # the checkpointed scratchpad keeps only the reference
+    assert scratchpad.task_plan.tasks[0].az_cli_execution_result is None
+
+
+def test_a_pruned_blob_leaves_the_summary(blob_store):
+    task = task_with_output('x' * 4096)
+    task.offload_results()
+    restored = Task.model_validate(task.model_dump())
+    blob_store.prune(older_than_seconds=-1)
+
+    assert restored.execution_result('az_cli_execution_result') is None
+    served = to_jsonable(restored)
+    assert served['az_cli_execution_result'] is None
+    assert 'exit codes: 0' in served['result_refs']['az_cli_execution_result']['summary']
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from agents.cassette import Cassette, CassetteMissError
+from agents.tools import process as process_module
+from agents.tools.process import AsyncProcess
+from config import Config
+
+
+@pytest.fixture
+def cassette(monkeypatch, tmp_path):
+    """the Cassette singleton recording to an empty file, set `mode` to replay it."""
+    cassette = Cassette()
+    monkeypatch.setattr(cassette, 'mode', 'record')
+    monkeypatch.setattr(cassette, 'path', str(tmp_path / 'cassette.jsonl'))
+    monkeypatch.setattr(cassette, 'time_scale', 0.0)
+    monkeypatch.setattr(cassette, '_interactions', None)
+    return cassette
+
+
+class Chunks(httpx.SyncByteStream, httpx.AsyncByteStream):
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        yield from self.chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def sse(request):
+    prompt = json.loads(request.content)['prompt']
+    return httpx.Response(200, headers={'content-type': 'text/event-stream'},
+                          stream=Chunks([f'data: {prompt} {n}\n\n'.encode() for n in range(3)]))
+
+
+def offline(request):
+    raise AssertionError(f"replay reached the network: {request.url}")
+
+
+def test_http_responses_replay_chunk_by_chunk(cassette):
+    url = 'https://test.invalid/chat?api-version=1'
+    with httpx.Client(transport=cassette.http_transport(httpx.MockTransport(sse))) as client:
+        with client.stream('POST', url, json={'prompt': 'hi', 'temperature': 0},
+                           headers={'api-key': 'secret-key'}) as response:
+            recorded = list(response.iter_bytes())
+
+    cassette.mode = 'replay'
+    with httpx.Client(transport=cassette.http_transport(httpx.MockTransport(offline))) as client:
+        # the same JSON body with its keys in another order
+        with client.stream('POST', url, content=b'{"temperature": 0, "prompt": "hi"}') as response:
+            replayed = list(response.iter_bytes())
+            content_type = response.headers['content-type']
+
+    assert replayed == recorded == [b'data: hi 0\n\n', b'data: hi 1\n\n', b'data: hi 2\n\n']
+    assert content_type == 'text/event-stream'
+    # request headers hold credentials
+    assert 'secret-key' not in open(cassette.path).read()
+
+
+def test_async_http_responses_replay_and_unknown_requests_miss(cassette):
+    async def post(transport, prompt):
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post('https://test.invalid/chat', json={'prompt': prompt})
+            return response.text
+
+    recorded = asyncio.run(post(cassette.http_async_transport(httpx.MockTransport(sse)), 'hi'))
+    cassette.mode = 'replay'
+    replay = cassette.http_async_transport(httpx.MockTransport(offline))
+
+    assert asyncio.run(post(replay, 'hi')) == recorded
+    with pytest.raises(CassetteMissError, match='no recorded http interaction'):
+        asyncio.run(post(replay, 'bye'))
+
+
+def test_identical_requests_replay_in_order_and_the_last_repeats(cassette):
+    answers = iter(['first', 'second'])
+
+    async def call():
+        request = 'az_cli\n{"prompt": "list vms"}'
+        return await cassette.acall('mcp', request, lambda: _value(next(answers)))
+
+    recorded = [asyncio.run(call()) for _ in range(2)]
+    cassette.mode = 'replay'
+
+    assert recorded == ['first', 'second']
+    assert [asyncio.run(call()) for _ in range(3)] == ['first', 'second', 'second']
+
+
+async def _value(value):
+    return value
+
+
+def test_mcp_tool_calls_replay_without_a_session(cassette):
+    class Tool:
+        async def ainvoke(self, input, **kwargs):
+            return {'commands': [f"az {input['prompt']}"]}
+
+    class Session:
+        tools = {'azure_cli_generate': Tool()}
+
+    async def generate(mcp_session):
+        return await mcp_session.tools['azure_cli_generate'].ainvoke({'prompt': 'vm list'})
+
+    recorded = asyncio.run(generate(cassette.mcp_session(Session())))
+    cassette.mode = 'replay'
+
+    assert asyncio.run(generate(cassette.mcp_session())) == recorded == {'commands': ['az vm list']}
+
+
+def test_process_output_replays_without_spawning(cassette, monkeypatch):
+    command = f"echo {Config().agent_cwd}/alice/out.txt; printf 'ab'; echo cd >&2; exit 2"
+
+    async def run(command):
+        process = AsyncProcess(command)
+        lines = [(line.stream, line.line, line.continuation) async for line in process.stream()]
+        return lines, process.result
+
+    recorded_lines, recorded_result = asyncio.run(run(command))
+    cassette.mode = 'replay'
+
+    async def spawn(*args, **kwargs):
+        raise AssertionError('replay spawned a process')
+    monkeypatch.setattr(process_module.asyncio, 'create_subprocess_exec', spawn)
+    # paths under the agent working directory match another user's thread
+    lines, result = asyncio.run(run(command.replace('/alice/', '/bob/')))
+
+    assert lines == recorded_lines
+    assert result == recorded_result
+    assert result.exit_code == 2
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+
+from agents.checkpointer import SqliteCheckpointSaver
+from agents.state import ExecutionState, Scratchpad, Task, TaskPlan
+
+
+def saver(tmp_path, **kwargs):
+    return SqliteCheckpointSaver(os.path.join(tmp_path, 'checkpoints.sqlite'), **kwargs)
+
+
+def put_checkpoint(checkpointer, thread_id, parent=None, scratchpad=None):
+    checkpoint = empty_checkpoint()
+    checkpoint['channel_values'] = {'scratchpad': scratchpad or Scratchpad(original_prompt='list vms')}
+    checkpoint['channel_versions'] = {'scratchpad': checkpointer.get_next_version(None, None)}
+    config = {'configurable': {'thread_id': thread_id, 'checkpoint_ns': '', **({'checkpoint_id': parent} if parent else {})}}
+    return checkpointer.put(config, checkpoint, {'source': 'loop', 'step': 0}, checkpoint['channel_versions'])
+
+
+def test_put_and_get_tuple_revive_state_models(tmp_path, caplog):
+    checkpointer = saver(tmp_path)
+    scratchpad = Scratchpad(original_prompt='list vms', task_plan=TaskPlan(tasks=[Task(task_id='1', task_type='bash', status='failed', error='boom')]))
+
+    with caplog.at_level(logging.WARNING):
+        config = put_checkpoint(checkpointer, 'thread-1', scratchpad=scratchpad)
+        checkpoint_tuple = checkpointer.get_tuple({'configurable': {'thread_id': 'thread-1'}})
+
+    assert checkpoint_tuple.config == config
+    assert checkpoint_tuple.checkpoint['channel_values']['scratchpad'] == scratchpad
+    assert checkpoint_tuple.metadata['step'] == 0
+    assert not [r for r in caplog.records if 'unregistered' in r.getMessage() or 'Blocked' in r.getMessage()]
+
+
+def test_list_is_newest_first_and_bounded_per_thread(tmp_path):
+    checkpointer = saver(tmp_path, max_checkpoints_per_thread=2)
+    parent = None
+    for _ in range(4):
+        parent = put_checkpoint(checkpointer, 'thread-1', parent)['configurable']['checkpoint_id']
+    put_checkpoint(checkpointer, 'thread-2')
+
+    listed = list(checkpointer.list({'configurable': {'thread_id': 'thread-1'}}))
+    assert [t.config['configurable']['checkpoint_id'] for t in listed] == [parent, listed[0].parent_config['configurable']['checkpoint_id']]
+    assert len(list(checkpointer.list(None))) == 3
+    assert len(list(checkpointer.list(None, limit=1))) == 1
+
+
+def test_put_writes_are_pending_writes_of_the_checkpoint(tmp_path):
+    checkpointer = saver(tmp_path)
+    config = put_checkpoint(checkpointer, 'thread-1')
+
+    checkpointer.put_writes(config, [('messages', [AIMessage(content='done')]), ('scratchpad', Scratchpad(answer='42'))], task_id='task-1')
+    # regular writes are idempotent
+    checkpointer.put_writes(config, [('messages', [AIMessage(content='again')])], task_id='task-1')
+
+    pending_writes = checkpointer.get_tuple(config).pending_writes
+    assert [(task_id, channel) for task_id, channel, _ in pending_writes] == [('task-1', 'messages'), ('task-1', 'scratchpad')]
+    assert pending_writes[0][2][0].content == 'done'
+    assert pending_writes[1][2] == Scratchpad(answer='42')
+
+
+def test_delete_thread(tmp_path):
+    checkpointer = saver(tmp_path)
+    put_checkpoint(checkpointer, 'thread-1')
+    put_checkpoint(checkpointer, 'thread-2')
+
+    checkpointer.delete_thread('thread-1')
+
+    assert checkpointer.get_tuple({'configurable': {'thread_id': 'thread-1'}}) is None
+    assert checkpointer.get_tuple({'configurable': {'thread_id': 'thread-2'}}) is not None
+    assert checkpointer.stats()['threads'] == 1
+
+
+def build_graph(checkpointer):
+    async def ask(state: ExecutionState):
+        answer = interrupt({'question': 'which subscription?'})
+        state.scratchpad.answer = answer
+        return {'scratchpad': state.scratchpad, 'messages': [AIMessage(content=f'using {answer}')]}
+
+    graph = StateGraph(ExecutionState)
+    graph.add_node('ask', ask)
+    graph.add_edge(START, 'ask')
+    graph.add_edge('ask', END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def test_a_run_resumes_after_a_restart(tmp_path):
+    config = {'configurable': {'thread_id': 'thread-1'}}
+
+    async def run():
+        first = build_graph(saver(tmp_path))
+        await first.ainvoke(ExecutionState(scratchpad=Scratchpad(original_prompt='list vms')), config)
+        assert (await first.aget_state(config)).next == ('ask',)
+
+        # a new process: nothing shared with the first graph but the database file
+        restarted = build_graph(saver(tmp_path))
+        return await restarted.ainvoke(Command(resume='sub-1'), config)
+
+    result = asyncio.run(run())
+
+    assert result['scratchpad'].answer == 'sub-1'
+    assert result['scratchpad'].original_prompt == 'list vms'
+    assert result['messages'][-1].content == 'using sub-1'
@@ -0,0 +1,107 @@
+import itertools
+import os
+import sqlite3
+
+import pytest
+
+from agents import cache as cache_module
+from agents.cache import LRUTTLCache
+from agents.tools.command_cache import CommandCache
+
+
+def command_cache(tmp_path, namespace='azure_cli_generate'):
+    store = LRUTTLCache(max_entries=16, db_path=os.path.join(tmp_path, 'commands.db'))
+    return CommandCache(namespace, store)
+
+
+def test_numeric_suffixes_share_an_entry(tmp_path):
+    cache = command_cache(tmp_path)
+    cache.set('create VNet <vnet_name_1> in resource group <resource_group_1>',
+              ['az network vnet create --name <vnet_name_1> --resource-group <resource_group_1>'])
+
+    assert cache.get('create  VNet <vnet_name_2> in resource group <resource_group_2>') == [
+        'az network vnet create --name <vnet_name_2> --resource-group <resource_group_2>']
+    assert cache.stats() == {'hits': 1, 'misses': 0, 'round_trips_saved': 1}
+
+
+def test_placeholder_names_are_part_of_the_key(tmp_path):
+    cache = command_cache(tmp_path)
+    cache.set('create storage account in <location>',
+              ['az storage account create --location <location>'])
+
+    assert cache.get('create storage account in <resource_group>') is None
+    vnet, _ = CommandCache.normalize('create VNet <vnet_name_1>')
+    subnet, _ = CommandCache.normalize('create VNet <subnet_name_1>')
+    assert vnet != subnet
+
+
+def test_literal_values_are_part_of_the_key(tmp_path):
+    cache = command_cache(tmp_path)
+    # the values collide with the subcommand and a flag value of the cached command
+    commands = ['az vm create --name vm --resource-group rg']
+    cache.set('create a VM named "vm" in group "rg"', commands)
+
+    assert cache.get('create a VM named "web01" in group "prod"') is None
+    assert cache.get('create a VM named  "vm" in group "rg"') == commands
+
+
+def test_case_changed_values_are_not_served_from_another_value(tmp_path):
+    cache = command_cache(tmp_path)
+    cache.set('create storage account <account_name> with sku "premium"',
+              ['az storage account create --name <account_name> --sku Premium_LRS'])
+
+    assert cache.get('create storage account <account_name> with sku "standard"') is None
+    assert cache.get('create storage account <account_name> with sku "Premium"') is None
+
+
+def test_entries_with_unfillable_slots_are_misses(tmp_path):
+    cache = command_cache(tmp_path)
+    cache.store.set(cache.key('list vms'), ['az vm list -g <__slot_0__>'])
+
+    assert cache.get('list vms') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_namespaces_do_not_share_entries(tmp_path):
+    store = LRUTTLCache(db_path=os.path.join(tmp_path, 'commands.db'))
+    CommandCache('azure_cli_generate', store).set('list vms', ['az vm list'])
+
+    assert CommandCache('bash_generate', store).get('list vms') is None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    ticks = itertools.count(1000.0)
+    monkeypatch.setattr(cache_module.time, 'time', lambda: next(ticks))
+
+
+def test_hits_are_written_to_sqlite_in_batches(tmp_path, clock):
+    db_path = os.path.join(tmp_path, 'cache.db')
+    cache = LRUTTLCache(db_path=db_path, access_flush_size=3)
+    cache.set('key', 'value')
+
+    def last_access():
+        with sqlite3.connect(db_path) as db:
+            row = db.execute("SELECT last_access FROM cache_entries WHERE key = 'key'").fetchone()
+            return row[0]
+
+    written = last_access()
+    cache.get('key')
+    cache.get('key')
+    assert last_access() == written
+
+    cache.get('key')
+    assert last_access() > written
+
+
+def test_flush_writes_pending_hits(tmp_path, clock):
+    db_path = os.path.join(tmp_path, 'cache.db')
+    cache = LRUTTLCache(db_path=db_path)
+    cache.set('key', 'value')
+    cache.get('key')
+    cache.flush()
+
+    reopened = LRUTTLCache(db_path=db_path)
+    assert reopened.get('key') == 'value'
+    row = reopened._db.execute("SELECT last_access > created_at FROM cache_entries").fetchone()
+    assert row[0] == 1
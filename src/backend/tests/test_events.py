@@ -0,0 +1,76 @@
+import asyncio
+import json
+from typing import TypedDict
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+
+from agents.events import aemit_tool_output, stream_workflow_events
+
+
+class State(TypedDict, total=False):
+    prompt: str
+    scratchpad: str
+
+
+def graph(ask_user: bool = False):
+    model = GenericFakeChatModel(messages=iter([AIMessage(content='Azure is a cloud')]))
+
+    async def answer(state: State) -> State:
+        response = await model.ainvoke(state['prompt'])
+        return {'scratchpad': response.content}
+
+    async def run_command(state: State) -> State:
+        await aemit_tool_output('azure_bash_shell', {'command': 'az group list', 'line': 'rg-dev'})
+        if ask_user:
+            return {'scratchpad': f"{state['scratchpad']}, {interrupt({'question': 'which rg?'})}"}
+        return {}
+
+    builder = StateGraph(State)
+    builder.add_node('answer', answer)
+    builder.add_node('run_command', run_command)
+    builder.add_edge(START, 'answer')
+    builder.add_edge('answer', 'run_command')
+    builder.add_edge('run_command', END)
+    return builder.compile(checkpointer=InMemorySaver())
+
+
+def events(graph, input, thread_id='t1'):
+    async def collect():
+        config = {'configurable': {'thread_id': thread_id}}
+        return [frame async for frame in stream_workflow_events(graph, input, config)]
+
+    parsed = []
+    for frame in asyncio.run(collect()):
+        lines = frame.rstrip('\n').split('\n')
+        event = lines[0].removeprefix('event: ') if lines[0].startswith('event: ') else None
+        parsed.append((event, json.loads(lines[-1].removeprefix('data: '))))
+    return parsed
+
+
+def test_tokens_node_events_and_tool_output_are_streamed_in_order():
+    sent = events(graph(), {'prompt': 'what is azure?'})
+    kinds = [event for event, _ in sent]
+
+    tokens = [data['text'] for event, data in sent if event == 'token']
+    assert ''.join(tokens) == 'Azure is a cloud' and len(tokens) > 1
+    assert all(data['node'] == 'answer' for event, data in sent if event == 'token')
+    assert kinds.index('node_start') < kinds.index('token') < kinds.index('node_end')
+    assert ('tool_output', {'node': 'run_command', 'tool': 'azure_bash_shell',
+                            'command': 'az group list', 'line': 'rg-dev'}) in sent
+    assert sent[-1] == (None, {'thread_id': 't1', 'result': 'Azure is a cloud'})
+
+
+def test_an_interrupt_is_sent_last_and_the_resumed_run_finishes():
+    workflow = graph(ask_user=True)
+    paused = events(workflow, {'prompt': 'what is azure?'})
+    resumed = events(workflow, Command(resume='rg-dev'))
+
+    question = {'question': 'which rg?'}
+    assert paused[-1] == ('interrupt', {'thread_id': 't1', 'interrupt_data': question,
+                                        'interrupts': [question]})
+    assert all(event != 'interrupt' for event, _ in resumed)
+    assert resumed[-1] == (None, {'thread_id': 't1', 'result': 'Azure is a cloud, rg-dev'})
@@ -0,0 +1,26 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents.history import DIGEST_MESSAGE_ID, DIGEST_PREFIX, HistoryPolicy
+
+
+def test_short_histories_are_kept_as_they_are():
+    messages = [HumanMessage(content='list vms', id='1'), AIMessage(content='done', id='2')]
+
+    assert HistoryPolicy(max_tokens=1000, keep_recent_tokens=500).compact(messages) is messages
+
+
+def test_older_messages_are_folded_into_one_digest():
+    policy = HistoryPolicy(max_tokens=200, keep_recent_tokens=60)
+    messages = [AIMessage(content=f'step {i} ' + 'x' * 400, id=str(i)) for i in range(6)]
+
+    compacted = policy.compact(messages)
+
+    assert compacted[0].id == DIGEST_MESSAGE_ID
+    assert compacted[0].content.startswith(DIGEST_PREFIX + '- ai: step 0')
+    assert compacted[-1].id == '5'
+    assert len(compacted) < len(messages)
+
+    # compacting again extends the digest instead of nesting it
+    recompacted = policy.compact(compacted + [AIMessage(content='step 6 ' + 'x' * 400, id='6')])
+    assert [m.id for m in recompacted].count(DIGEST_MESSAGE_ID) == 1
+    assert 'step 0' in recompacted[0].content
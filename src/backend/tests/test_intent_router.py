@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+import pytest
+import yaml
+
+from agents.intent_router import IntentRouter
+from config import Config
+
+EVALUATION_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'evaluation')
+
+
+def intent(prompt: str):
+    classification = IntentRouter().classify_heuristically(prompt)
+    return classification.intent if classification else None
+
+
+@pytest.mark.parametrize('prompt', [
+    "Stop the virtual network",
+    "please restart my subnets",
+    "Shut down all the key vaults.",
+    # "it" is the VNet located first, its type is given even though it is named
+    'locate VNet "vnet-test" in resource group "rg-test" and stop it.',
+    "find the subnets of vnet-hub and restart them",
+])
+def test_power_operation_on_stateless_resource_is_unsupported(prompt):
+    assert intent(prompt) == 'unsupported'
+
+
+@pytest.mark.parametrize('prompt', [
+    # the resource group is where the operation happens, not what it operates on
+    "Shut down everything in resource group rg-dev tonight to save costs",
+    "Restart the web server in resource group rg-prod",
+    "Stop all resources in resource group rg-dev",
+    "start the ADF trigger in resource group rg-etl",
+    "stop the vm in the vnet",
+    # named resources are left to the classifier or planner
+    "stop the vnet vnet-hub-01",
+    "Stop the resource group",
+])
+def test_operations_naming_a_scope_or_resource_are_not_rejected(prompt):
+    assert intent(prompt) != 'unsupported'
+
+
+@pytest.mark.parametrize('prompt', [
+    "Describe the VM vm-web-01",
+    "Who has access to the key vault kv-prod?",
+    "What VMs are running in rg-prod?",
+    "What is the SKU of 'sql-orders'?",
+    "How do I resize my VM?",
+])
+def test_questions_about_the_environment_are_not_answered_without_tools(prompt):
+    assert intent(prompt) != 'question'
+
+
+@pytest.mark.parametrize('prompt', [
+    "What is Azure Front Door?",
+    "Explain the difference between availability zones and availability sets",
+    "How do I enable soft delete on a key vault?",
+])
+def test_general_questions(prompt):
+    assert intent(prompt) == 'question'
+
+
+@pytest.mark.parametrize('prompt', [
+    "Create a VM with 4 CPUs in East US",
+    "Could you list the storage accounts?",
+])
+def test_actions(prompt):
+    assert intent(prompt) == 'action'
+
+
+@pytest.mark.parametrize('prompt', [
+    "Stop all resources in resource group rg-dev",
+    "Could you restart the firewall in vnet-hub?",
+    "locate the VM in vnet vnet-test and stop it",
+])
+def test_power_operations_near_named_stateless_resources_go_to_the_classifier(prompt):
+    assert intent(prompt) is None
+
+
+def test_no_such_feature_evaluation_prompts_are_rejected_without_a_classifier(monkeypatch):
+    with open(os.path.join(EVALUATION_DIR, 'no_such_feature_prompt.yaml')) as f:
+        test_cases = yaml.safe_load(f)['test_cases']
+    monkeypatch.setattr(Config(), 'intent_classifier_deployment', '')
+
+    for test_case in test_cases:
+        classification = asyncio.run(IntentRouter().aclassify(test_case['prompt']))
+        assert classification.intent == 'unsupported', test_case['name']
+
+
+def test_undecided_prompts_are_planned_without_a_classifier(monkeypatch):
+    monkeypatch.setattr(Config(), 'intent_classifier_deployment', '')
+    prompt = "Could you restart the firewall in vnet-hub?"
+
+    assert intent(prompt) is None
+    assert asyncio.run(IntentRouter().aclassify(prompt)).intent == 'action'
@@ -0,0 +1,84 @@
+import asyncio
+import hashlib
+import uuid
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from agents import llm_gateway
+from agents.llm_gateway import DeploymentPool
+
+
+class FakeAsyncTransport(httpx.AsyncBaseTransport):
+    """answers every request with 200, remembering the loops it was used on."""
+
+    created = []
+
+    def __init__(self, **kwargs):
+        self.loops = set()
+        FakeAsyncTransport.created.append(self)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.loops.add(asyncio.get_running_loop())
+        return httpx.Response(200, stream=httpx.ByteStream(b'{"ok": true}'))
+
+
+def test_async_connections_are_pooled_per_event_loop(monkeypatch):
+    monkeypatch.setattr(llm_gateway.httpx, 'AsyncHTTPTransport', FakeAsyncTransport)
+    monkeypatch.setattr(FakeAsyncTransport, 'created', [])
+    pool = DeploymentPool('test', httpx.Limits(), httpx.Timeout(5.0))
+
+    async def send(count):
+        for _ in range(count):
+            response = await pool.http_async_client.get('https://test.invalid/chat')
+            assert response.json() == {'ok': True}
+        return asyncio.get_running_loop()
+
+    first_loop = asyncio.run(send(2))
+    second_loop = asyncio.run(send(1))
+
+    # the same client, but a new pool for the second loop instead of connections of a closed loop
+    first, second = FakeAsyncTransport.created
+    assert (first.loops, second.loops) == ({first_loop}, {second_loop})
+    assert pool.stats() == {'connections': 0, 'in_flight': 0, 'requests': 3}
+
+
+def test_prompt_prefix_versions_follow_the_prompt_text():
+    from agents.prompt import STATIC_PROMPT_PREFIXES, PROMPT_PREFIX_VERSIONS
+
+    for name, prefix in STATIC_PROMPT_PREFIXES.items():
+        digest = hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+        assert PROMPT_PREFIX_VERSIONS[name] == digest[:8]
+    assert len(set(PROMPT_PREFIX_VERSIONS.values())) == len(STATIC_PROMPT_PREFIXES)
+
+
+def chat_call(usage, system_prompt, input_tokens, cached_tokens, output_tokens=5):
+    run_id = uuid.uuid4()
+    messages = [SystemMessage(content=system_prompt), HumanMessage(content='create a vm')]
+    usage.on_chat_model_start({}, [messages], run_id=run_id,
+                              invocation_params={'azure_deployment': 'gpt-test'})
+    message = AIMessage(content='', usage_metadata={
+        'input_tokens': input_tokens, 'output_tokens': output_tokens,
+        'total_tokens': input_tokens + output_tokens,
+        'input_token_details': {'cache_read': cached_tokens}})
+    usage.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+
+def test_prompt_cache_usage_is_attributed_to_the_versioned_prefix():
+    from agents.prompt import task_planner_system_prompt, PROMPT_PREFIX_VERSIONS
+
+    usage = llm_gateway.PromptCacheUsage()
+    # the task is appended to the static prefix, the call is still attributed to it
+    chat_call(usage, task_planner_system_prompt + '\nplan for user alice', 2000, 0)
+    chat_call(usage, task_planner_system_prompt + '\nplan for user bob', 2000, 1536)
+    chat_call(usage, 'an ad hoc system prompt', 100, 0)
+
+    stats = usage.stats()
+    planner = stats[f"task_planner@{PROMPT_PREFIX_VERSIONS['task_planner']}"]
+    assert set(stats) == {f"task_planner@{PROMPT_PREFIX_VERSIONS['task_planner']}", 'other'}
+    assert (planner['calls'], planner['cache_hit_calls']) == (2, 1)
+    assert planner['input_tokens'] == 4000
+    assert (planner['cached_input_tokens'], planner['uncached_input_tokens']) == (1536, 2464)
+    assert planner['cached_ratio'] == 0.384
+    assert (stats['other']['calls'], stats['other']['cached_ratio']) == (1, 0.0)
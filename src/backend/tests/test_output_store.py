@@ -0,0 +1,56 @@
+import os
+import time
+
+from agents.tools.output_store import OutputSpooler, SpilledOutputReader
+
+
+def spill(tmp_path, lines, threshold_bytes=16):
+    spooler = OutputSpooler(str(tmp_path / '.outputs'), threshold_bytes, preview_lines=2)
+    for line in lines:
+        spooler.write_line(line)
+    return spooler.finish()
+
+
+def test_small_outputs_stay_in_memory(tmp_path):
+    assert spill(tmp_path, ['one', 'two'], threshold_bytes=1024) == ('one\ntwo', None)
+    assert not (tmp_path / '.outputs').exists()
+
+
+def test_spilled_output_is_read_in_pages(tmp_path):
+    lines = [f'line {i}' for i in range(10)]
+    text, spilled = spill(tmp_path, lines)
+
+    assert text is None
+    assert (spilled.line_count, spilled.size_bytes) == (10, len('\n'.join(lines)) + 1)
+    assert (spilled.head, spilled.tail) == ('line 0\nline 1', 'line 8\nline 9')
+    with SpilledOutputReader(spilled) as reader:
+        assert reader.line_count == 10
+        assert reader.read_lines(0, 3) == ['line 0', 'line 1', 'line 2']
+        assert reader.read_lines(8, 5) == ['line 8', 'line 9']
+        assert reader.read_lines(10, 5) == []
+        assert reader.read_bytes(0, 6) == b'line 0'
+
+
+def test_only_newlines_end_lines(tmp_path):
+    # str.splitlines() also breaks on these, which would shift the pages against the line index
+    lines = ['a\rb', 'c\x0bd', 'e\x1cf', 'g h', 'last']
+    _, spilled = spill(tmp_path, lines)
+
+    with SpilledOutputReader(spilled) as reader:
+        assert reader.line_count == 5
+        assert reader.read_lines(0, 2) == ['a\rb', 'c\x0bd']
+        assert reader.read_lines(2, 3) == ['e\x1cf', 'g h', 'last']
+
+
+def test_spill_files_past_the_ttl_are_pruned(tmp_path):
+    thread_dir = tmp_path / 'user' / 'thread'
+    _, old = spill(thread_dir, ['x' * 20])
+    _, new = spill(thread_dir, ['y' * 20])
+    _, top_level = spill(tmp_path, ['z' * 20])
+    an_hour_ago = time.time() - 3600
+    os.utime(old.path, (an_hour_ago, an_hour_ago))
+    os.utime(top_level.path, (an_hour_ago, an_hour_ago))
+
+    assert OutputSpooler.prune(str(tmp_path), older_than_seconds=60) == 2
+    assert not os.path.exists(old.path) and not os.path.exists(top_level.path)
+    assert os.path.exists(new.path)
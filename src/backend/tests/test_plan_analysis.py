@@ -0,0 +1,54 @@
+import pytest
+from pydantic import ValidationError
+
+from agents.plan_analysis import annotate_plan
+from agents.state import Task, TaskPlan, TaskPlannerOutput
+
+
+class FixedHistory:
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def estimate(self, task_type):
+        return self.seconds[task_type]
+
+
+def plan(*tasks):
+    return TaskPlan(tasks=[Task(task_id=task_id, task_type=task_type, depends_on=depends_on)
+                           for task_id, task_type, depends_on in tasks])
+
+
+def planner_output(*tasks):
+    return {'tasks': [{'task_id': task_id, 'description': '', 'task_type': 'az_cli', 'prompt': '',
+                       'depends_on': depends_on} for task_id, depends_on in tasks]}
+
+
+def test_critical_path_is_the_longest_dependency_chain():
+    history = FixedHistory({'az_cli': 60.0, 'bash': 10.0, 'python': 90.0})
+    # 1 -> 2 -> 4 takes 60 + 10 + 60, 1 -> 3 -> 4 takes 60 + 90 + 60
+    diamond = plan(('1', 'az_cli', []), ('2', 'bash', ['1']), ('3', 'python', ['1']),
+                   ('4', 'az_cli', ['2', '3']))
+    task_plan = annotate_plan(diamond, history)
+
+    assert task_plan.critical_path == ['1', '3', '4']
+    assert task_plan.estimated_critical_path_seconds == 210.0
+    assert task_plan.estimated_total_seconds == 220.0
+
+
+def test_tasks_without_dependencies_run_in_list_order():
+    history = FixedHistory({'az_cli': 60.0, 'bash': 10.0})
+    task_plan = annotate_plan(plan(('1', 'az_cli', []), ('2', 'bash', [])), history)
+
+    assert task_plan.critical_path == ['1', '2']
+    assert task_plan.estimated_critical_path_seconds == 70.0
+
+
+@pytest.mark.parametrize('tasks, error', [
+    ([('1', []), ('1', [])], 'duplicate task_id'),
+    ([('1', []), ('2', ['3'])], 'unknown task_id'),
+    ([('1', ['2']), ('2', ['1'])], 'cycle'),
+])
+def test_invalid_dependencies_are_rejected(tasks, error):
+    with pytest.raises(ValidationError, match=error):
+        TaskPlannerOutput.model_validate(planner_output(*tasks))
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.tools.process import AsyncProcess
+
+
+def collect(command, **kwargs):
+    async def run():
+        process = AsyncProcess(command, **kwargs)
+        lines = [output async for output in process.stream()]
+        return process, lines
+    return asyncio.run(run())
+
+
+def test_lines_exit_code_and_byte_counts():
+    process, lines = collect("echo one; echo two >&2; printf three; exit 3")
+
+    assert [line.line for line in lines if line.stream == 'stdout'] == ['one', 'three']
+    assert [line.line for line in lines if line.stream == 'stderr'] == ['two']
+    assert process.result.exit_code == 3
+    assert process.result.stdout_bytes == len('one\nthree')
+    assert process.result.stderr_bytes == len('two\n')
+
+
+def test_lines_longer_than_the_limit_lose_no_bytes(monkeypatch):
+    monkeypatch.setattr(AsyncProcess, 'line_limit', 100)
+    monkeypatch.setattr(AsyncProcess, 'read_chunk_size', 7)
+    process, lines = collect("head -c 300 /dev/zero | tr '\\0' x; echo; echo short")
+
+    assert [len(line.line) for line in lines] == [100, 100, 100, 0, 5]
+    assert ''.join(line.line for line in lines[:4]) == 'x' * 300
+    assert process.result.stdout_bytes == 300 + len("\nshort\n")
+
+
+def test_a_line_over_one_mebibyte_is_read_in_full():
+    process, lines = collect("head -c 2000000 /dev/zero | tr '\\0' x; echo")
+
+    assert sum(len(line.line) for line in lines) == 2000000
+    assert process.result.stdout_bytes == 2000001
+
+
+def test_timeout_kills_the_process_group():
+    started = time.monotonic()
+    process, _ = collect("sleep 30 & sleep 30", timeout=0.5)
+
+    assert process.result.timed_out
+    assert process.result.exit_code is not None
+    assert time.monotonic() - started < 10
+
+
+def test_pieces_of_a_long_line_are_marked_as_continuation(monkeypatch):
+    monkeypatch.setattr(AsyncProcess, 'line_limit', 100)
+    _, lines = collect("head -c 250 /dev/zero | tr '\\0' x; echo; echo short")
+
+    assert [(len(line.line), line.continuation) for line in lines] == [
+        (100, False), (100, True), (50, True), (5, False)]
+
+
+def test_a_character_split_at_the_line_limit_stays_whole(monkeypatch):
+    monkeypatch.setattr(AsyncProcess, 'line_limit', 100)
+    # 99 ascii bytes then 'é' (2 bytes), the piece boundary falls inside the character
+    _, lines = collect("printf 'a%.0s' $(seq 99); printf '\\303\\251tail\\n'")
+
+    assert ''.join(line.line for line in lines) == 'a' * 99 + 'étail'
+    assert '�' not in ''.join(line.line for line in lines)
+
+
+def test_az_shell_joins_continuation_pieces_without_newlines(monkeypatch, tmp_path):
+    pytest.importorskip('langchain_core')
+    from agents.tools.az_shell import AzShell
+
+    async def spawn(self, command, timeout):
+        return AsyncProcess(command, timeout=timeout, cwd=self.working_dir)
+
+    monkeypatch.setattr(AsyncProcess, 'line_limit', 100)
+    monkeypatch.setattr(AzShell, '_spawn', spawn)
+    command = ("head -c 250 /dev/zero | tr '\\0' x; echo; echo short; "
+               "head -c 150 /dev/zero | tr '\\0' y >&2")
+    result = asyncio.run(AzShell(working_dir=str(tmp_path))._arun(command))
+
+    assert result.stdout == 'x' * 250 + '\nshort'
+    assert result.stderr == 'y' * 150
+
+
+def test_spooler_appends_continuation_pieces_in_memory_and_on_disk(tmp_path):
+    from agents.tools.output_store import OutputSpooler, SpilledOutputReader
+
+    small = OutputSpooler(str(tmp_path), threshold_bytes=1024)
+    for line, continuation in [('ab', False), ('cd', True), ('ef', False)]:
+        small.write_line(line, continuation=continuation)
+    assert small.finish() == ('abcd\nef', None)
+
+    large = OutputSpooler(str(tmp_path), threshold_bytes=10, preview_lines=2)
+    for line, continuation in [('0123456789', False), ('abc', True), ('x', False), ('yz', True)]:
+        large.write_line(line, continuation=continuation)
+    _, spilled = large.finish()
+
+    assert (spilled.line_count, spilled.size_bytes) == (2, len('0123456789abc\nxyz\n'))
+    assert (spilled.head, spilled.tail) == ('0123456789abc\nxyz', '0123456789abc\nxyz')
+    with SpilledOutputReader(spilled) as reader:
+        assert reader.read_lines(0, 10) == ['0123456789abc', 'xyz']
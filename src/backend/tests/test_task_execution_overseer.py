@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+# the overseer imports the python and deep research tools
+pytest.importorskip('smolagents')
+pytest.importorskip('agent_framework')
+
+from agents.state import Task, TaskPlan
+from agents.task_execution_overseer import TaskExecutionOverseer
+
+
+class FakeOverseer(TaskExecutionOverseer):
+    """python tasks sleep for the seconds in their prompt, a prompt of 'fail' fails."""
+
+    def __init__(self):
+        self.started = {}
+        self.finished = {}
+
+    async def _run_python_task(self, task: Task, agent_cwd: str) -> bool:
+        self.started[task.task_id] = time.monotonic()
+        if task.prompt == 'fail':
+            return False
+        await asyncio.sleep(float(task.prompt))
+        self.finished[task.task_id] = time.monotonic()
+        return True
+
+
+def python_task(task_id: str, prompt: str = '0', depends_on=()) -> Task:
+    return Task(task_id=task_id, task_type='python', prompt=prompt, depends_on=list(depends_on))
+
+
+def execute(overseer: TaskExecutionOverseer, tasks) -> TaskPlan:
+    return asyncio.run(overseer.execute_plan(TaskPlan(tasks=tasks), 'thread', 'user'))
+
+
+def test_independent_tasks_run_concurrently_and_dependents_wait():
+    overseer = FakeOverseer()
+    plan = execute(overseer, [python_task('1', '0.2'), python_task('2', '0.2'), python_task('3', '0', depends_on=['1', '2'])])
+
+    assert [task.status for task in plan.tasks] == ['succeeded'] * 3
+    assert abs(overseer.started['1'] - overseer.started['2']) < 0.1
+    assert overseer.started['3'] >= max(overseer.finished['1'], overseer.finished['2'])
+
+
+def test_failure_skips_dependents_transitively():
+    overseer = FakeOverseer()
+    plan = execute(overseer, [python_task('1', 'fail'), python_task('2', depends_on=['1']),
+                              python_task('3', depends_on=['2']), python_task('4')])
+
+    assert [task.status for task in plan.tasks] == ['failed', 'skipped', 'skipped', 'succeeded']
+    assert plan.tasks[1].error == 'dependency did not succeed: 1'
+    assert '2' not in overseer.started and '3' not in overseer.started
+
+
+def test_task_without_commands_fails_and_skips_dependents():
+    overseer = FakeOverseer()
+    plan = execute(overseer, [Task(task_id='1', task_type='az_cli', prompt='create vm', az_cli_commands=[]),
+                              python_task('2', depends_on=['1'])])
+
+    assert [task.status for task in plan.tasks] == ['failed', 'skipped']
+    assert plan.tasks[0].error == 'no az cli commands were generated'
+
+
+def test_task_with_failed_generation_never_runs():
+    overseer = FakeOverseer()
+    plan = execute(overseer, [Task(task_id='1', task_type='bash', prompt='build', status='failed',
+                                   error='command generation failed: timeout'),
+                              python_task('2', depends_on=['1'])])
+
+    assert [task.status for task in plan.tasks] == ['failed', 'skipped']
+    assert plan.tasks[0].error == 'command generation failed: timeout'
+
+
+def test_unknown_dependency_and_cycle_are_skipped():
+    overseer = FakeOverseer()
+    plan = execute(overseer, [python_task('1', depends_on=['9']), python_task('2', depends_on=['3']),
+                              python_task('3', depends_on=['2'])])
+
+    assert [task.status for task in plan.tasks] == ['skipped'] * 3
+    assert plan.tasks[0].error == 'depends on unknown task(s): 9'
+    assert plan.tasks[1].error.startswith('dependency cycle')
+
+
+def test_cancelling_the_plan_cancels_running_tasks():
+    overseer = FakeOverseer()
+    plan = TaskPlan(tasks=[python_task('1', '5'), python_task('2', '5')])
+
+    async def run():
+        execution = asyncio.create_task(overseer.execute_plan(plan, 'thread', 'user'))
+        await asyncio.sleep(0.2)
+        execution.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await execution
+        # the runners were awaited before execute_plan returned, none is left pending
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    started = time.monotonic()
+    assert asyncio.run(run()) == []
+    assert time.monotonic() - started < 2
+    assert overseer.finished == {}
@@ -0,0 +1,290 @@
+import asyncio
+import json
+
+import pytest
+
+from agents.state import (AzCliToolCodeResult, BashToolCodeResult, ExecutionState, Scratchpad, Task,
+                          TaskPlan, TaskPlannerFusedOutput)
+from agents.task_planner_agent import CommandGenerator, TaskPlanner
+from agents.prompt import task_planner_system_prompt, task_planner_fused_system_prompt
+from config import Config
+
+
+class FakeTool:
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    async def arun(self, input):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def command_generator(az_cli_tool, bash_tool) -> CommandGenerator:
+    generator = CommandGenerator()
+    generator.az_cli_tool = az_cli_tool
+    generator.bash_tool = bash_tool
+    return generator
+
+
+def test_apply_sets_generated_commands():
+    generator = command_generator(FakeTool(AzCliToolCodeResult(is_successful=True, commands=['az group list'])),
+                                  FakeTool(BashToolCodeResult(is_successful=True, commands=['ls'])))
+    plan = TaskPlan(tasks=[Task(task_id='1', task_type='az_cli', prompt='list groups'),
+                           Task(task_id='2', task_type='bash', prompt='list files'),
+                           Task(task_id='3', task_type='python', prompt='plot')])
+
+    asyncio.run(generator.apply(plan))
+
+    assert plan.tasks[0].az_cli_commands == ['az group list']
+    assert plan.tasks[1].bash_commands == ['ls']
+    assert [task.status for task in plan.tasks] == ['pending', 'pending', 'pending']
+
+
+def test_apply_marks_task_failed_when_generation_raises():
+    generator = command_generator(FakeTool(error=RuntimeError('mcp server exited')),
+                                  FakeTool(BashToolCodeResult(is_successful=True, commands=['ls'])))
+    plan = TaskPlan(tasks=[Task(task_id='1', task_type='az_cli', prompt='list groups'),
+                           Task(task_id='2', task_type='bash', prompt='list files')])
+
+    asyncio.run(generator.apply(plan))
+
+    assert plan.tasks[0].status == 'failed'
+    assert 'mcp server exited' in plan.tasks[0].error
+    assert plan.tasks[1].status == 'pending'
+
+
+def test_apply_marks_task_failed_without_commands():
+    generator = command_generator(FakeTool(AzCliToolCodeResult(is_successful=True, commands=[])), FakeTool())
+    plan = TaskPlan(tasks=[Task(task_id='1', task_type='az_cli', prompt='list groups')])
+
+    asyncio.run(generator.apply(plan))
+
+    assert plan.tasks[0].status == 'failed'
+    assert plan.tasks[0].error == 'command generation failed: no commands generated'
+
+
+def test_apply_reuses_submitted_generation():
+    az_cli_tool = FakeTool(AzCliToolCodeResult(is_successful=True, commands=['az vm list']))
+    generator = command_generator(az_cli_tool, FakeTool())
+    plan = TaskPlan(tasks=[Task(task_id='1', task_type='az_cli', prompt='list vms')])
+
+    async def run():
+        generator.submit('az_cli', 'list vms')
+        await generator.apply(plan)
+
+    asyncio.run(run())
+
+    assert az_cli_tool.calls == 1
+    assert plan.tasks[0].az_cli_commands == ['az vm list']
+
+
+def test_state_models_are_loaded_once():
+    # a second copy of the module ('state' next to 'agents.state') holds different classes
+    import sys
+    import agents.tools.az_cli, agents.tools.bash, agents.tools.bash_session, agents.tools.az_shell
+    assert 'state' not in sys.modules
+
+
+def test_planner_prompt_examples_are_valid_tasks():
+    outputs = task_planner_system_prompt.split('Output:\n')[1:]
+    examples = [json.loads(output.split('\n\n')[0]) for output in outputs]
+
+    assert len(examples) == 2
+    for tasks in examples:
+        for task in tasks:
+            assert set(task) == {'task_id', 'description', 'task_type', 'prompt', 'depends_on'}
+            assert Task.model_validate(task).task_id == task['task_id']
+
+
+class FakePlannerModel:
+    """answers structured output calls with `outputs` in order, records the messages of each."""
+
+    def __init__(self, *outputs):
+        self.outputs = list(outputs)
+        self.calls = []
+
+    def with_structured_output(self, output_type):
+        from langchain_core.runnables import RunnableLambda
+
+        def answer(prompt_value):
+            self.calls.append((output_type, prompt_value.to_messages()))
+            return output_type.model_validate(self.outputs.pop(0))
+        return RunnableLambda(answer)
+
+
+def fused_output(optimized_prompt, *tasks):
+    return {'optimized_prompt': optimized_prompt,
+            'tasks': [{'task_id': task_id, 'description': prompt, 'task_type': task_type,
+                       'prompt': prompt, 'depends_on': depends_on}
+                      for task_id, task_type, prompt, depends_on in tasks]}
+
+
+@pytest.fixture
+def planner_model(monkeypatch):
+    from agents import task_planner_agent
+
+    model = FakePlannerModel()
+    monkeypatch.setattr(task_planner_agent.Util, 'gpt_4o', staticmethod(lambda: model))
+    monkeypatch.setattr(Config(), 'planner_streaming_enabled', False)
+
+    async def generate(self, task_type, prompt):
+        return AzCliToolCodeResult(is_successful=True, commands=[f'az {prompt}'])
+    monkeypatch.setattr(CommandGenerator, '_generate', generate)
+    return model
+
+
+def test_fused_planning_optimizes_and_plans_in_one_call(planner_model):
+    planner_model.outputs.append(fused_output('create vm <vm_name> in rg-dev',
+                                              ('1', 'az_cli', 'group create', []),
+                                              ('2', 'az_cli', 'vm create', ['1'])))
+    state = ExecutionState(scratchpad=Scratchpad(original_prompt='create a vm in rg-dev'))
+
+    update = asyncio.run(TaskPlanner().plan_tasks_fused(state))
+
+    (output_type, messages), = planner_model.calls
+    assert output_type is TaskPlannerFusedOutput
+    assert messages[0].content == task_planner_fused_system_prompt
+    assert messages[1].content == 'create a vm in rg-dev'
+
+    scratchpad = update['scratchpad']
+    assert scratchpad.optimized_prompt == 'create vm <vm_name> in rg-dev'
+    tasks = scratchpad.task_plan.tasks
+    assert [(task.task_id, task.depends_on, task.az_cli_commands) for task in tasks] == [
+        ('1', [], ['az group create']), ('2', ['1'], ['az vm create'])]
+    assert scratchpad.task_plan.critical_path == ['1', '2']
+    assert update['messages'][0].content == 'optimized_prompt: create vm <vm_name> in rg-dev'
+
+
+def test_rejected_fused_plan_is_sent_back_with_the_error(planner_model):
+    planner_model.outputs += [fused_output('p', ('1', 'az_cli', 'vm list', ['9'])),
+                              fused_output('p', ('1', 'az_cli', 'vm list', []))]
+    state = ExecutionState(scratchpad=Scratchpad(original_prompt='list vms'))
+
+    update = asyncio.run(TaskPlanner().plan_tasks_fused(state))
+
+    assert len(planner_model.calls) == 2
+    retry_messages = planner_model.calls[1][1]
+    assert retry_messages[-1].content.startswith('The task plan was rejected:')
+    assert 'unknown task_id' in retry_messages[-1].content
+    assert [task.task_id for task in update['scratchpad'].task_plan.tasks] == ['1']
+
+
+@pytest.mark.parametrize('request_mode, configured_mode, node', [
+    (None, 'two_step', 'optimize_prompt'),
+    (None, 'fused', 'plan_tasks_fused'),
+    ('fused', 'two_step', 'plan_tasks_fused'),
+    ('two_step', 'fused', 'optimize_prompt'),
+])
+def test_the_request_planning_mode_overrides_the_configured_one(monkeypatch, request_mode,
+                                                                 configured_mode, node):
+    monkeypatch.setattr(Config(), 'planning_mode', configured_mode)
+    state = ExecutionState(scratchpad=Scratchpad(planning_mode=request_mode))
+
+    assert TaskPlanner().route_planning_mode(state) == node
+
+
+class FakeStreamingPlannerModel:
+    """streams each of `plans` as forced tool call arguments, `chunk_size` characters at a time."""
+
+    def __init__(self, *plans, chunk_size=20):
+        self.plans = list(plans)
+        self.chunk_size = chunk_size
+        self.chunks_sent = 0
+        self.tool_choice = None
+
+    def bind_tools(self, tools, tool_choice):
+        self.tool_choice = tool_choice
+        return self
+
+    async def astream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+
+        arguments = self.plans.pop(0)
+        for start in range(0, len(arguments), self.chunk_size):
+            piece = arguments[start:start + self.chunk_size]
+            yield AIMessageChunk(content='', tool_call_chunks=[
+                {'name': None, 'args': piece, 'id': None, 'index': 0}])
+            self.chunks_sent += 1
+            await asyncio.sleep(0)
+
+
+@pytest.fixture
+def streaming_planner(monkeypatch):
+    """a model streaming the plans appended to it, and (prompt, chunks sent) per generation."""
+    from agents import task_planner_agent
+
+    model = FakeStreamingPlannerModel()
+    generations = []
+    monkeypatch.setattr(task_planner_agent.Util, 'gpt_4o', staticmethod(lambda: model))
+    monkeypatch.setattr(Config(), 'planner_streaming_enabled', True)
+
+    async def generate(self, task_type, prompt):
+        generations.append((prompt, model.chunks_sent))
+        return AzCliToolCodeResult(is_successful=True, commands=[f'az {prompt}'])
+    monkeypatch.setattr(CommandGenerator, '_generate', generate)
+    return model, generations
+
+
+def planner_arguments(*tasks):
+    return json.dumps({'tasks': [{'task_id': task_id, 'description': prompt, 'task_type': 'az_cli',
+                                  'prompt': prompt, 'depends_on': depends_on}
+                                 for task_id, prompt, depends_on in tasks]})
+
+
+def test_commands_are_generated_while_the_plan_streams(streaming_planner):
+    model, generations = streaming_planner
+    model.plans.append(planner_arguments(('1', 'group create', []), ('2', 'vnet create', ['1']),
+                                         ('3', 'vm create', ['2'])))
+    state = ExecutionState(scratchpad=Scratchpad(optimized_prompt='create a vm'))
+
+    update = asyncio.run(TaskPlanner().plan_tasks(state))
+
+    total_chunks = model.chunks_sent
+    assert model.tool_choice == 'TaskPlannerOutput'
+    assert [prompt for prompt, _ in generations] == ['group create', 'vnet create', 'vm create']
+    # the first two tasks started generating before the planner finished writing the plan
+    assert all(chunks_sent < total_chunks for _, chunks_sent in generations[:2])
+    assert [task.az_cli_commands for task in update['scratchpad'].task_plan.tasks] == [
+        ['az group create'], ['az vnet create'], ['az vm create']]
+
+
+def test_a_streamed_plan_that_is_not_json_is_planned_again(streaming_planner):
+    model, generations = streaming_planner
+    model.plans += [planner_arguments(('1', 'vm list', []))[:-5],
+                    planner_arguments(('1', 'vm list', []))]
+    state = ExecutionState(scratchpad=Scratchpad(optimized_prompt='list vms'))
+
+    update = asyncio.run(TaskPlanner().plan_tasks(state))
+
+    assert not model.plans
+    tasks = update['scratchpad'].task_plan.tasks
+    assert [task.az_cli_commands for task in tasks] == [['az vm list']]
+
+
+def test_generations_of_tasks_the_planner_dropped_are_cancelled():
+    started = []
+
+    class SlowGenerator(CommandGenerator):
+        async def _generate(self, task_type, prompt):
+            started.append(prompt)
+            if prompt == 'dropped':
+                await asyncio.sleep(60)
+            return AzCliToolCodeResult(is_successful=True, commands=[f'az {prompt}'])
+
+    async def run():
+        generator = SlowGenerator()
+        dropped = generator.submit('az_cli', 'dropped')
+        await asyncio.sleep(0)
+        # the complete plan rewrote the streamed task's prompt
+        kept = Task(task_id='1', task_type='az_cli', prompt='kept')
+        await generator.apply(TaskPlan(tasks=[kept]))
+        await asyncio.gather(dropped, return_exceptions=True)
+        return dropped
+
+    assert asyncio.run(run()).cancelled()
+    assert started == ['dropped', 'kept']
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from langgraph.errors import GraphInterrupt
+
+from agents.tracing import (NOOP_SPAN, JsonlSpanExporter, OtlpHttpSpanExporter, Tracer, from_otlp,
+                            load_spans, waterfall)
+
+
+class ListExporter:
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """the spans exported by the Tracer singleton, by name once flushed."""
+    exporter = ListExporter()
+    monkeypatch.setattr(Tracer(), 'exporter', exporter)
+
+    def flush():
+        Tracer().flush()
+        return {span['name']: span for span in exporter.spans}
+    return flush
+
+
+def test_spans_nest_across_tasks_and_threads(exported):
+    tracer = Tracer()
+
+    def subprocess():
+        tracer.start_span('subprocess', program='az').end(exit_code=0)
+
+    async def tool():
+        with tracer.span('tool', tool='AzShell'):
+            await asyncio.to_thread(subprocess)
+
+    async def run():
+        with tracer.span('workflow', thread_id='t1'):
+            with tracer.span('node', node='execute_tasks'):
+                await asyncio.gather(asyncio.create_task(tool()))
+
+    asyncio.run(run())
+    spans = exported()
+
+    assert len({span['trace_id'] for span in spans.values()}) == 1
+    assert spans['workflow']['parent_id'] is None
+    for child, parent in (('node', 'workflow'), ('tool', 'node'), ('subprocess', 'tool')):
+        assert spans[child]['parent_id'] == spans[parent]['span_id']
+    assert spans['subprocess']['attributes'] == {'program': 'az', 'exit_code': 0}
+    assert spans['workflow']['start'] <= spans['subprocess']['start'] <= spans['subprocess']['end']
+
+
+def test_span_status_follows_the_exception(exported):
+    tracer = Tracer()
+
+    with pytest.raises(RuntimeError):
+        with tracer.span('failed'):
+            raise RuntimeError('quota exceeded')
+    with pytest.raises(GraphInterrupt):
+        with tracer.span('interrupted'):
+            raise GraphInterrupt()
+    with tracer.span('ok') as span:
+        span.set(result_status='succeeded')
+    spans = exported()
+
+    assert (spans['failed']['status'], spans['failed']['error']) == ('error', 'quota exceeded')
+    assert spans['interrupted']['status'] == 'interrupted'
+    assert spans['ok']['status'] == 'ok'
+    assert spans['ok']['attributes'] == {'result_status': 'succeeded'}
+
+
+def test_a_disabled_tracer_hands_out_noop_spans(monkeypatch):
+    monkeypatch.setattr(Tracer(), 'exporter', None)
+
+    with Tracer().span('node') as span:
+        assert span is NOOP_SPAN
+        assert Tracer().start_span('subprocess') is NOOP_SPAN
+
+
+def span(name, span_id, parent_id, start, end, status='ok', error=None, **attributes):
+    return {'trace_id': 'a' * 32, 'span_id': span_id, 'parent_id': parent_id, 'name': name,
+            'start': start, 'end': end, 'status': status, 'error': error, 'attributes': attributes}
+
+
+SPANS = [
+    span('workflow', '1' * 16, None, 100.0, 104.0, thread_id='t1', resume=False),
+    span('node', '2' * 16, '1' * 16, 100.5, 103.0, 'interrupted', 'GraphInterrupt', node='plan_tasks'),
+    span('llm.request', '3' * 16, '2' * 16, 101.0, 102.5, 'error', 'status 429',
+         deployment='gpt-4o', request_bytes=2048, seconds=1.5),
+]
+
+
+def test_jsonl_spans_are_read_back_without_the_line_cut_short(tmp_path):
+    path = tmp_path / 'traces' / 'spans.jsonl'
+    JsonlSpanExporter(str(path)).export(SPANS)
+    with open(path, 'a') as f:
+        f.write('{"trace_id": "cut')
+
+    assert load_spans(str(path)) == SPANS
+
+
+def test_otlp_export_round_trips_through_the_collector_stand_in():
+    requests = []
+
+    def handler(request):
+        requests.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json={})
+
+    exporter = OtlpHttpSpanExporter('http://collector.invalid:4318/')
+    exporter.client = httpx.Client(transport=httpx.MockTransport(handler))
+    exporter.export(SPANS)
+
+    (path, body), = requests
+    otlp_span = body['resourceSpans'][0]['scopeSpans'][0]['spans'][2]
+    assert path == '/v1/traces'
+    assert otlp_span['status'] == {'code': 2, 'message': 'status 429'}
+    assert {'key': 'request_bytes', 'value': {'intValue': '2048'}} in otlp_span['attributes']
+    assert from_otlp(body) == SPANS
+
+
+def test_otlp_export_failures_are_dropped():
+    def handler(request):
+        raise httpx.ConnectError('collector down', request=request)
+
+    exporter = OtlpHttpSpanExporter('http://collector.invalid:4318')
+    exporter.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    exporter.export(SPANS)
+
+
+def test_waterfall_draws_the_span_tree_on_the_run_timeline():
+    lines = waterfall(SPANS, width=8).splitlines()
+
+    assert lines[0] == f"trace {'a' * 32}  thread_id=t1  4.000s  3 spans"
+    assert lines[1].split()[:3] == ['0.000s', '4.000s', 'workflow']
+    assert '  node plan_tasks' in lines[2] and lines[2].endswith('| █████  |  [interrupted]')
+    assert '    llm.request gpt-4o' in lines[3] and lines[3].endswith('|  ███   |  [error]')
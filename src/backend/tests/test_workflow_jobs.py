@@ -0,0 +1,109 @@
+import asyncio
+import json
+from typing import TypedDict
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from agents.workflow_jobs import (COMPLETED, FAILED, WorkflowBusyError, WorkflowJobQueue,
+                                  WorkflowJobStore, WorkflowQueueFullError)
+
+
+class State(TypedDict, total=False):
+    prompt: str
+    scratchpad: str
+
+
+def graph(gate: asyncio.Event):
+    async def work(state: State) -> State:
+        await gate.wait()
+        return {'scratchpad': f"done: {state['prompt']}"}
+
+    builder = StateGraph(State)
+    builder.add_node('work', work)
+    builder.add_edge(START, 'work')
+    builder.add_edge('work', END)
+    return builder.compile(checkpointer=InMemorySaver())
+
+
+@pytest.fixture
+def store(tmp_path):
+    return WorkflowJobStore(str(tmp_path / 'jobs.db'))
+
+
+def frames(job):
+    async def collect():
+        return [frame async for frame in job.follow()]
+    return collect()
+
+
+def test_a_run_streams_its_frames_and_persists_the_result(store):
+    async def run():
+        gate = asyncio.Event()
+        gate.set()
+        jobs = WorkflowJobQueue(graph(gate), workers=1, max_queue_size=2, store=store)
+        await jobs.start()
+        job = jobs.submit('t1', {'prompt': 'hello'})
+        sent = await frames(job)
+        await jobs.stop()
+        return job, sent
+
+    job, sent = asyncio.run(run())
+
+    assert job.status == COMPLETED
+    assert sent[0].startswith('event: node_start')
+    assert json.loads(sent[-1].removeprefix('data: ')) == {'thread_id': 't1',
+                                                           'result': 'done: hello'}
+    assert store.load('t1')['status'] == COMPLETED
+
+
+def test_a_full_queue_asks_clients_to_retry_later(store):
+    async def run():
+        gate = asyncio.Event()
+        jobs = WorkflowJobQueue(graph(gate), workers=1, max_queue_size=1, store=store,
+                                retry_after_seconds=7)
+        await jobs.start()
+        jobs.submit('running', {'prompt': 'a'})
+        await asyncio.sleep(0.05)
+        jobs.submit('queued', {'prompt': 'b'})
+
+        with pytest.raises(WorkflowQueueFullError) as full:
+            jobs.submit('rejected', {'prompt': 'c'})
+        with pytest.raises(WorkflowBusyError):
+            jobs.submit('queued', {'prompt': 'b'})
+        stats = jobs.stats()
+
+        gate.set()
+        await frames(jobs.get('queued'))
+        await jobs.stop()
+        return full.value, stats
+
+    error, stats = asyncio.run(run())
+
+    assert error.retry_after_seconds == 7
+    assert stats == {'workers': 1, 'active': 1, 'queue_depth': 1, 'max_queue_size': 1}
+
+
+def test_stop_persists_running_and_queued_runs_as_failed(store):
+    async def run():
+        jobs = WorkflowJobQueue(graph(asyncio.Event()), workers=1, max_queue_size=2, store=store)
+        await jobs.start()
+        running = jobs.submit('running', {'prompt': 'a'})
+        await asyncio.sleep(0.05)
+        queued = jobs.submit('queued', {'prompt': 'b'})
+        following = asyncio.create_task(frames(queued))
+        await asyncio.sleep(0.01)
+
+        await jobs.stop()
+        return running, queued, await following
+
+    running, queued, sent = asyncio.run(run())
+
+    assert (running.status, queued.status) == (FAILED, FAILED)
+    assert queued.finished
+    assert sent[-1].startswith('event: error')
+    assert store.load('running') == {'status': FAILED, 'result': None, 'interrupt_data': None,
+                                     'error': 'workflow was cancelled'}
+    assert store.load('queued')['status'] == FAILED
+    assert 'shut down before the workflow started' in store.load('queued')['error']